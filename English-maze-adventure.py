@@ -1,15 +1,39 @@
 import arcade
+import pyglet
 import random
 import time
 import sqlite3
 import os
 import math
+import zlib
+import atexit
+import bisect
+import heapq
+import argparse
+import asyncio
+import json
+import threading
+import sys
+import cProfile
+import socket
+import functools
+import itertools
+import struct
+import hashlib
+import mmap
+from collections import OrderedDict, deque
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Tuple
 from dataclasses import dataclass
 
+import numpy as np
+import pytiled_parser
+
 SCREEN_WIDTH = 1000
 SCREEN_HEIGHT = 750
 SCREEN_TITLE = "English Maze Adventure"
+GAME_VERSION = "3.0"
 
 SPRITE_SIZE = 64
 GRID_PIXEL_SIZE = SPRITE_SIZE
@@ -27,6 +51,18 @@ ON_GROUND_HEIGHT = 40
 SOUND_ENABLED = True
 FOOTSTEP_INTERVAL = 0.3
 
+ANSWER_LOG_BATCH_SIZE = 20
+
+HIGH_SCORES_CACHE_SIZE = 50
+# Сколько лучших результатов хранить для каждого игрока (None - хранить все)
+HIGH_SCORES_KEEP_PER_PLAYER = None
+
+LEADERBOARD_DEFAULT_PORT = 8765
+LEADERBOARD_BATCH_INTERVAL = 2.0
+LEADERBOARD_BATCH_SIZE = 50
+LEADERBOARD_CACHE_TTL = 10.0
+LEADERBOARD_TIMEOUT = 3.0
+
 LEVEL_DIFFICULTY = {
     1: {"enemies": 1, "platforms": 5, "enemy_speed": ENEMY_SPEED},
     2: {"enemies": 2, "platforms": 5, "enemy_speed": ENEMY_SPEED * 1.2},
@@ -35,11 +71,119 @@ LEVEL_DIFFICULTY = {
     5: {"enemies": 5, "platforms": 5, "enemy_speed": ENEMY_SPEED * 1.8},
 }
 
+# Уровни - карты Tiled (.tmj) в каталоге levels рядом с игрой. Скомпилированные
+# карты кэшируются в LEVEL_CACHE_DIR под хэшем содержимого исходного файла
+LEVELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels")
+LEVEL_CACHE_DIR = "data/level_cache"
+LEVEL_CACHE_MAGIC = b"EML1"
+LEVEL_FORMAT_VERSION = 1
+LEVEL_GRID_CELL_SIZE = 100
+BRICK_SIZE = 20
+
+# Горячая перезагрузка (--watch-assets): период опроса файлов уровней и базы вопросов
+ASSET_POLL_INTERVAL = 0.5
+
+# Процедурные уровни (--procedural)
+MAZE_MAX_ATTEMPTS = 50
+MAZE_ENEMY_ATTEMPTS = 1000
+JUMP_ARC_TICKS = 120
+TOUCH_DISTANCE = 40
+
+# Камера следует за игроком, если мир больше окна. Всё, что дальше
+# CULL_MARGIN от края экрана, не рисуется
+CULL_MARGIN = 60
+
+# Уровни больше окна делятся на куски по LEVEL_CHUNK_CELLS ячеек сетки.
+# Куски готовятся в фоновом потоке: видимые и ещё CHUNK_PREFETCH_RADIUS
+# кусков вокруг, а дальше CHUNK_KEEP_RADIUS выгружаются
+LEVEL_CHUNK_CELLS = 5
+CHUNK_PREFETCH_RADIUS = 1
+CHUNK_KEEP_RADIUS = 2
+
+# Погоня врагов (--chase): сетка проходимости по стенам уровня и поле
+# направлений к игроку на FLOW_FIELD_RADIUS шагов сетки вокруг него
+NAV_CELL_SIZE = 40
+ENEMY_CLEARANCE = 20
+FLOW_FIELD_RADIUS = 15
+
+# Пути патрулей по той же сетке: A* с прыжками (JPS), общий LRU-кэш путей
+# и бюджет времени поиска на тик. Путь отдаётся ровно через
+# PATH_LATENCY_TICKS тиков после запроса, поэтому записи игры не зависят
+# от скорости машины: если бюджета не хватило, поиск дожимается к сроку.
+# Это сознательно выходит за бюджет (такие тики считаются в stats["overruns"]):
+# запасной путь по времени сделал бы игру зависимой от скорости машины
+PATH_CACHE_SIZE = 256
+PATH_BUDGET_MS = 1.0
+PATH_LATENCY_TICKS = 3
+PATH_SEARCH_SLICE = 32
+
+# Режим выживания (--survival): рой врагов в массивах numpy вместо врагов
+# уровня. Враги появляются не ближе SWARM_SPAWN_DISTANCE к игроку и
+# бросаются к нему с расстояния SWARM_AGGRO_RADIUS
+SURVIVAL_ENEMIES = 40
+SWARM_SPAWN_DISTANCE = 250
+SWARM_AGGRO_RADIUS = 250
+
+# Уровни детализации ИИ: (расстояние за краем видимой области, обновлять
+# раз в N тиков). Враги на экране и в полосе AI_LOD_MARGIN вокруг него
+# обновляются каждый тик и вне бюджета AI_BUDGET_MS, так что на уровнях
+# размером с окно реже не обновляется никто
+AI_LOD_MARGIN = 150
+AI_LOD_BUCKETS = ((AI_LOD_MARGIN, 1), (600, 2), (math.inf, 4))
+AI_BUDGET_MS = 2.0
+
 BACKGROUND_COLOR = arcade.color.DARK_SLATE_GRAY
 TEXT_COLOR = arcade.color.WHITE
 BUTTON_NORMAL = arcade.color.STEEL_BLUE
 BUTTON_HOVER = arcade.color.LIGHT_STEEL_BLUE
 BUTTON_CLICKED = arcade.color.ROYAL_BLUE
+UI_GRID_CELL_SIZE = 100
+
+# Частоты окна игры; экраны меню без ввода пользователя перерисовываются реже
+WINDOW_UPDATE_RATE = 1 / 60
+WINDOW_DRAW_RATE = 1 / 60
+MENU_IDLE_TIMEOUT = 5.0
+MENU_IDLE_FPS = 5
+
+# Адаптивное качество графики в GameView
+FRAME_BUDGET_MS = 1000 / 60
+QUALITY_SAMPLE_FRAMES = 120
+QUALITY_HEADROOM = 0.6
+QUALITY_COOLDOWN = 2.0
+QUALITY_TIERS = ["FULL", "NO BRICKS", "HALF PARTICLES", "STATIC STATIONS"]
+
+# Профайлер кадра (F3)
+PROFILER_SAMPLE_FRAMES = 240
+PROFILER_REFRESH_FRAMES = 30
+
+# Запись профилей (--profile / EMA_PROFILE, F9 в игре)
+PROFILES_DIR = "data/profiles"
+STACK_SAMPLE_INTERVAL = 0.005
+
+# Симуляция идёт фиксированными шагами, чтобы записи ввода воспроизводились тик в тик
+SIMULATION_DT = 1 / 60
+MAX_FRAME_TIME = 0.1
+
+# Формат записи игры (--record-replays, воспроизведение - tools/replay.py)
+REPLAY_MAGIC = b"EMR1"
+REPLAY_FLAG_PROCEDURAL = 1
+REPLAY_FLAG_CHASE = 2
+REPLAY_FLAG_SURVIVAL = 4
+REPLAY_STATE = 1
+REPLAY_JUMP = 2
+REPLAY_PAUSE = 3
+REPLAY_ANSWER = 4
+REPLAY_QUIZ_END = 5
+REPLAY_RESTART = 6
+REPLAY_NEXT_LEVEL = 7
+REPLAY_END = 8
+
+# Телеметрия: гистограммы времени в CSV с ротацией по размеру
+TELEMETRY_DIR = "data/telemetry"
+TELEMETRY_FLUSH_INTERVAL = 30.0
+TELEMETRY_MAX_FILE_BYTES = 1_000_000
+TELEMETRY_BACKUP_COUNT = 5
+TELEMETRY_BUCKETS_MS = (1, 2, 4, 8, 16, 33, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
 
 ENGLISH_LEVELS = {
     "A1": "Beginner",
@@ -81,6 +225,651 @@ class EnglishQuestion:
     hint: str
 
 
+class SessionRNG:
+    # Один seed на сессию. Каждая подсистема получает свой генератор
+    # stream(name), поэтому лишний вызов в одной подсистеме не меняет
+    # последовательность в остальных
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.SystemRandom().randrange(2 ** 32)
+        self.seed = seed
+
+    def stream(self, name):
+        return random.Random(f"{self.seed}:{name}")
+
+    def numpy_stream(self, name):
+        return np.random.default_rng([self.seed, zlib.crc32(name.encode())])
+
+
+@dataclass
+class GameOptions:
+    seed: int = None
+    database_path: str = "data/player_progress.db"
+    replay_dir: str = None
+    procedural: bool = False
+    chase: bool = False
+    survival: int = 0
+
+    def __post_init__(self):
+        self.rng = SessionRNG(self.seed)
+        self.seed = self.rng.seed
+
+
+class SeenQuestionsBitmap:
+    # Бит N установлен, если вопрос с id N уже задавался игроку.
+    # Хранится сжатым zlib, поэтому даже для банка в миллион вопросов
+    # BLOB занимает единицы килобайт.
+
+    def __init__(self, data=b""):
+        self.bits = bytearray(data)
+
+    @classmethod
+    def from_blob(cls, blob):
+        if not blob:
+            return cls()
+        return cls(zlib.decompress(blob))
+
+    def to_blob(self):
+        return zlib.compress(bytes(self.bits.rstrip(b"\x00")), 9)
+
+    def add(self, question_id):
+        byte_index, bit = divmod(question_id, 8)
+        if byte_index >= len(self.bits):
+            self.bits.extend(bytes(byte_index - len(self.bits) + 1))
+        self.bits[byte_index] |= 1 << bit
+
+    def update(self, question_ids):
+        for question_id in question_ids:
+            self.add(question_id)
+
+    def __contains__(self, question_id):
+        byte_index, bit = divmod(question_id, 8)
+        if byte_index >= len(self.bits):
+            return False
+        return bool(self.bits[byte_index] & (1 << bit))
+
+    def __len__(self):
+        return int.from_bytes(self.bits, "little").bit_count()
+
+    # Маска "уже задавался" для массива id numpy - без вызова Python на каждый id
+    def contains_many(self, question_ids):
+        bits = np.frombuffer(bytes(self.bits), dtype=np.uint8)
+        byte_index = question_ids >> 3
+        inside = byte_index < len(bits)
+        mask = np.zeros(len(question_ids), dtype=bool)
+        mask[inside] = (bits[byte_index[inside]] >> (question_ids[inside] & 7)) & 1
+        return mask
+
+
+class TelemetryRecorder:
+    # Замеры копятся в памяти в виде гистограмм (без хранения отдельных
+    # значений), фоновый поток раз в TELEMETRY_FLUSH_INTERVAL секунд
+    # дописывает их в CSV и обнуляет
+    def __init__(self, directory=TELEMETRY_DIR, flush_interval=TELEMETRY_FLUSH_INTERVAL,
+                 max_bytes=TELEMETRY_MAX_FILE_BYTES, backup_count=TELEMETRY_BACKUP_COUNT):
+        self.directory = directory
+        self.path = os.path.join(directory, "telemetry.csv")
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.enabled = True
+        self.host = socket.gethostname()
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def observe(self, metric, value_ms, label=""):
+        if not self.enabled:
+            return
+
+        bucket = bisect.bisect_left(TELEMETRY_BUCKETS_MS, value_ms)
+        with self.lock:
+            histogram = self.histograms.get((metric, label))
+            if histogram is None:
+                histogram = self.histograms[(metric, label)] = [0, 0.0] + [0] * (len(TELEMETRY_BUCKETS_MS) + 1)
+            histogram[0] += 1
+            histogram[1] += value_ms
+            histogram[2 + bucket] += 1
+
+    def timed(self, metric):
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.observe(metric, (time.perf_counter() - started) * 1000, function.__qualname__)
+            return wrapper
+        return decorator
+
+    def start(self):
+        if self.thread or not self.enabled:
+            return
+        self.thread = threading.Thread(target=self.run, name="telemetry", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def run(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self.flush()
+
+    def flush(self):
+        with self.lock:
+            histograms, self.histograms = self.histograms, {}
+
+        if not histograms:
+            return
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.rotate()
+            new_file = not os.path.exists(self.path)
+            timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+            with open(self.path, "a", encoding="utf-8") as file:
+                if new_file:
+                    buckets = ",".join(f"le_{bound}" for bound in TELEMETRY_BUCKETS_MS)
+                    file.write(f"timestamp,host,metric,label,count,sum_ms,{buckets},le_inf\n")
+                for (metric, label), histogram in sorted(histograms.items()):
+                    counts = ",".join(str(count) for count in histogram[2:])
+                    file.write(f"{timestamp},{self.host},{metric},{label},{histogram[0]},{histogram[1]:.2f},{counts}\n")
+        except OSError as e:
+            print(f"Ошибка записи телеметрии: {e}")
+
+    def rotate(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < self.max_bytes:
+            return
+
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+telemetry = TelemetryRecorder()
+
+
+class AnswerEventLog:
+    def __init__(self, db_path, batch_size=ANSWER_LOG_BATCH_SIZE):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.pending = []
+        self._exit_hook_registered = False
+
+    def record(self, player_name, question_id, correct, attempts, hint_used, latency_ms):
+        self.pending.append((
+            player_name,
+            str(question_id),
+            1 if correct else 0,
+            attempts,
+            1 if hint_used else 0,
+            int(latency_ms)
+        ))
+
+        # Недописанный хвост пакета сохраняем при выходе из игры
+        if not self._exit_hook_registered:
+            atexit.register(self.flush)
+            self._exit_hook_registered = True
+
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+
+        events, self.pending = self.pending, []
+        self.write(events)
+
+    @telemetry.timed("db_write_ms")
+    def write(self, events):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.executemany('''
+            INSERT INTO answer_events (player_name, question_id, correct, attempts, hint_used, latency_ms)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', events)
+
+        # Средняя задержка пересчитывается по формуле взвешенного среднего,
+        # поэтому журнал событий для отчётов читать не нужно
+        cursor.executemany('''
+            INSERT INTO question_answer_stats (question_id, answers, correct, hints, mean_latency_ms)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(question_id) DO UPDATE SET
+                answers = answers + excluded.answers,
+                correct = correct + excluded.correct,
+                hints = hints + excluded.hints,
+                mean_latency_ms = (mean_latency_ms * answers + excluded.mean_latency_ms * excluded.answers)
+                                  / (answers + excluded.answers)
+        ''', self._aggregate(events, 1))
+
+        cursor.executemany('''
+            INSERT INTO player_answer_stats (player_name, answers, correct, hints, mean_latency_ms)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(player_name) DO UPDATE SET
+                answers = answers + excluded.answers,
+                correct = correct + excluded.correct,
+                hints = hints + excluded.hints,
+                mean_latency_ms = (mean_latency_ms * answers + excluded.mean_latency_ms * excluded.answers)
+                                  / (answers + excluded.answers)
+        ''', self._aggregate(events, 0))
+
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def _aggregate(events, key_index):
+        totals = {}
+        for event in events:
+            answers, correct, hints, latency_sum = totals.get(event[key_index], (0, 0, 0, 0))
+            totals[event[key_index]] = (
+                answers + 1,
+                correct + event[2],
+                hints + event[4],
+                latency_sum + event[5]
+            )
+
+        return [
+            (key, answers, correct, hints, latency_sum / answers)
+            for key, (answers, correct, hints, latency_sum) in totals.items()
+        ]
+
+
+class Leaderboard:
+    # Один экземпляр на файл базы: PlayerDatabase создаётся во многих местах,
+    # а кэш лучших результатов должен быть общим
+    _instances = {}
+
+    def __init__(self, db_path, cache_size=HIGH_SCORES_CACHE_SIZE, keep_per_player=HIGH_SCORES_KEEP_PER_PLAYER):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self.keep_per_player = keep_per_player
+        self.top_cache = {}
+
+    @classmethod
+    def for_database(cls, db_path):
+        if db_path not in cls._instances:
+            cls._instances[db_path] = cls(db_path)
+        return cls._instances[db_path]
+
+    @staticmethod
+    def create_schema(cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS high_scores (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                player_name TEXT NOT NULL,
+                score INTEGER NOT NULL,
+                level INTEGER NOT NULL,
+                english_level TEXT,
+                date_achieved TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_high_scores_score ON high_scores(score DESC)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_high_scores_english_level ON high_scores(english_level, score DESC)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_high_scores_level ON high_scores(level, score DESC)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_high_scores_player ON high_scores(player_name, score DESC)')
+
+    def submit(self, player_name, score, level, english_level):
+        self.submit_many([(player_name, score, level, english_level)])
+
+    @telemetry.timed("db_write_ms")
+    def submit_many(self, scores):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+
+            new_entries = []
+            for player_name, score, level, english_level in scores:
+                cursor.execute('''
+                    INSERT INTO high_scores (player_name, score, level, english_level)
+                    VALUES (?, ?, ?, ?)
+                ''', (player_name, score, level, english_level))
+                score_id = cursor.lastrowid
+
+                cursor.execute('SELECT date_achieved FROM high_scores WHERE id = ?', (score_id,))
+                date_achieved = cursor.fetchone()[0]
+                new_entries.append((score_id, player_name, score, level, english_level, date_achieved))
+
+            pruned = 0
+            if self.keep_per_player:
+                for player_name in {entry[1] for entry in new_entries}:
+                    cursor.execute('''
+                        DELETE FROM high_scores
+                        WHERE player_name = ? AND id NOT IN (
+                            SELECT id FROM high_scores
+                            WHERE player_name = ?
+                            ORDER BY score DESC, id
+                            LIMIT ?
+                        )
+                    ''', (player_name, player_name, self.keep_per_player))
+                    pruned += cursor.rowcount
+
+            conn.commit()
+        finally:
+            conn.close()
+
+        if pruned:
+            # Удалённые строки могли попасть в кэш - перечитаем его при следующем запросе
+            self.top_cache = {}
+            return
+
+        for (level_filter, english_level_filter), entries in self.top_cache.items():
+            for entry in new_entries:
+                if level_filter is not None and level_filter != entry[3]:
+                    continue
+                if english_level_filter is not None and english_level_filter != entry[4]:
+                    continue
+
+                bisect.insort(entries, entry, key=lambda e: (-e[2], e[0]))
+            del entries[self.cache_size:]
+
+    def top(self, limit=10, level=None, english_level=None):
+        if limit > self.cache_size:
+            return [entry[1:] for entry in self._load_top(limit, level, english_level)]
+
+        key = (level, english_level)
+        if key not in self.top_cache:
+            self.top_cache[key] = self._load_top(self.cache_size, level, english_level)
+
+        return [entry[1:] for entry in self.top_cache[key][:limit]]
+
+    def _load_top(self, limit, level, english_level):
+        conditions = []
+        params = []
+        if level is not None:
+            conditions.append('level = ?')
+            params.append(level)
+        if english_level is not None:
+            conditions.append('english_level = ?')
+            params.append(english_level)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute(f'''
+            SELECT id, player_name, score, level, english_level, date_achieved
+            FROM high_scores
+            {where}
+            ORDER BY score DESC, id
+            LIMIT ?
+        ''', (*params, limit))
+
+        entries = cursor.fetchall()
+        conn.close()
+        return entries
+
+    def prune(self, keep_per_player):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            DELETE FROM high_scores
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY player_name ORDER BY score DESC, id
+                    ) AS player_rank
+                    FROM high_scores
+                )
+                WHERE player_rank > ?
+            )
+        ''', (keep_per_player,))
+        pruned = cursor.rowcount
+
+        conn.commit()
+        conn.close()
+
+        self.top_cache = {}
+        return pruned
+
+    def clear(self):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('DELETE FROM high_scores')
+        cursor.execute('DELETE FROM sqlite_sequence WHERE name="high_scores"')
+
+        conn.commit()
+        conn.close()
+
+        self.top_cache = {}
+
+
+def parse_address(address, default_host="127.0.0.1"):
+    host, _, port = address.rpartition(":")
+    return host or default_host, int(port) if port else LEADERBOARD_DEFAULT_PORT
+
+
+async def leaderboard_request(host, port, request, timeout=LEADERBOARD_TIMEOUT):
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(json.dumps(request).encode("utf-8") + b"\n")
+        await writer.drain()
+        line = await asyncio.wait_for(reader.readline(), timeout)
+    finally:
+        writer.close()
+
+    if not line:
+        raise ConnectionError("сервер закрыл соединение")
+    return json.loads(line)
+
+
+class LeaderboardClient:
+    # Клиент работает в отдельном потоке со своим циклом asyncio:
+    # submit() и top() возвращаются сразу и никогда не ждут сеть
+    shared = None
+
+    def __init__(self, host, port=LEADERBOARD_DEFAULT_PORT, batch_interval=LEADERBOARD_BATCH_INTERVAL,
+                 batch_size=LEADERBOARD_BATCH_SIZE, cache_ttl=LEADERBOARD_CACHE_TTL):
+        self.host = host
+        self.port = port
+        self.batch_interval = batch_interval
+        self.batch_size = batch_size
+        self.cache_ttl = cache_ttl
+        self.pending = deque()
+        self.top_cache = {}
+        self.refreshing = set()
+        self.loop = asyncio.new_event_loop()
+        self.wakeup = None
+        self.thread = threading.Thread(target=self._run_loop, name="leaderboard-client", daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def configure(cls, address):
+        if cls.shared:
+            cls.shared.close()
+        host, port = parse_address(address)
+        cls.shared = cls(host, port)
+        print(f"Таблица рекордов синхронизируется с {host}:{port}")
+        return cls.shared
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.wakeup = asyncio.Event()
+        self.loop.create_task(self._flush_loop())
+        self.loop.run_forever()
+
+    def submit(self, player_name, score, level, english_level):
+        self.pending.append((player_name, score, level, english_level))
+        if len(self.pending) >= self.batch_size and self.wakeup:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    def top(self, limit=10, level=None, english_level=None):
+        key = (limit, level, english_level)
+        cached = self.top_cache.get(key)
+
+        if (cached is None or time.time() - cached[0] > self.cache_ttl) and key not in self.refreshing:
+            self.refreshing.add(key)
+            asyncio.run_coroutine_threadsafe(self._refresh(key), self.loop)
+
+        # Пока ответа нет, вызывающий код показывает локальные рекорды
+        return cached[1] if cached else None
+
+    async def _refresh(self, key):
+        limit, level, english_level = key
+        try:
+            response = await leaderboard_request(self.host, self.port, {
+                "op": "top", "limit": limit, "level": level, "english_level": english_level
+            })
+            if response.get("ok"):
+                self.top_cache[key] = (time.time(), [tuple(row) for row in response["scores"]])
+        except (OSError, asyncio.TimeoutError, ValueError) as e:
+            print(f"Сервер рекордов недоступен: {e}")
+        finally:
+            self.refreshing.discard(key)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.batch_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self._send_pending()
+
+    async def _send_pending(self):
+        while self.pending:
+            batch = [self.pending.popleft() for _ in range(min(self.batch_size, len(self.pending)))]
+            try:
+                response = await leaderboard_request(self.host, self.port, {"op": "submit", "scores": batch})
+                if not response.get("ok"):
+                    print(f"Сервер рекордов отклонил пакет: {response.get('error')}")
+            except (OSError, asyncio.TimeoutError, ValueError) as e:
+                # Вернём пакет в очередь и попробуем на следующем цикле
+                self.pending.extendleft(reversed(batch))
+                print(f"Не удалось отправить {len(batch)} результатов: {e}")
+                return
+
+            # Отправленные результаты должны появиться в таблице без ожидания TTL,
+            # но до ответа сервера показываем прежние данные
+            self.top_cache = {key: (0, scores) for key, (_, scores) in self.top_cache.items()}
+
+    def close(self, timeout=LEADERBOARD_TIMEOUT):
+        if self.pending:
+            future = asyncio.run_coroutine_threadsafe(self._send_pending(), self.loop)
+            try:
+                future.result(timeout)
+            except Exception as e:
+                print(f"Не удалось отправить оставшиеся результаты: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class PlayerProfileStore:
+    # Профили игроков читаются из базы один раз за сессию, а обратно
+    # записываются только изменённые поля. Счётчики записываются
+    # приращениями (total_score = total_score + ?), чтобы не затереть
+    # записи другого процесса в ту же базу
+    _instances = {}
+
+    FIELDS = (
+        'current_level', 'current_keys', 'total_score', 'english_level',
+        'games_played', 'correct_answers', 'wrong_answers', 'sound_enabled'
+    )
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.profiles = {}
+        self.dirty = {}
+        self.deltas = {}
+
+    @classmethod
+    def for_database(cls, db_path):
+        if db_path not in cls._instances:
+            cls._instances[db_path] = cls(db_path)
+        return cls._instances[db_path]
+
+    def load(self, username, english_level=None):
+        profile = self.profiles.get(username)
+        if profile is not None and (english_level is None or profile['english_level'] == english_level):
+            return profile
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        if english_level is not None:
+            cursor.execute('''
+                INSERT INTO players (username, english_level)
+                VALUES (?, ?)
+                ON CONFLICT(username) DO UPDATE SET english_level = excluded.english_level
+                WHERE english_level IS NOT excluded.english_level
+            ''', (username, english_level))
+            conn.commit()
+
+        cursor.execute(f'''
+            SELECT {', '.join(self.FIELDS)} FROM players WHERE username = ?
+        ''', (username,))
+        row = cursor.fetchone()
+        conn.close()
+
+        if row is None:
+            return None
+
+        profile = dict(zip(self.FIELDS, row))
+        self.profiles[username] = profile
+        return profile
+
+    def get(self, username, field, default=None):
+        profile = self.load(username)
+        if profile is None:
+            return default
+        return profile[field]
+
+    def set(self, username, field, value):
+        profile = self.load(username)
+        if profile is None or profile[field] == value:
+            return
+        profile[field] = value
+        self.dirty.setdefault(username, set()).add(field)
+
+    def increment(self, username, field, delta):
+        profile = self.load(username)
+        if profile is None or not delta:
+            return
+        profile[field] += delta
+        deltas = self.deltas.setdefault(username, {})
+        deltas[field] = deltas.get(field, 0) + delta
+
+    def flush(self, username=None):
+        usernames = [username] if username is not None else list(self.dirty.keys() | self.deltas.keys())
+
+        for name in usernames:
+            fields = sorted(self.dirty.pop(name, ()))
+            deltas = sorted(self.deltas.pop(name, {}).items())
+            if fields or deltas:
+                self.write(name, fields, deltas)
+
+    @telemetry.timed("db_write_ms")
+    def write(self, name, fields, deltas):
+        profile = self.profiles[name]
+        assignments = [f'{field} = ?' for field in fields] + [f'{field} = {field} + ?' for field, _ in deltas]
+
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            f'UPDATE players SET {", ".join(assignments)} WHERE username = ?',
+            [profile[field] for field in fields] + [delta for _, delta in deltas] + [name]
+        )
+        conn.commit()
+        conn.close()
+
+
 class PhysicsEngine:
 
     def __init__(self):
@@ -207,10 +996,16 @@ class PhysicsEngine:
 
 
 class PlayerDatabase:
-    def __init__(self):
-        os.makedirs("data", exist_ok=True)
-        self.db_path = "data/player_progress.db"
+    def __init__(self, db_path="data/player_progress.db"):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
         self.init_database()
+        self.answer_log = AnswerEventLog(self.db_path)
+        self.leaderboard = Leaderboard.for_database(self.db_path)
+        self.profiles = PlayerProfileStore.for_database(self.db_path)
+        self.remote_leaderboard = LeaderboardClient.shared
+        self.pending_seen = {}
+        self._exit_hook_registered = False
 
     def init_database(self):
         conn = sqlite3.connect(self.db_path)
@@ -228,10 +1023,16 @@ class PlayerDatabase:
                 correct_answers INTEGER DEFAULT 0,
                 wrong_answers INTEGER DEFAULT 0,
                 sound_enabled INTEGER DEFAULT 1,
+                seen_questions BLOB,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
 
+        cursor.execute('PRAGMA table_info(players)')
+        player_columns = [row[1] for row in cursor.fetchall()]
+        if 'seen_questions' not in player_columns:
+            cursor.execute('ALTER TABLE players ADD COLUMN seen_questions BLOB')
+
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS level_stats (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -245,16 +1046,7 @@ class PlayerDatabase:
             )
         ''')
 
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS high_scores (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                player_name TEXT NOT NULL,
-                score INTEGER NOT NULL,
-                level INTEGER NOT NULL,
-                english_level TEXT,
-                date_achieved TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        Leaderboard.create_schema(cursor)
 
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS english_questions (
@@ -274,6 +1066,39 @@ class PlayerDatabase:
             )
         ''')
 
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS answer_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                player_name TEXT NOT NULL,
+                question_id TEXT NOT NULL,
+                correct INTEGER NOT NULL,
+                attempts INTEGER NOT NULL,
+                hint_used INTEGER NOT NULL,
+                latency_ms INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS question_answer_stats (
+                question_id TEXT PRIMARY KEY,
+                answers INTEGER NOT NULL DEFAULT 0,
+                correct INTEGER NOT NULL DEFAULT 0,
+                hints INTEGER NOT NULL DEFAULT 0,
+                mean_latency_ms REAL NOT NULL DEFAULT 0
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS player_answer_stats (
+                player_name TEXT PRIMARY KEY,
+                answers INTEGER NOT NULL DEFAULT 0,
+                correct INTEGER NOT NULL DEFAULT 0,
+                hints INTEGER NOT NULL DEFAULT 0,
+                mean_latency_ms REAL NOT NULL DEFAULT 0
+            )
+        ''')
+
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_level_type ON english_questions(question_level, question_type)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_level ON english_questions(question_level)')
 
@@ -918,21 +1743,46 @@ class PlayerDatabase:
         conn.close()
         print(f"Загружено {len(sample_questions)} вопросов в базу данных")
 
-    def get_questions_by_level(self, level: str, limit: int = 50) -> List[EnglishQuestion]:
+    def get_questions_by_level(self, level: str, limit: int = 50, username: str = None,
+                               rng: random.Random = None) -> List[EnglishQuestion]:
+        seen = self.get_seen_questions(username) if username else None
+        rng = rng or random.Random()
+
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
-        cursor.execute('''
-            SELECT id, question_level, question_type, question_text, 
-                   option1, option2, option3, option4, correct_option, explanation, hint
-            FROM english_questions 
-            WHERE question_level = ?
-            ORDER BY RANDOM()
-            LIMIT ?
-        ''', (level, limit))
+        # Из базы по индексу уровня берутся только id. Отбор по битовой карте
+        # и случайная выборка делаются здесь (порядок задаёт генератор
+        # сессии), а полные строки читаются лишь для выбранных вопросов
+        cursor.execute('SELECT group_concat(id) FROM english_questions WHERE question_level = ?', (level,))
+        id_list = cursor.fetchone()[0]
+        ids = np.array(id_list.split(',') if id_list else [], dtype=np.int64)
+
+        if seen:
+            seen_mask = seen.contains_many(ids)
+            new_ids, seen_ids = ids[~seen_mask], ids[seen_mask]
+        else:
+            new_ids, seen_ids = ids, ids[:0]
+
+        chosen = [int(new_ids[index]) for index in rng.sample(range(len(new_ids)), min(limit, len(new_ids)))]
+        # Все новые вопросы уровня закончились - добираем из уже заданных
+        if len(chosen) < limit:
+            chosen += [int(seen_ids[index])
+                       for index in rng.sample(range(len(seen_ids)), min(limit - len(chosen), len(seen_ids)))]
+
+        rows = []
+        if chosen:
+            cursor.execute(f'''
+                SELECT id, question_level, question_type, question_text, 
+                       option1, option2, option3, option4, correct_option, explanation, hint
+                FROM english_questions 
+                WHERE id IN ({', '.join('?' * len(chosen))})
+            ''', chosen)
+            rows_by_id = {row[0]: row for row in cursor.fetchall()}
+            rows = [rows_by_id[question_id] for question_id in chosen]
 
         questions = []
-        for row in cursor.fetchall():
+        for row in rows:
             question_id, question_level, question_type, question_text, \
                 option1, option2, option3, option4, correct_option, explanation, hint = row
 
@@ -950,6 +1800,79 @@ class PlayerDatabase:
         conn.close()
         return questions
 
+    # Хэш всех строк банка вопросов: по нему AssetWatcher отличает правку
+    # вопросов от записей прогресса в тот же файл базы
+    @staticmethod
+    def questions_fingerprint(db_path):
+        if not os.path.exists(db_path):
+            return None
+
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        digest = hashlib.sha256()
+        try:
+            cursor.execute('SELECT * FROM english_questions ORDER BY id')
+            for row in cursor:
+                digest.update(repr(row).encode())
+        except sqlite3.OperationalError:
+            return None
+        finally:
+            conn.close()
+        return digest.hexdigest()
+
+    def get_seen_questions(self, username: str) -> SeenQuestionsBitmap:
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT seen_questions FROM players WHERE username = ?
+        ''', (username,))
+
+        result = cursor.fetchone()
+        conn.close()
+
+        seen = SeenQuestionsBitmap.from_blob(result[0] if result else None)
+        seen.update(self.pending_seen.get(username, ()))
+        return seen
+
+    # Заданные вопросы копятся в памяти и записываются одним UPDATE в конце
+    # уровня, при выходе в меню или из игры (как журнал ответов)
+    def mark_questions_seen(self, username: str, question_ids):
+        # Резервные вопросы имеют id вида "backup_A1_1" и в банк не входят
+        ids = [int(question_id) for question_id in question_ids if str(question_id).isdigit()]
+        if not ids:
+            return
+
+        self.pending_seen.setdefault(username, set()).update(ids)
+        if not self._exit_hook_registered:
+            atexit.register(self.flush_seen_questions)
+            self._exit_hook_registered = True
+
+    def flush_seen_questions(self):
+        pending, self.pending_seen = self.pending_seen, {}
+        for username, ids in pending.items():
+            self.write_seen_questions(username, ids)
+
+    @telemetry.timed("db_write_ms")
+    def write_seen_questions(self, username, ids):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            SELECT seen_questions FROM players WHERE username = ?
+        ''', (username,))
+        result = cursor.fetchone()
+
+        if result is not None:
+            seen = SeenQuestionsBitmap.from_blob(result[0])
+            seen.update(ids)
+            cursor.execute('''
+                UPDATE players SET seen_questions = ? WHERE username = ?
+            ''', (seen.to_blob(), username))
+            conn.commit()
+
+        conn.close()
+
     def add_question(self, question: EnglishQuestion):
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
@@ -977,101 +1900,88 @@ class PlayerDatabase:
         conn.close()
 
     def create_or_update_player(self, username: str, english_level: str):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT OR REPLACE INTO players 
-            (username, english_level, sound_enabled) 
-            VALUES (?, ?, 1)
-        ''', (username, english_level))
-
-        conn.commit()
-        conn.close()
+        self.profiles.load(username, english_level)
 
     def get_player_sound_setting(self, username: str) -> bool:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT sound_enabled FROM players WHERE username = ?
-        ''', (username,))
-
-        result = cursor.fetchone()
-        conn.close()
-
-        return bool(result[0]) if result else True
+        return bool(self.profiles.get(username, 'sound_enabled', True))
 
     def update_player_sound_setting(self, username: str, enabled: bool):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            UPDATE players SET sound_enabled = ? WHERE username = ?
-        ''', (1 if enabled else 0, username))
-
-        conn.commit()
-        conn.close()
+        self.profiles.set(username, 'sound_enabled', 1 if enabled else 0)
+        self.profiles.flush(username)
 
     def update_player_progress(self, username: str, level: int, keys: int, score: int,
                                correct: int = 0, wrong: int = 0):
+        self.profiles.set(username, 'current_level', level)
+        self.profiles.set(username, 'current_keys', keys)
+        self.profiles.increment(username, 'total_score', score)
+        self.profiles.increment(username, 'correct_answers', correct)
+        self.profiles.increment(username, 'wrong_answers', wrong)
+        self.profiles.increment(username, 'games_played', 1)
+        self.profiles.flush(username)
+
+    def record_answer(self, player_name: str, question_id: str, correct: bool, attempts: int,
+                      hint_used: bool, latency_ms: float):
+        self.answer_log.record(player_name, question_id, correct, attempts, hint_used, latency_ms)
+
+    def flush_answer_events(self):
+        self.answer_log.flush()
+
+    def flush(self):
+        self.flush_answer_events()
+        self.flush_seen_questions()
+
+    def get_question_answer_stats(self, question_id: str):
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
         cursor.execute('''
-            UPDATE players 
-            SET current_level = ?,
-                current_keys = ?,
-                total_score = total_score + ?,
-                correct_answers = correct_answers + ?,
-                wrong_answers = wrong_answers + ?,
-                games_played = games_played + 1
-            WHERE username = ?
-        ''', (level, keys, score, correct, wrong, username))
+            SELECT answers, correct, hints, mean_latency_ms
+            FROM question_answer_stats
+            WHERE question_id = ?
+        ''', (str(question_id),))
 
-        conn.commit()
+        result = cursor.fetchone()
         conn.close()
+        return result
 
-    def save_high_score(self, player_name: str, score: int, level: int, english_level: str):
+    def get_player_answer_stats(self, player_name: str):
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
         cursor.execute('''
-            INSERT INTO high_scores (player_name, score, level, english_level)
-            VALUES (?, ?, ?, ?)
-        ''', (player_name, score, level, english_level))
+            SELECT answers, correct, hints, mean_latency_ms
+            FROM player_answer_stats
+            WHERE player_name = ?
+        ''', (player_name,))
 
-        conn.commit()
+        result = cursor.fetchone()
         conn.close()
+        return result
 
-    def get_high_scores(self, limit: int = 10):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def save_high_score(self, player_name: str, score: int, level: int, english_level: str):
+        self.leaderboard.submit(player_name, score, level, english_level)
+        if self.remote_leaderboard:
+            self.remote_leaderboard.submit(player_name, score, level, english_level)
 
-        cursor.execute('''
-            SELECT player_name, score, level, english_level, date_achieved
-            FROM high_scores 
-            ORDER BY score DESC 
-            LIMIT ?
-        ''', (limit,))
+    def get_high_scores(self, limit: int = 10, level: int = None, english_level: str = None):
+        if self.remote_leaderboard:
+            scores = self.remote_leaderboard.top(limit, level, english_level)
+            if scores is not None:
+                return scores
+        return self.leaderboard.top(limit, level, english_level)
 
-        scores = cursor.fetchall()
-        conn.close()
-        return scores
+    def prune_high_scores(self, keep_per_player: int):
+        return self.leaderboard.prune(keep_per_player)
 
     def clear_high_scores(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute('DELETE FROM high_scores')
-        cursor.execute('DELETE FROM sqlite_sequence WHERE name="high_scores"')
-
-        conn.commit()
-        conn.close()
+        self.leaderboard.clear()
 
 
 class EnglishQuizSystem:
-    def __init__(self):
+    def __init__(self, database=None, rng=None):
+        self.database = database
+        self.rng = rng or random.Random()
+        self.player_name = None
         self.all_questions = []
         self.current_question = None
         self.used_questions_per_game = set()
@@ -1079,12 +1989,12 @@ class EnglishQuizSystem:
         self.question_cycle = 0
         self.level_questions_cache = {}
 
-    def load_questions_from_database(self, level: str):
+    def load_questions_from_database(self, level: str, player_name: str = None):
         print(f"Загрузка вопросов для уровня {level} из базы данных...")
 
-        db = PlayerDatabase()
+        db = self.database or PlayerDatabase()
 
-        questions = db.get_questions_by_level(level, limit=50)
+        questions = db.get_questions_by_level(level, limit=50, username=player_name, rng=self.rng)
 
         if not questions:
             print(f"Предупреждение: не найдено вопросов для уровня {level}. Загружаем резервные...")
@@ -1143,8 +2053,9 @@ class EnglishQuizSystem:
     def create_c2_questions(self, count):
         return []
 
-    def initialize_game_questions(self, level: str):
-        level_questions = self.load_questions_from_database(level)
+    def initialize_game_questions(self, level: str, player_name: str = None):
+        self.player_name = player_name
+        level_questions = self.load_questions_from_database(level, player_name)
 
         if level in self.level_questions_cache:
             all_level_questions = self.level_questions_cache[level][:]
@@ -1152,7 +2063,7 @@ class EnglishQuizSystem:
             self.level_questions_cache[level] = level_questions[:]
             all_level_questions = level_questions
 
-        random.shuffle(all_level_questions)
+        self.rng.shuffle(all_level_questions)
 
         if len(all_level_questions) >= 10:
             selected = all_level_questions[:10]
@@ -1185,12 +2096,16 @@ class EnglishQuizSystem:
         pool_item = self.question_pool[key_index]
 
         if pool_item['used'] and pool_item['backup']:
-            return pool_item['backup']
+            question = pool_item['backup']
         elif pool_item['used']:
-            return pool_item['main']
+            question = pool_item['main']
+        else:
+            pool_item['used'] = True
+            question = pool_item['main']
 
-        pool_item['used'] = True
-        return pool_item['main']
+        if self.database and self.player_name:
+            self.database.mark_questions_seen(self.player_name, [question.id])
+        return question
 
     def check_answer(self, answer: str) -> Tuple[bool, str]:
         if not self.current_question:
@@ -1209,24 +2124,46 @@ class Button:
         self.text = text
         self.action = action
         self.enabled = True
+        self.visible = True
         self.state = "normal"
         self.custom_color = color
         self.font_size = font_size
+        self.layer = None
+        self.text_object = None
 
-    def draw(self):
+    def get_color(self):
         if self.custom_color:
-            color = self.custom_color
+            return self.custom_color
         elif self.state == "normal":
-            color = BUTTON_NORMAL
+            return BUTTON_NORMAL
         elif self.state == "hover":
-            color = BUTTON_HOVER
+            return BUTTON_HOVER
         else:
-            color = BUTTON_CLICKED
+            return BUTTON_CLICKED
 
+    def get_bounds(self):
         left = self.center_x - self.width / 2
         right = self.center_x + self.width / 2
         bottom = self.center_y - self.height / 2
         top = self.center_y + self.height / 2
+        return left, right, bottom, top
+
+    def create_text(self):
+        return arcade.Text(
+            self.text,
+            self.center_x,
+            self.center_y,
+            arcade.color.WHITE,
+            self.font_size,
+            align="center",
+            anchor_x="center",
+            anchor_y="center",
+            width=self.width - 20
+        )
+
+    def draw(self):
+        color = self.get_color()
+        left, right, bottom, top = self.get_bounds()
 
         arcade.draw_lrbt_rectangle_filled(left, right, bottom, top, color)
         arcade.draw_lrbt_rectangle_outline(left, right, bottom, top, arcade.color.WHITE, 2)
@@ -1244,17 +2181,129 @@ class Button:
         )
 
     def check_hover(self, x, y):
-        left = self.center_x - self.width / 2
-        right = self.center_x + self.width / 2
-        bottom = self.center_y - self.height / 2
-        top = self.center_y + self.height / 2
-
+        left, right, bottom, top = self.get_bounds()
         return left <= x <= right and bottom <= y <= top
 
     def on_click(self):
         if self.enabled and self.action:
             self.action()
 
+    def invalidate(self):
+        if self.layer:
+            self.layer.dirty = True
+
+    def set_state(self, state):
+        if self.state != state:
+            self.state = state
+            self.invalidate()
+
+    def set_enabled(self, enabled):
+        if self.enabled != enabled:
+            self.enabled = enabled
+            self.invalidate()
+
+    def set_visible(self, visible):
+        if self.visible != visible:
+            self.visible = visible
+            self.invalidate()
+
+    def set_custom_color(self, color):
+        if self.custom_color != color:
+            self.custom_color = color
+            self.invalidate()
+
+
+class UILayer:
+    # Кнопки создаются один раз на экран. Прямоугольники всех кнопок лежат
+    # в одном ShapeElementList и пересобираются только при смене состояния,
+    # а поиск кнопки под курсором идёт по сетке ячеек, а не по всему списку
+    def __init__(self, cell_size=UI_GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.widgets = []
+        self.grid = {}
+        self.shapes = None
+        self.dirty = True
+        self.hovered = None
+
+    def add(self, widget):
+        widget.layer = self
+        self.widgets.append(widget)
+
+        left, right, bottom, top = widget.get_bounds()
+        for cell_x in range(int(left // self.cell_size), int(right // self.cell_size) + 1):
+            for cell_y in range(int(bottom // self.cell_size), int(top // self.cell_size) + 1):
+                self.grid.setdefault((cell_x, cell_y), []).append(widget)
+
+        self.dirty = True
+        return widget
+
+    def clear(self):
+        for widget in self.widgets:
+            widget.layer = None
+        self.widgets = []
+        self.grid = {}
+        self.hovered = None
+        self.dirty = True
+
+    def widget_at(self, x, y):
+        cell = (int(x // self.cell_size), int(y // self.cell_size))
+        for widget in self.grid.get(cell, ()):
+            if widget.visible and widget.check_hover(x, y):
+                return widget
+        return None
+
+    def on_mouse_motion(self, x, y):
+        widget = self.widget_at(x, y)
+        if widget is not None and not widget.enabled:
+            widget = None
+
+        if widget is self.hovered:
+            return
+
+        if self.hovered:
+            self.hovered.set_state("normal")
+        if widget:
+            widget.set_state("hover")
+        self.hovered = widget
+
+    def on_mouse_press(self, x, y):
+        widget = self.widget_at(x, y)
+        if widget:
+            widget.on_click()
+        return widget
+
+    def reset_hover(self):
+        if self.hovered:
+            self.hovered.set_state("normal")
+            self.hovered = None
+
+    def rebuild(self):
+        self.shapes = arcade.shape_list.ShapeElementList()
+        for widget in self.widgets:
+            if not widget.visible:
+                continue
+
+            self.shapes.append(arcade.shape_list.create_rectangle_filled(
+                widget.center_x, widget.center_y, widget.width, widget.height, widget.get_color()
+            ))
+            self.shapes.append(arcade.shape_list.create_rectangle_outline(
+                widget.center_x, widget.center_y, widget.width, widget.height, arcade.color.WHITE, 2
+            ))
+
+            if widget.text_object is None:
+                widget.text_object = widget.create_text()
+
+        self.dirty = False
+
+    def draw(self):
+        if self.dirty:
+            self.rebuild()
+
+        self.shapes.draw()
+        for widget in self.widgets:
+            if widget.visible:
+                widget.text_object.draw()
+
 
 class Door:
     def __init__(self, x, y, locked=True, door_id=0):
@@ -1312,11 +2361,370 @@ class Door:
         self.color = arcade.color.GREEN
 
 
+class NavGrid:
+    # Проходимость для врага: клетка закрыта, если враг в её центре задевает
+    # стену или край мира. Строится один раз на уровень
+    def __init__(self, level, cell_size=NAV_CELL_SIZE, clearance=ENEMY_CLEARANCE):
+        self.cell_size = cell_size
+        self.columns = math.ceil(level.width / cell_size)
+        self.rows = math.ceil(level.height / cell_size)
+
+        centers_x = (np.arange(self.columns) + 0.5) * cell_size
+        centers_y = (np.arange(self.rows) + 0.5) * cell_size
+        blocked = np.zeros((self.rows, self.columns), dtype=bool)
+        blocked[:, (centers_x < clearance * 2) | (centers_x > level.width - clearance * 2)] = True
+        blocked[(centers_y < clearance * 2) | (centers_y > level.height - clearance * 2), :] = True
+
+        # Стена, расширенная на размер врага, закрывает клетки, чьи центры
+        # строго внутри неё
+        for x, y, width, height in level.walls.tolist():
+            first_column = math.floor((x - width // 2 - clearance) / cell_size - 0.5) + 1
+            last_column = math.ceil((x + width // 2 + clearance) / cell_size - 0.5) - 1
+            first_row = math.floor((y - height // 2 - clearance) / cell_size - 0.5) + 1
+            last_row = math.ceil((y + height // 2 + clearance) / cell_size - 0.5) - 1
+            blocked[max(0, first_row):last_row + 1, max(0, first_column):last_column + 1] = True
+
+        # Плоский массив байтов: поиск в ширину читает его поэлементно,
+        # а рой врагов проверяет клетки всем массивом
+        self.blocked_cells = blocked
+        self.blocked = bytes(blocked.ravel())
+
+    # Ближайшая открытая клетка (поиск в ширину и через закрытые клетки)
+    def nearest_open(self, cell):
+        seen = {cell}
+        frontier = deque([cell])
+        while frontier:
+            current = frontier.popleft()
+            if not self.blocked[current]:
+                return current
+            row, column = divmod(current, self.columns)
+            for neighbour_row, neighbour_column in ((row, column - 1), (row, column + 1), (row - 1, column), (row + 1, column)):
+                if 0 <= neighbour_row < self.rows and 0 <= neighbour_column < self.columns:
+                    neighbour = neighbour_row * self.columns + neighbour_column
+                    if neighbour not in seen:
+                        seen.add(neighbour)
+                        frontier.append(neighbour)
+        return cell
+
+    def cell_of(self, x, y):
+        column = min(self.columns - 1, max(0, int(x // self.cell_size)))
+        row = min(self.rows - 1, max(0, int(y // self.cell_size)))
+        return row * self.columns + column
+
+    def center_of(self, cell):
+        row, column = divmod(cell, self.columns)
+        return (column + 0.5) * self.cell_size, (row + 0.5) * self.cell_size
+
+    # Соседи по 8 направлениям без срезания углов у закрытых клеток
+    def neighbours(self, cell):
+        row, column = divmod(cell, self.columns)
+        blocked = self.blocked
+        left = column > 0 and not blocked[cell - 1]
+        right = column < self.columns - 1 and not blocked[cell + 1]
+        down = row > 0 and not blocked[cell - self.columns]
+        up = row < self.rows - 1 and not blocked[cell + self.columns]
+
+        result = []
+        if left:
+            result.append(cell - 1)
+        if right:
+            result.append(cell + 1)
+        if down:
+            result.append(cell - self.columns)
+            if left and not blocked[cell - self.columns - 1]:
+                result.append(cell - self.columns - 1)
+            if right and not blocked[cell - self.columns + 1]:
+                result.append(cell - self.columns + 1)
+        if up:
+            result.append(cell + self.columns)
+            if left and not blocked[cell + self.columns - 1]:
+                result.append(cell + self.columns - 1)
+            if right and not blocked[cell + self.columns + 1]:
+                result.append(cell + self.columns + 1)
+        return result
+
+
+class FlowField:
+    # Для каждой клетки в радиусе от игрока - следующая клетка кратчайшего
+    # пути к нему. Поиск в ширину идёт заново, только когда игрок перешёл
+    # в другую клетку, а враг читает своё направление за O(1)
+    def __init__(self, grid, radius=FLOW_FIELD_RADIUS):
+        self.grid = grid
+        self.radius = radius
+        self.target_cell = None
+        self.target = (0, 0)
+        self.next_cell = {}
+
+    def update(self, x, y):
+        self.target = (x, y)
+        cell = self.grid.cell_of(x, y)
+        if cell == self.target_cell:
+            return
+
+        self.target_cell = cell
+        next_cell = {cell: cell}
+        frontier = [cell]
+        for _ in range(self.radius):
+            following = []
+            for current in frontier:
+                for neighbour in self.grid.neighbours(current):
+                    if neighbour not in next_cell:
+                        next_cell[neighbour] = current
+                        following.append(neighbour)
+            frontier = following
+        self.next_cell = next_cell
+
+    # Точка, к которой врагу в (x, y) нужно двигаться, или None, если игрок
+    # вне досягаемости поля
+    def step(self, x, y):
+        cell = self.grid.cell_of(x, y)
+        if cell == self.target_cell:
+            return self.target
+
+        next_cell = self.next_cell.get(cell)
+        if next_cell is None:
+            return None
+        return self.grid.center_of(next_cell)
+
+
+class PathRequest:
+    def __init__(self, request_id, start, goal, goal_point, due_tick):
+        self.request_id = request_id
+        self.start = start
+        self.goal = goal
+        self.goal_point = goal_point
+        self.due_tick = due_tick
+        self.search = None
+
+
+class PathService:
+    # Общий для всех врагов уровня поиск путей. Запросы копятся в очереди и
+    # решаются в update() в пределах бюджета на тик; найденные пути
+    # хранятся в LRU-кэше (клетка старта, клетка цели) и переживают рестарты
+    def __init__(self, grid, cache_size=PATH_CACHE_SIZE, budget_ms=PATH_BUDGET_MS, latency=PATH_LATENCY_TICKS):
+        self.grid = grid
+        self.cache_size = cache_size
+        self.budget_ms = budget_ms
+        self.latency = latency
+        self.cache = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "overruns": 0}
+        self.reset()
+
+    def reset(self):
+        self.tick = 0
+        self.next_id = 0
+        self.queue = deque()
+        self.results = {}
+
+    def request(self, start_x, start_y, goal_x, goal_y):
+        self.next_id += 1
+        self.queue.append(PathRequest(
+            self.next_id, self.grid.cell_of(start_x, start_y), self.grid.cell_of(goal_x, goal_y),
+            (goal_x, goal_y), self.tick + self.latency
+        ))
+        return self.next_id
+
+    def cancel(self, request_id):
+        self.results.pop(request_id, None)
+        for request in self.queue:
+            if request.request_id == request_id:
+                self.queue.remove(request)
+                break
+
+    # Точки маршрута или None, пока срок запроса не наступил.
+    # Пустой список - цель недостижима
+    def result(self, request_id):
+        ready = self.results.get(request_id)
+        if ready is None or ready[0] > self.tick:
+            return None
+        del self.results[request_id]
+        return ready[1]
+
+    def update(self):
+        self.tick += 1
+        deadline = time.perf_counter() + self.budget_ms / 1000
+
+        while self.queue:
+            request = self.queue[0]
+            forced = request.due_tick <= self.tick
+            if not forced and time.perf_counter() >= deadline:
+                break
+
+            if request.search is None:
+                key = (request.start, request.goal)
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.finish(request, self.cache[key])
+                    continue
+                self.stats["misses"] += 1
+                request.search = self.jump_point_search(request.start, request.goal)
+
+            try:
+                while True:
+                    next(request.search)
+                    if not forced and time.perf_counter() >= deadline:
+                        break
+            except StopIteration as done:
+                if forced and time.perf_counter() > deadline:
+                    self.stats["overruns"] += 1
+                self.store((request.start, request.goal), done.value)
+                self.finish(request, done.value)
+
+    def store(self, key, cells):
+        self.cache[key] = cells
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def finish(self, request, cells):
+        self.queue.popleft()
+        if cells is None:
+            points = []
+        else:
+            points = [self.grid.center_of(cell) for cell in cells]
+            points.append(request.goal_point)
+        self.results[request.request_id] = (request.due_tick, points)
+
+    def walkable(self, column, row):
+        grid = self.grid
+        return 0 <= column < grid.columns and 0 <= row < grid.rows and not grid.blocked[row * grid.columns + column]
+
+    # Прыжок из (column, row) по направлению (dx, dy): следующая точка
+    # поворота или None. Диагональ - только если обе соседние клетки открыты
+    def jump(self, column, row, dx, dy, goal):
+        walkable = self.walkable
+        while True:
+            if not walkable(column, row):
+                return None
+            if (column, row) == goal:
+                return column, row
+
+            if dx and dy:
+                if (self.jump(column + dx, row, dx, 0, goal) is not None or
+                        self.jump(column, row + dy, 0, dy, goal) is not None):
+                    return column, row
+                if not (walkable(column + dx, row) and walkable(column, row + dy)):
+                    return None
+            elif dx:
+                if ((walkable(column, row - 1) and not walkable(column - dx, row - 1)) or
+                        (walkable(column, row + 1) and not walkable(column - dx, row + 1))):
+                    return column, row
+            else:
+                if ((walkable(column - 1, row) and not walkable(column - 1, row - dy)) or
+                        (walkable(column + 1, row) and not walkable(column + 1, row - dy))):
+                    return column, row
+
+            column += dx
+            row += dy
+
+    # Направления, которые стоит проверять из точки поворота при движении (dx, dy)
+    def pruned_directions(self, column, row, dx, dy):
+        walkable = self.walkable
+        if dx and dy:
+            vertical = walkable(column, row + dy)
+            horizontal = walkable(column + dx, row)
+            directions = []
+            if vertical:
+                directions.append((0, dy))
+            if horizontal:
+                directions.append((dx, 0))
+            if vertical and horizontal:
+                directions.append((dx, dy))
+            return directions
+
+        if dx:
+            ahead = walkable(column + dx, row)
+            up = walkable(column, row + 1)
+            down = walkable(column, row - 1)
+            directions = [(dx, 0)] if ahead else []
+            if ahead and up:
+                directions.append((dx, 1))
+            if ahead and down:
+                directions.append((dx, -1))
+            if up:
+                directions.append((0, 1))
+            if down:
+                directions.append((0, -1))
+            return directions
+
+        ahead = walkable(column, row + dy)
+        right = walkable(column + 1, row)
+        left = walkable(column - 1, row)
+        directions = [(0, dy)] if ahead else []
+        if ahead and right:
+            directions.append((1, dy))
+        if ahead and left:
+            directions.append((-1, dy))
+        if right:
+            directions.append((1, 0))
+        if left:
+            directions.append((-1, 0))
+        return directions
+
+    # A* по точкам поворота (Jump Point Search). Генератор отдаёт управление
+    # каждые PATH_SEARCH_SLICE раскрытий, результат - список клеток пути или None
+    def jump_point_search(self, start, goal):
+        columns = self.grid.columns
+        start = divmod(start, columns)[::-1]
+        goal = divmod(goal, columns)[::-1]
+
+        def octile(a, b):
+            dx = abs(a[0] - b[0])
+            dy = abs(a[1] - b[1])
+            return max(dx, dy) + (math.sqrt(2) - 1) * min(dx, dy)
+
+        counter = itertools.count()
+        open_heap = [(octile(start, goal), next(counter), start)]
+        cost = {start: 0}
+        parent = {start: None}
+        expanded = 0
+
+        while open_heap:
+            _, _, node = heapq.heappop(open_heap)
+            if node == goal:
+                path = []
+                while node is not None:
+                    path.append(node[1] * columns + node[0])
+                    node = parent[node]
+                return path[::-1]
+
+            expanded += 1
+            if expanded % PATH_SEARCH_SLICE == 0:
+                yield
+
+            column, row = node
+            previous = parent[node]
+            if previous is None:
+                directions = [
+                    (neighbour % columns - column, neighbour // columns - row)
+                    for neighbour in self.grid.neighbours(row * columns + column)
+                ]
+            else:
+                dx = (column > previous[0]) - (column < previous[0])
+                dy = (row > previous[1]) - (row < previous[1])
+                directions = self.pruned_directions(column, row, dx, dy)
+
+            for dx, dy in directions:
+                point = self.jump(column + dx, row + dy, dx, dy, goal)
+                if point is None:
+                    continue
+                new_cost = cost[node] + octile(node, point)
+                if new_cost < cost.get(point, math.inf):
+                    cost[point] = new_cost
+                    parent[point] = node
+                    heapq.heappush(open_heap, (new_cost + octile(point, goal), next(counter), point))
+        return None
+
+
 class Enemy:
-    def __init__(self, x, y, enemy_id=0, speed=ENEMY_SPEED, level=1):
+    def __init__(self, x, y, enemy_id=0, speed=ENEMY_SPEED, level=1, rng=None,
+                 world_width=SCREEN_WIDTH, world_height=SCREEN_HEIGHT):
+        self.rng = rng or random
+        self.world_width = world_width
+        self.world_height = world_height
         self.center_x = x
         self.center_y = y
-        self.color = random.choice([arcade.color.PURPLE, arcade.color.RED, arcade.color.ORANGE])
+        self.color = self.rng.choice([arcade.color.PURPLE, arcade.color.RED, arcade.color.ORANGE])
         self.width = 40
         self.height = 40
         self.speed = speed
@@ -1328,9 +2736,23 @@ class Enemy:
         self.target_x, self.target_y = self.patrol_path[self.current_target]
 
         self.time_at_target = 0
-        self.time_to_stay = random.uniform(0.3, 1.0)
+        self.time_to_stay = self.rng.uniform(0.3, 1.0)
         self.rotation_angle = 0
 
+        self.route = None
+        self.route_index = 0
+        self.path_request = None
+
+    # Точки патруля сдвигаются в ближайшие открытые клетки сетки навигации,
+    # а обход начинается с ближайшей к врагу точки, а не с первой общей для всех
+    def snap_to_grid(self, grid):
+        self.patrol_path = [grid.center_of(grid.nearest_open(grid.cell_of(x, y))) for x, y in self.patrol_path]
+        self.current_target = min(
+            range(len(self.patrol_path)),
+            key=lambda index: math.dist(self.patrol_path[index], (self.center_x, self.center_y))
+        )
+        self.target_x, self.target_y = self.patrol_path[self.current_target]
+
     def generate_complex_patrol_path(self, start_x, start_y, level):
         path = []
 
@@ -1364,10 +2786,13 @@ class Enemy:
                 (500, 300),
             ]
 
+        # Маршруты рассчитаны на мир размером с окно и растягиваются под размер уровня
+        scale_x = self.world_width / SCREEN_WIDTH
+        scale_y = self.world_height / SCREEN_HEIGHT
         for point in points:
             x, y = point
-            x = max(80, min(SCREEN_WIDTH - 80, x))
-            y = max(80, min(SCREEN_HEIGHT - 80, y))
+            x = max(80, min(self.world_width - 80, round(x * scale_x)))
+            y = max(80, min(self.world_height - 80, round(y * scale_y)))
             path.append((x, y))
 
         return path
@@ -1397,33 +2822,249 @@ class Enemy:
 
         arcade.draw_arc_filled(self.center_x, self.center_y - 5, 15, 8, arcade.color.BLACK, 0, 180)
 
-    def update(self, player_x, player_y, delta_time):
+    def update(self, player_x, player_y, delta_time, flow_field=None, paths=None):
         self.time_at_target += delta_time
         self.rotation_angle += delta_time * 0.5
 
+        chase_target = flow_field.step(self.center_x, self.center_y) if flow_field else None
+        if chase_target is not None:
+            self.leave_route(paths)
+            self.move_towards(chase_target[0], chase_target[1], delta_time)
+        elif paths:
+            self.follow_route(delta_time, paths)
+        else:
+            self.patrol(delta_time)
+
+        self.center_x = max(40, min(self.world_width - 40, self.center_x))
+        self.center_y = max(40, min(self.world_height - 40, self.center_y))
+
+    def move_towards(self, x, y, delta_time):
+        dx = x - self.center_x
+        dy = y - self.center_y
+        distance = math.sqrt(dx ** 2 + dy ** 2)
+        step = self.speed * delta_time
+        if distance <= step:
+            self.center_x, self.center_y = x, y
+        else:
+            self.center_x += dx / distance * step
+            self.center_y += dy / distance * step
+
+    def patrol(self, delta_time):
         dx = self.target_x - self.center_x
         dy = self.target_y - self.center_y
         distance = math.sqrt(dx ** 2 + dy ** 2)
 
         if distance < 10:
             if self.time_at_target >= self.time_to_stay:
-                self.current_target = (self.current_target + 1) % len(self.patrol_path)
-                self.target_x, self.target_y = self.patrol_path[self.current_target]
-                self.time_at_target = 0
-                self.time_to_stay = random.uniform(0.3, 1.0)
+                self.next_patrol_target()
         else:
             if distance > 0:
                 dx_normalized = dx / distance
                 dy_normalized = dy / distance
 
                 speed_factor = 1.0
-                current_speed = self.speed * speed_factor * delta_time
+                # Накопленный шаг планировщика ИИ не должен перелетать цель
+                current_speed = min(self.speed * speed_factor * delta_time, distance)
 
                 self.center_x += dx_normalized * current_speed
                 self.center_y += dy_normalized * current_speed
 
-        self.center_x = max(40, min(SCREEN_WIDTH - 40, self.center_x))
-        self.center_y = max(40, min(SCREEN_HEIGHT - 40, self.center_y))
+    def next_patrol_target(self):
+        self.current_target = (self.current_target + 1) % len(self.patrol_path)
+        self.target_x, self.target_y = self.patrol_path[self.current_target]
+        self.time_at_target = 0
+        self.time_to_stay = self.rng.uniform(0.3, 1.0)
+
+    # Патруль по маршрутам из PathService: пока путь к следующей точке
+    # не готов, враг ждёт на месте
+    def follow_route(self, delta_time, paths):
+        if self.route is None:
+            if self.path_request is None:
+                self.path_request = paths.request(self.center_x, self.center_y, self.target_x, self.target_y)
+            self.route = paths.result(self.path_request)
+            if self.route is None:
+                return
+            self.path_request = None
+            self.route_index = 0
+
+        if self.route_index < len(self.route):
+            x, y = self.route[self.route_index]
+            self.move_towards(x, y, delta_time)
+            if self.center_x == x and self.center_y == y:
+                self.route_index += 1
+            return
+
+        if self.time_at_target >= self.time_to_stay:
+            self.next_patrol_target()
+            self.route = None
+
+    def leave_route(self, paths):
+        if self.path_request is not None and paths:
+            paths.cancel(self.path_request)
+        self.path_request = None
+        self.route = None
+
+
+class EnemySwarm:
+    # Враги режима выживания: координаты, цели, скорости и таймеры ожидания
+    # лежат в массивах, и весь рой обновляется несколькими операциями numpy.
+    # Враги бродят между случайными открытыми клетками сетки навигации,
+    # не заходят в закрытые клетки и бегут к игроку, когда он рядом
+    colors = (arcade.color.PURPLE, arcade.color.RED, arcade.color.ORANGE)
+
+    def __init__(self, grid, count, speed, rng, avoid=(0, 0),
+                 world_width=SCREEN_WIDTH, world_height=SCREEN_HEIGHT):
+        self.grid = grid
+        self.rng = rng
+        self.world_width = world_width
+        self.world_height = world_height
+
+        rows, columns = np.nonzero(~grid.blocked_cells)
+        self.open_points = np.column_stack([(columns + 0.5) * grid.cell_size, (rows + 0.5) * grid.cell_size])
+        far = np.hypot(self.open_points[:, 0] - avoid[0], self.open_points[:, 1] - avoid[1]) >= SWARM_SPAWN_DISTANCE
+        spawn_points = self.open_points[far] if far.any() else self.open_points
+
+        self.positions = spawn_points[rng.integers(len(spawn_points), size=count)]
+        self.targets = self.random_points(count)
+        self.speeds = speed * rng.uniform(0.8, 1.2, count)
+        self.dwell = np.zeros(count)
+        self.stay = rng.uniform(0.3, 1.0, count)
+        self.color_indices = rng.integers(len(self.colors), size=count)
+        self.sprites = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    def random_points(self, count):
+        return self.open_points[self.rng.integers(len(self.open_points), size=count)]
+
+    def blocked_at(self, xs, ys):
+        grid = self.grid
+        columns = np.clip((xs // grid.cell_size).astype(np.int64), 0, grid.columns - 1)
+        rows = np.clip((ys // grid.cell_size).astype(np.int64), 0, grid.rows - 1)
+        return grid.blocked_cells[rows, columns]
+
+    def update(self, player_x, player_y, delta_time):
+        positions = self.positions
+        self.dwell += delta_time
+
+        to_player = np.array([player_x, player_y]) - positions
+        chasing = np.hypot(to_player[:, 0], to_player[:, 1]) < SWARM_AGGRO_RADIUS
+        goals = np.where(chasing[:, None], positions + to_player, self.targets)
+
+        offset = goals - positions
+        distance = np.hypot(offset[:, 0], offset[:, 1])
+        arrived = ~chasing & (distance < 10)
+
+        # Дошедшие до цели ждут своё время и выбирают новую
+        done = arrived & (self.dwell >= self.stay)
+        if done.any():
+            count = int(done.sum())
+            self.targets[done] = self.random_points(count)
+            self.dwell[done] = 0
+            self.stay[done] = self.rng.uniform(0.3, 1.0, count)
+
+        moving = ~arrived & (distance > 0)
+        step = np.minimum(self.speeds * delta_time, distance)
+        scale = np.divide(step, distance, out=np.zeros_like(distance), where=moving)
+
+        # Шаг по каждой оси отдельно: в закрытую клетку враг не заходит, а скользит вдоль стены
+        new_x = positions[:, 0] + offset[:, 0] * scale
+        new_x = np.where(self.blocked_at(new_x, positions[:, 1]), positions[:, 0], new_x)
+        new_y = positions[:, 1] + offset[:, 1] * scale
+        new_y = np.where(self.blocked_at(new_x, new_y), positions[:, 1], new_y)
+
+        # Упёршиеся в стену по обеим осям меняют цель
+        stuck = moving & ~chasing & (new_x == positions[:, 0]) & (new_y == positions[:, 1])
+        if stuck.any():
+            self.targets[stuck] = self.random_points(int(stuck.sum()))
+
+        positions[:, 0] = np.clip(new_x, 40, self.world_width - 40)
+        positions[:, 1] = np.clip(new_y, 40, self.world_height - 40)
+
+    # Касание игрока одним пакетным расчётом расстояний (тот же порог, что у врагов уровня)
+    def touches(self, x, y, radius=35):
+        dx = self.positions[:, 0] - x
+        dy = self.positions[:, 1] - y
+        return bool(np.any(dx * dx + dy * dy < radius * radius))
+
+    def draw(self, bounds=None):
+        if self.sprites is None:
+            self.sprites = arcade.SpriteList()
+            for color_index in self.color_indices.tolist():
+                self.sprites.append(arcade.SpriteCircle(20, self.colors[color_index]))
+
+        visible = np.ones(len(self), dtype=bool)
+        if bounds is not None:
+            left, bottom, right, top = bounds
+            xs = self.positions[:, 0]
+            ys = self.positions[:, 1]
+            visible = (xs >= left) & (xs <= right) & (ys >= bottom) & (ys <= top)
+
+        for sprite, (x, y), shown in zip(self.sprites, self.positions.tolist(), visible.tolist()):
+            sprite.visible = shown
+            if shown:
+                sprite.position = (x, y)
+        self.sprites.draw()
+
+
+class AIScheduler:
+    # Распределяет обновления врагов по тикам: корзина по расстоянию от
+    # видимой области задаёт шаг, а пропущенное время копится и отдаётся врагу целиком.
+    # Дальние враги сдвинуты по фазе на свой индекс, чтобы не обновляться
+    # все в один тик; не уложившиеся в бюджет ждут следующего тика первыми
+    def __init__(self, buckets=AI_LOD_BUCKETS, budget_ms=AI_BUDGET_MS):
+        self.buckets = buckets
+        self.budget_ms = budget_ms
+        self.tick = 0
+        self.pending = []
+        self.overdue = set()
+        self.stats = {"updated": 0, "skipped": 0, "deferred": 0}
+
+    def reset(self, count):
+        self.tick = 0
+        self.pending = [0.0] * count
+        self.overdue = set()
+
+    def stride_for(self, distance):
+        for max_distance, stride in self.buckets:
+            if distance < max_distance:
+                return stride
+        return self.buckets[-1][1]
+
+    # update_enemy(enemy, накопленное время). Без бюджета (запись и
+    # воспроизведение) результат зависит только от тиков, а не от скорости машины
+    def update(self, enemies, view_rect, delta_time, update_enemy, budget=True):
+        self.tick += 1
+        pending = self.pending
+        left, bottom, right, top = view_rect
+
+        due = []
+        for index, enemy in enumerate(enemies):
+            pending[index] += delta_time
+            outside_x = max(left - enemy.center_x, 0, enemy.center_x - right)
+            outside_y = max(bottom - enemy.center_y, 0, enemy.center_y - top)
+            stride = self.stride_for(math.hypot(outside_x, outside_y))
+            if stride == 1:
+                update_enemy(enemy, pending[index])
+                pending[index] = 0.0
+                self.stats["updated"] += 1
+            elif (self.tick + index) % stride == 0 or index in self.overdue:
+                due.append(index)
+            else:
+                self.stats["skipped"] += 1
+
+        deadline = time.perf_counter() + self.budget_ms / 1000
+        due.sort(key=lambda index: -pending[index])
+        self.overdue = set()
+        for position, index in enumerate(due):
+            if budget and time.perf_counter() >= deadline:
+                self.overdue = set(due[position:])
+                self.stats["deferred"] += len(self.overdue)
+                break
+            update_enemy(enemies[index], pending[index])
+            pending[index] = 0.0
+            self.stats["updated"] += 1
 
 
 class Platform:
@@ -1444,14 +3085,823 @@ class Platform:
         arcade.draw_lrbt_rectangle_outline(left, right, bottom, top, arcade.color.GREEN, 2)
 
 
+def build_level(walls, platforms, stations, enemies, player_start, door, enemy_speed, width, height, source):
+    # Массивы скомпилированного уровня - общие для карт Tiled и процедурных уровней
+    bricks = []
+    brick_offsets = [0]
+    for wall_x, wall_y, wall_width, wall_height in walls:
+        left = wall_x - wall_width // 2
+        right = wall_x + wall_width // 2
+        bottom = wall_y - wall_height // 2
+        top = wall_y + wall_height // 2
+        for brick_x in range(left, right, BRICK_SIZE):
+            for brick_y in range(bottom, top, BRICK_SIZE):
+                if (brick_x // BRICK_SIZE + brick_y // BRICK_SIZE) % 2 == 0:
+                    bricks.append((brick_x, brick_x + BRICK_SIZE, brick_y, brick_y + BRICK_SIZE))
+        brick_offsets.append(len(bricks))
+
+    # Сетка стен: для каждой ячейки - индексы стен, которые её задевают
+    # (смещения ячеек и общий список индексов, как в CSR)
+    columns = math.ceil(width / LEVEL_GRID_CELL_SIZE)
+    rows = math.ceil(height / LEVEL_GRID_CELL_SIZE)
+    cells = [[] for _ in range(columns * rows)]
+    for index, (wall_x, wall_y, wall_width, wall_height) in enumerate(walls):
+        first_column = max(0, (wall_x - wall_width // 2) // LEVEL_GRID_CELL_SIZE)
+        last_column = min(columns - 1, (wall_x + wall_width // 2) // LEVEL_GRID_CELL_SIZE)
+        first_row = max(0, (wall_y - wall_height // 2) // LEVEL_GRID_CELL_SIZE)
+        last_row = min(rows - 1, (wall_y + wall_height // 2) // LEVEL_GRID_CELL_SIZE)
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                cells[row * columns + column].append(index)
+
+    header = {
+        "source": source,
+        "width": width,
+        "height": height,
+        "cell_size": LEVEL_GRID_CELL_SIZE,
+        "columns": columns,
+        "rows": rows,
+        "enemy_speed": enemy_speed,
+    }
+    arrays = {
+        "walls": np.array(walls, dtype=np.int32).reshape(-1, 4),
+        "platforms": np.array(platforms, dtype=np.int32).reshape(-1, 4),
+        "stations": np.array(stations, dtype=np.int32).reshape(-1, 2),
+        "enemies": np.array(enemies, dtype=np.int32).reshape(-1, 2),
+        "player_start": np.array(player_start, dtype=np.int32),
+        "door": np.array(door, dtype=np.int32),
+        "bricks": np.array(bricks, dtype=np.int32).reshape(-1, 4),
+        "brick_offsets": np.array(brick_offsets, dtype=np.int32),
+        "grid_offsets": np.cumsum([0] + [len(cell) for cell in cells], dtype=np.int32),
+        "grid_walls": np.array([index for cell in cells for index in cell], dtype=np.int32),
+    }
+    return header, arrays
+
+
+class LevelData:
+    # Скомпилированный уровень: массивы numpy поверх mmap файла кэша.
+    # Стены и платформы остаются представлениями массивов, в кортежи
+    # переводятся только строки, которые вернул запрос; мелкие станции,
+    # враги и маркеры копируются сразу
+    def __init__(self, header, arrays, buffer=None):
+        self.header = header
+        self.arrays = arrays
+        self.buffer = buffer
+        self.enemy_speed = header.get("enemy_speed")
+        self.width = header["width"]
+        self.height = header["height"]
+        self.cell_size = header["cell_size"]
+        self.columns = header["columns"]
+        self.rows = header["rows"]
+        self.walls = arrays["walls"]
+        self.platforms = arrays["platforms"]
+        self.stations = [tuple(station) for station in arrays["stations"].tolist()]
+        self.enemies = [tuple(enemy) for enemy in arrays["enemies"].tolist()]
+        self.player_start = tuple(arrays["player_start"].tolist())
+        self.door = tuple(arrays["door"].tolist())
+
+    # Индексы стен, чьи ячейки сетки пересекают прямоугольник
+    def wall_indices_in(self, left, bottom, right, top):
+        offsets = self.arrays["grid_offsets"]
+        wall_indices = self.arrays["grid_walls"]
+        first_column = max(0, int(left // self.cell_size))
+        last_column = min(self.columns - 1, int(right // self.cell_size))
+        first_row = max(0, int(bottom // self.cell_size))
+        last_row = min(self.rows - 1, int(top // self.cell_size))
+
+        found = set()
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                cell = row * self.columns + column
+                found.update(wall_indices[offsets[cell]:offsets[cell + 1]].tolist())
+        return sorted(found)
+
+    def walls_in(self, left, bottom, right, top):
+        return self.rows_of(self.walls, self.wall_indices_in(left, bottom, right, top))
+
+    @staticmethod
+    def rows_of(array, indices):
+        return [tuple(row) for row in array[np.asarray(indices, dtype=np.intp)].tolist()]
+
+    @property
+    def fits_screen(self):
+        return self.width <= SCREEN_WIDTH and self.height <= SCREEN_HEIGHT
+
+    # Фигуры стен с кирпичами и платформ в порядке отрисовки - пары
+    # (фигура, кирпич ли это). Фигуры не трогают OpenGL, поэтому их можно
+    # строить в фоновом потоке
+    def static_shapes(self, wall_indices=None, platform_indices=None):
+        bricks = self.arrays["bricks"]
+        brick_offsets = self.arrays["brick_offsets"]
+        if wall_indices is None:
+            wall_indices = range(len(self.walls))
+        if platform_indices is None:
+            platform_indices = range(len(self.platforms))
+
+        shapes = []
+        for index, (wall_x, wall_y, wall_width, wall_height) in zip(wall_indices, self.rows_of(self.walls, wall_indices)):
+            shapes.append((arcade.shape_list.create_rectangle_filled(
+                wall_x, wall_y, wall_width, wall_height, arcade.color.DARK_BROWN
+            ), False))
+            shapes.append((arcade.shape_list.create_rectangle_outline(
+                wall_x, wall_y, wall_width, wall_height, arcade.color.BROWN, 2
+            ), False))
+
+            for left, right, bottom, top in bricks[brick_offsets[index]:brick_offsets[index + 1]].tolist():
+                shapes.append((arcade.shape_list.create_rectangle_filled(
+                    (left + right) / 2, (bottom + top) / 2, right - left, top - bottom, (101, 67, 33)
+                ), True))
+
+        for x, y, width, height in self.rows_of(self.platforms, platform_indices):
+            shapes.append((arcade.shape_list.create_rectangle_filled(
+                x, y, width, height, arcade.color.DARK_GREEN
+            ), False))
+            shapes.append((arcade.shape_list.create_rectangle_outline(
+                x, y, width, height, arcade.color.GREEN, 2
+            ), False))
+        return shapes
+
+    # Стены, кирпичи и платформы одним буфером в том же порядке, в котором
+    # их рисовали по одной: все фигуры - полосы треугольников, поэтому
+    # ShapeElementList рисует их за один вызов и порядок не меняется
+    def create_static_layer(self, draw_bricks=True, shapes=None):
+        if shapes is None:
+            shapes = self.static_shapes()
+
+        layer = arcade.shape_list.ShapeElementList()
+        for shape, is_brick in shapes:
+            if draw_bricks or not is_brick:
+                layer.append(shape)
+        return layer
+
+
+class LevelLoader:
+    # Читает карты Tiled и компилирует их в двоичный файл:
+    # заголовок (магия, длина JSON, JSON с описанием массивов) и выровненные
+    # массивы int32. Повторная загрузка того же содержимого отображает файл
+    # в память, а уже загруженные уровни берутся из памяти. Загрузчик может
+    # разделяться с потоком AssetWatcher, поэтому load() под блокировкой
+    def __init__(self, levels_dir=LEVELS_DIR, cache_dir=LEVEL_CACHE_DIR):
+        self.levels_dir = levels_dir
+        self.cache_dir = cache_dir
+        self.loaded = {}
+        self.current = {}
+        self.lock = threading.Lock()
+
+    def path_for(self, level_num):
+        return os.path.join(self.levels_dir, f"level{level_num}.tmj")
+
+    def load(self, level_num):
+        with self.lock:
+            return self._load(level_num)
+
+    def _load(self, level_num):
+        path = self.path_for(level_num)
+        with open(path, "rb") as file:
+            source = file.read()
+        digest = hashlib.sha256(source + LEVEL_FORMAT_VERSION.to_bytes(4, "little")).hexdigest()
+
+        level = self.loaded.get(digest)
+        if level is None:
+            level = self.loaded[digest] = self.read_or_compile(path, digest)
+
+        # Старая версия изменённого уровня больше не понадобится. Выгружается
+        # она только после успешной загрузки новой: недописанный файл
+        # оставляет в памяти последнюю рабочую версию (см. last_good)
+        previous = self.current.get(level_num)
+        self.current[level_num] = digest
+        if previous is not None and previous != digest and previous not in self.current.values():
+            self.loaded.pop(previous, None)
+        return level
+
+    def read_or_compile(self, path, digest):
+        cache_path = os.path.join(self.cache_dir, f"{digest}.bin")
+        level = None
+        if os.path.exists(cache_path):
+            try:
+                level = self.read_compiled(cache_path)
+            except (OSError, ValueError, struct.error, KeyError) as e:
+                print(f"Кэш уровня {cache_path} повреждён ({e}), компилируем заново")
+
+        if level is None:
+            header, arrays = self.compile(path)
+            self.write_compiled(cache_path, header, arrays)
+            level = LevelData(header, arrays)
+            print(f"Уровень {path} скомпилирован в {cache_path}")
+        return level
+
+    def last_good(self, level_num):
+        with self.lock:
+            return self.loaded.get(self.current.get(level_num))
+
+    def loaded_levels(self):
+        with self.lock:
+            return list(self.loaded.values())
+
+    def compile(self, path):
+        tiled_map = pytiled_parser.parse_map(Path(path))
+        width = tiled_map.map_size.width * tiled_map.tile_size.width
+        height = tiled_map.map_size.height * tiled_map.tile_size.height
+
+        objects = {}
+        for layer in tiled_map.layers:
+            if isinstance(layer, pytiled_parser.ObjectLayer):
+                objects.setdefault(layer.name.lower(), []).extend(layer.tiled_objects)
+
+        # В Tiled ось y направлена вниз, а прямоугольник задан левым верхним углом
+        def rectangles(name):
+            return [
+                (round(obj.coordinates.x + obj.size.width / 2), round(height - obj.coordinates.y - obj.size.height / 2),
+                 round(obj.size.width), round(obj.size.height))
+                for obj in objects.get(name, []) if isinstance(obj, pytiled_parser.tiled_object.Rectangle)
+            ]
+
+        def points(name):
+            return [
+                (round(obj.coordinates.x), round(height - obj.coordinates.y))
+                for obj in objects.get(name, []) if isinstance(obj, pytiled_parser.tiled_object.Point)
+            ]
+
+        walls = rectangles("walls")
+        stations = points("stations")
+        markers = {obj.name: (round(obj.coordinates.x), round(height - obj.coordinates.y))
+                   for obj in objects.get("markers", [])}
+
+        if len(stations) != KEYS_PER_LEVEL:
+            raise ValueError(f"{path}: нужно {KEYS_PER_LEVEL} станций вопросов, найдено {len(stations)}")
+        if "door" not in markers:
+            raise ValueError(f"{path}: на слое markers нет точки door")
+
+        return build_level(
+            walls, rectangles("platforms"), stations, points("enemies"),
+            markers.get("player", (100, 150)), markers["door"],
+            tiled_map.properties.get("enemy_speed") if tiled_map.properties else None,
+            width, height, os.path.basename(path)
+        )
+
+    def write_compiled(self, path, header, arrays):
+        header = dict(header, arrays={})
+        offset = 0
+        for name, array in arrays.items():
+            header["arrays"][name] = [array.dtype.str, list(array.shape), offset]
+            offset += (array.nbytes + 15) // 16 * 16
+
+        header_bytes = json.dumps(header).encode()
+        data_start = (len(LEVEL_CACHE_MAGIC) + 4 + len(header_bytes) + 15) // 16 * 16
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(LEVEL_CACHE_MAGIC)
+            file.write(struct.pack("<I", len(header_bytes)))
+            file.write(header_bytes)
+            for name, array in arrays.items():
+                file.seek(data_start + header["arrays"][name][2])
+                file.write(np.ascontiguousarray(array).tobytes())
+            file.truncate(data_start + offset)
+        os.replace(temp_path, path)
+
+    def read_compiled(self, path):
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if buffer[:len(LEVEL_CACHE_MAGIC)] != LEVEL_CACHE_MAGIC:
+            raise ValueError("неверная сигнатура")
+        header_length = struct.unpack_from("<I", buffer, len(LEVEL_CACHE_MAGIC))[0]
+        header_start = len(LEVEL_CACHE_MAGIC) + 4
+        header = json.loads(buffer[header_start:header_start + header_length])
+        data_start = (header_start + header_length + 15) // 16 * 16
+
+        arrays = {}
+        for name, (dtype, shape, offset) in header.pop("arrays").items():
+            dtype = np.dtype(dtype)
+            count = int(np.prod(shape, dtype=np.int64))
+            if count == 0:
+                arrays[name] = np.empty(shape, dtype)
+                continue
+            arrays[name] = np.frombuffer(buffer, dtype, count, data_start + offset).reshape(shape)
+        return LevelData(header, arrays, buffer)
+
+
+class AssetWatcher:
+    # Фоновый поток раз в ASSET_POLL_INTERVAL секунд сравнивает время
+    # изменения и размер карт levels/*.tmj и файла базы вопросов (опрос
+    # работает везде, в отличие от inotify). Изменённая карта сразу
+    # компилируется общим LevelLoader, и следующий start_level берёт её
+    # из памяти. База меняется и от записей самой игры, поэтому вопросы
+    # считаются изменёнными, только если изменился отпечаток их таблицы.
+    # GameView сравнивает номера версий со своими в start_level
+    shared = None
+
+    def __init__(self, db_path, level_loader=None, interval=ASSET_POLL_INTERVAL):
+        self.db_path = db_path
+        self.level_loader = level_loader or LevelLoader()
+        self.interval = interval
+        self.levels_version = 0
+        self.questions_version = 0
+        self.stats = self.scan()
+        self.questions_fingerprint = PlayerDatabase.questions_fingerprint(db_path)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="asset-watcher", daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def configure(cls, db_path):
+        if cls.shared:
+            cls.shared.close()
+        cls.shared = cls(db_path)
+        print(f"Отслеживаются изменения {cls.shared.level_loader.levels_dir} и {db_path}")
+        return cls.shared
+
+    def scan(self):
+        paths = [os.path.join(self.level_loader.levels_dir, name)
+                 for name in os.listdir(self.level_loader.levels_dir) if name.endswith(".tmj")]
+        stats = {}
+        for path in paths + [self.db_path]:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stats[path] = (stat.st_mtime_ns, stat.st_size)
+        return stats
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        stats = self.scan()
+        changed = [path for path, stat in stats.items() if self.stats.get(path) != stat]
+        self.stats = stats
+
+        for path in changed:
+            if path == self.db_path:
+                self.reload_questions()
+            else:
+                self.reload_level(path)
+
+    def reload_level(self, path):
+        name = os.path.basename(path)
+        if not (name.startswith("level") and name[5:-4].isdigit()):
+            return
+        try:
+            self.level_loader.load(int(name[5:-4]))
+        except Exception as e:
+            # Файл мог быть сохранён наполовину - следующее изменение попробует снова
+            print(f"Не удалось перезагрузить {path}: {e}")
+            return
+        self.levels_version += 1
+        print(f"Уровень {path} изменён, будет загружен при следующем старте уровня")
+
+    def reload_questions(self):
+        try:
+            fingerprint = PlayerDatabase.questions_fingerprint(self.db_path)
+        except sqlite3.Error as e:
+            print(f"Не удалось прочитать вопросы из {self.db_path}: {e}")
+            return
+        # Создание базы самой игрой (отпечатка ещё не было) правкой не считается
+        previous, self.questions_fingerprint = self.questions_fingerprint, fingerprint
+        if previous is not None and fingerprint != previous:
+            self.questions_version += 1
+            print(f"Вопросы в {self.db_path} изменены, будут загружены при следующем старте уровня")
+
+    def close(self):
+        self.stop_event.set()
+        self.thread.join()
+
+
+class WorldChunk:
+    # Кусок большого уровня: индексы стен и платформ, которые его задевают,
+    # станции с центром внутри куска и готовые фигуры. Слои для отрисовки
+    # собираются из фигур в основном потоке при первом показе
+    def __init__(self, key, walls, platforms, stations, wall_shapes, platform_shapes):
+        self.key = key
+        self.walls = walls
+        self.platforms = platforms
+        self.stations = stations
+        self.wall_shapes = wall_shapes
+        self.platform_shapes = platform_shapes
+        self.layers = {}
+
+    def layers_for(self, level, draw_bricks):
+        if draw_bricks not in self.layers:
+            self.layers[draw_bricks] = (
+                level.create_static_layer(draw_bricks, self.wall_shapes) if self.wall_shapes else None,
+                level.create_static_layer(draw_bricks, self.platform_shapes) if self.platform_shapes else None,
+            )
+        return self.layers[draw_bricks]
+
+
+class ChunkStreamer:
+    # Держит в памяти только куски вокруг камеры. Недостающие куски готовит
+    # фоновый поток, а основной забирает готовые на следующем кадре
+    def __init__(self, level, executor, chunk_cells=LEVEL_CHUNK_CELLS):
+        self.level = level
+        self.executor = executor
+        self.chunk_size = level.cell_size * chunk_cells
+        self.columns = math.ceil(level.width / self.chunk_size)
+        self.rows = math.ceil(level.height / self.chunk_size)
+        self.chunks = {}
+        self.pending = {}
+
+    def keys_in(self, left, bottom, right, top, radius=0):
+        first_column = max(0, int(left // self.chunk_size) - radius)
+        last_column = min(self.columns - 1, int(right // self.chunk_size) + radius)
+        first_row = max(0, int(bottom // self.chunk_size) - radius)
+        last_row = min(self.rows - 1, int(top // self.chunk_size) + radius)
+        return [
+            (column, row)
+            for row in range(first_row, last_row + 1)
+            for column in range(first_column, last_column + 1)
+        ]
+
+    # Выполняется в фоновом потоке
+    def prepare(self, key):
+        level = self.level
+        column, row = key
+        left = column * self.chunk_size
+        bottom = row * self.chunk_size
+        right = left + self.chunk_size
+        top = bottom + self.chunk_size
+
+        # Сетка стен выровнена по кускам, так что правая и верхняя границы
+        # берутся на пиксель внутрь, чтобы не захватить ячейки соседей
+        walls = np.asarray(level.wall_indices_in(left, bottom, right - 1, top - 1), dtype=np.intp)
+        walls = walls[self.overlaps(level.walls[walls], left, bottom, right, top)].tolist()
+        platforms = np.nonzero(self.overlaps(level.platforms, left, bottom, right, top))[0].tolist()
+
+        stations = level.arrays["stations"]
+        station_mask = ((stations[:, 0] >= left) & (stations[:, 0] < right) &
+                        (stations[:, 1] >= bottom) & (stations[:, 1] < top))
+        stations = np.nonzero(station_mask)[0].tolist()
+
+        return WorldChunk(
+            key, walls, platforms, stations,
+            level.static_shapes(walls, []), level.static_shapes([], platforms),
+        )
+
+    # Маска прямоугольников (строки x, y, ширина, высота), задевающих кусок
+    @staticmethod
+    def overlaps(rects, left, bottom, right, top):
+        half_widths = rects[:, 2] // 2
+        half_heights = rects[:, 3] // 2
+        return ((rects[:, 0] + half_widths > left) & (rects[:, 0] - half_widths < right) &
+                (rects[:, 1] + half_heights > bottom) & (rects[:, 1] - half_heights < top))
+
+    # Заказывает куски вокруг видимой области, забирает готовые и выгружает
+    # дальние. Видимый кусок нужен сразу, чтобы стены не появлялись с
+    # опозданием; обычно он уже готов благодаря соседям. Если поток до него
+    # не дошёл, кусок строится здесь, а не ждёт очереди соседей, так что
+    # основной поток ждёт не дольше одного куска, который поток уже строит
+    def update(self, view_rect):
+        for key in self.keys_in(*view_rect):
+            if key in self.chunks:
+                continue
+            future = self.pending.pop(key, None)
+            if future is None or future.cancel():
+                self.chunks[key] = self.prepare(key)
+            else:
+                self.chunks[key] = future.result()
+
+        for key in self.keys_in(*view_rect, radius=CHUNK_PREFETCH_RADIUS):
+            if key not in self.chunks and key not in self.pending:
+                self.pending[key] = self.executor.submit(self.prepare, key)
+
+        for key, future in list(self.pending.items()):
+            if future.done():
+                del self.pending[key]
+                self.chunks[key] = future.result()
+
+        keep = set(self.keys_in(*view_rect, radius=CHUNK_KEEP_RADIUS))
+        for key in [key for key in self.chunks if key not in keep]:
+            del self.chunks[key]
+        for key in [key for key in self.pending if key not in keep]:
+            if self.pending[key].cancel():
+                del self.pending[key]
+
+    def visible(self, view_rect):
+        return [self.chunks[key] for key in self.keys_in(*view_rect) if key in self.chunks]
+
+    def close(self):
+        for future in self.pending.values():
+            future.cancel()
+        self.pending = {}
+        self.chunks = {}
+
+
+def jump_arc(initial_velocity, ticks=JUMP_ARC_TICKS):
+    # Смещение по вертикали после каждого тика прыжка (или падения при нулевой
+    # скорости) по тем же формулам, что в apply_gravity и update_player_physics
+    velocities = np.maximum(initial_velocity - GRAVITY * SIMULATION_DT * 60 * np.arange(1, ticks + 1), -15)
+    return np.cumsum(velocities * SIMULATION_DT * 40), velocities
+
+
+class ReachabilityAnalyzer:
+    # Быстрая проверка проходимости уровня. Поверхности, на которых можно
+    # стоять (пол и платформы, разрезанные стенами), - вершины графа; ребро
+    # есть, если дуга прыжка (или падения с края) из одной поверхности
+    # опускается на другую и прямоугольник игрока по пути не задевает стен.
+    # Станция или дверь достижима, если до неё можно дотянуться прыжком
+    # вверх с достижимой поверхности. Скольжение вдоль стен не учитывается,
+    # поэтому часть проходимых раскладок модель отбрасывает
+    jump_offsets, jump_velocities = jump_arc(JUMP_POWER)
+    fall_offsets, fall_velocities = jump_arc(0)
+    jump_apex = int(np.argmax(jump_velocities <= 0))
+
+    def __init__(self, level):
+        physics = PhysicsEngine()
+        self.level = level
+        self.half_width = physics.player_width // 2
+        self.half_height = physics.player_height // 2
+        self.step = PLAYER_SPEED * SIMULATION_DT
+        self.floor_y = 45 + self.half_height
+        self.ceiling_y = level.header["height"] - 70
+        self.max_x = level.header["width"] - 35
+
+        walls = level.arrays["walls"]
+        self.wall_left = walls[:, 0] - walls[:, 2] // 2
+        self.wall_right = walls[:, 0] + walls[:, 2] // 2
+        self.wall_bottom = walls[:, 1] - walls[:, 3] // 2
+        self.wall_top = walls[:, 1] + walls[:, 3] // 2
+
+        self.surfaces = self.find_surfaces()
+        self.edges = {}
+        self.reachable = set()
+        self.unreachable_stations = []
+        self.door_reachable = False
+
+    @property
+    def ok(self):
+        return not self.unreachable_stations and self.door_reachable
+
+    # Поверхность: (y центра стоящего игрока, левая и правая граница x, толщина платформы)
+    def find_surfaces(self):
+        candidates = [(self.floor_y, 35, self.max_x, None)]
+        for x, y, width, height in self.level.platforms.tolist():
+            candidates.append((y + height // 2 + self.half_height, x - width // 2, x + width // 2, height))
+
+        surfaces = []
+        for y, left, right, thickness in candidates:
+            # Стены на уровне тела игрока делят поверхность на части
+            blocked = (self.wall_bottom < y + self.half_height) & (self.wall_top > y - self.half_height)
+            segments = [(left, right)]
+            for wall_left, wall_right in zip(self.wall_left[blocked].tolist(), self.wall_right[blocked].tolist()):
+                cut_left, cut_right = wall_left - self.half_width, wall_right + self.half_width
+                segments = [
+                    part for seg_left, seg_right in segments
+                    for part in ((seg_left, min(seg_right, cut_left)), (max(seg_left, cut_right), seg_right))
+                    if part[0] <= part[1]
+                ]
+            surfaces += [(y, seg_left, seg_right, thickness) for seg_left, seg_right in segments]
+        return surfaces
+
+    # Пересечения прямоугольника игрока со стенами для массивов позиций:
+    # результат на одну ось больше, последняя ось - стены. Сначала стены
+    # отбираются по общей рамке всех позиций, обычно их остаётся одна-две
+    def wall_hits(self, xs, ys):
+        near = ((self.wall_left < xs.max() + self.half_width) & (self.wall_right > xs.min() - self.half_width) &
+                (self.wall_bottom < ys.max() + self.half_height) & (self.wall_top > ys.min() - self.half_height))
+        xs, ys = xs[..., None], ys[..., None]
+        return ((xs + self.half_width > self.wall_left[near]) & (xs - self.half_width < self.wall_right[near]) &
+                (ys + self.half_height > self.wall_bottom[near]) & (ys - self.half_height < self.wall_top[near]))
+
+    # Число тиков полёта от start_left..start_right до поверхности target или None.
+    # Перебираются несколько точек старта и приземления и два способа
+    # управления в воздухе: лететь к цели сразу или как можно позже
+    def arc_ticks(self, y, start_left, start_right, target, offsets, velocities):
+        target_y, target_left, target_right, thickness = target
+        if target_y - (thickness or 0) > y + offsets.max():
+            return None
+        heights = np.minimum(y + offsets, self.ceiling_y)
+
+        if thickness is None:
+            # На пол игрок встаёт на первом же тике ниже уровня пола
+            landing = np.nonzero(heights <= target_y)[0][:1]
+        else:
+            # На платформу - если низ игрока внутри неё на спуске, а по x игрок
+            # перекрывает платформу хотя бы краем
+            landing = np.nonzero((velocities <= 0) & (heights <= target_y) & (heights >= target_y - thickness))[0]
+            target_left -= self.half_height
+            target_right += self.half_height
+        if not len(landing):
+            return None
+        landing = landing + 1
+
+        gap = max(target_left - start_right, start_left - target_right, 0)
+        if gap > landing[-1] * self.step:
+            return None
+
+        starts = self.sample_range(start_left, start_right)
+        ends = self.sample_range(target_left, target_right)
+        distances = (ends[None, :] - starts[:, None]).ravel()
+        starts = np.repeat(starts, len(ends))
+        needed = np.ceil(np.abs(distances) / self.step)
+
+        # Первый тик приземления, к которому игрок успевает долететь по x
+        choice = np.searchsorted(landing, needed)
+        possible = choice < len(landing)
+        if not possible.any():
+            return None
+        starts, distances, needed = starts[possible], distances[possible], needed[possible]
+        arrival = landing[choice[possible]]
+
+        starts = np.concatenate((starts, starts))
+        distances = np.concatenate((distances, distances))
+        arrival = np.concatenate((arrival, arrival))
+        delay = np.concatenate((np.zeros_like(needed), arrival[:len(needed)] - needed))
+
+        ticks = np.arange(1, arrival.max() + 1)
+        moves = np.clip((ticks[None, :] - delay[:, None]) * self.step, 0, np.abs(distances)[:, None])
+        xs = starts[:, None] + np.copysign(moves, distances[:, None])
+        # После приземления путь не проверяется: там повторяется точка приземления
+        in_flight = ticks[None, :] <= arrival[:, None]
+        xs = np.where(in_flight, xs, xs[np.arange(len(xs)), arrival - 1][:, None])
+        ys = np.where(in_flight, heights[:len(ticks)][None, :], heights[arrival - 1][:, None])
+
+        blocked = self.wall_hits(xs, ys).any(axis=(1, 2))
+        if blocked.all():
+            return None
+        return int(arrival[~blocked].min())
+
+    @staticmethod
+    def sample_range(left, right, spacing=40, limit=3):
+        if right <= left:
+            return np.array([float(left)])
+        count = min(limit, int((right - left) // spacing) + 2)
+        return left + np.arange(count) * ((right - left) / (count - 1))
+
+    def neighbours(self, index):
+        if index in self.edges:
+            return self.edges[index]
+
+        y, left, right, thickness = self.surfaces[index]
+        starts = [(self.jump_offsets, self.jump_velocities, left, right)]
+        if thickness is not None:
+            # Сойти с края платформы влево или вправо
+            edge = self.half_width + 1
+            starts += [(self.fall_offsets, self.fall_velocities, x, x)
+                       for x in (left - edge, right + edge) if 35 <= x <= self.max_x]
+
+        found = {}
+        for target_index, target in enumerate(self.surfaces):
+            if target_index == index:
+                continue
+            for offsets, velocities, start_left, start_right in starts:
+                ticks = self.arc_ticks(y, start_left, start_right, target, offsets, velocities)
+                if ticks is not None and ticks < found.get(target_index, JUMP_ARC_TICKS + 1):
+                    found[target_index] = ticks
+        self.edges[index] = found
+        return found
+
+    def touch_distance(self, surface, x, y):
+        surface_y, left, right, thickness = surface
+        column_x = min(max(x, left), right)
+        if abs(column_x - x) >= TOUCH_DISTANCE or not surface_y - TOUCH_DISTANCE < y < \
+                surface_y + self.jump_offsets[self.jump_apex] + TOUCH_DISTANCE:
+            return TOUCH_DISTANCE
+
+        heights = np.concatenate(([surface_y], np.minimum(surface_y + self.jump_offsets[:self.jump_apex], self.ceiling_y)))
+
+        # Прыжок вверх обрывается на первой стене над головой
+        hits = np.nonzero(self.wall_hits(np.full(len(heights), float(column_x)), heights).any(axis=1))[0]
+        if len(hits):
+            heights = heights[:max(1, hits[0])]
+        return float(np.min(np.hypot(column_x - x, heights - y)))
+
+    def start_surface(self):
+        start_x, start_y = self.level.player_start
+        below = [
+            index for index, (y, left, right, thickness) in enumerate(self.surfaces)
+            if y <= start_y and left - self.half_height <= start_x <= right + self.half_height
+        ]
+        return max(below, key=lambda index: self.surfaces[index][0]) if below else None
+
+    # Обход в ширину от поверхности старта; при stop_early поиск
+    # заканчивается, как только найдены все станции и дверь
+    def analyze(self, stop_early=True):
+        targets = dict(enumerate(self.level.stations))
+        targets["door"] = self.level.door
+        self.reachable = set()
+
+        start = self.start_surface()
+        queue = deque()
+        if start is not None:
+            queue.append(start)
+            self.reachable.add(start)
+
+        while queue:
+            index = queue.popleft()
+            for name, (x, y) in list(targets.items()):
+                if self.touch_distance(self.surfaces[index], x, y) < TOUCH_DISTANCE:
+                    del targets[name]
+            if stop_early and not targets:
+                break
+
+            for target in self.neighbours(index):
+                if target not in self.reachable:
+                    self.reachable.add(target)
+                    queue.append(target)
+
+        self.door_reachable = "door" not in targets
+        self.unreachable_stations = sorted(name for name in targets if name != "door")
+        return self.ok
+
+
+class MazeGenerator:
+    # Случайный уровень в тех же массивах, что и карты Tiled. Раскладка
+    # строится заново, пока ReachabilityAnalyzer не подтвердит, что все
+    # станции и дверь достижимы с точки старта
+    def __init__(self, rng, max_attempts=MAZE_MAX_ATTEMPTS, width=SCREEN_WIDTH, height=SCREEN_HEIGHT):
+        self.rng = rng
+        self.max_attempts = max_attempts
+        self.width = width
+        self.height = height
+
+    def generate(self, level_num):
+        started = time.perf_counter()
+        for attempt in range(1, self.max_attempts + 1):
+            level = self.create_layout(level_num)
+            if ReachabilityAnalyzer(level).analyze():
+                print(f"Сгенерирован уровень {level_num}: попыток {attempt}, "
+                      f"{(time.perf_counter() - started) * 1000:.1f} мс")
+                level.header["attempts"] = attempt
+                return level
+        raise RuntimeError(f"Не удалось построить проходимый уровень {level_num} за {self.max_attempts} попыток")
+
+    def create_layout(self, level_num):
+        rng = self.rng
+        difficulty = LEVEL_DIFFICULTY.get(level_num, LEVEL_DIFFICULTY[1])
+        player_start = (100, 150)
+        door = (self.width - 100, 100)
+
+        walls = [
+            (self.width // 2, self.height - 30, self.width, 60),
+            (30, self.height // 2, 60, self.height),
+            (self.width - 30, self.height // 2, 60, self.height),
+        ]
+
+        # По платформе на каждую полосу по ширине; хотя бы одна достаточно
+        # низко, чтобы на неё можно было запрыгнуть с пола
+        slot = (self.width - 200) // KEYS_PER_LEVEL
+        platforms = [
+            (100 + slot * i + slot // 2 + rng.randint(-20, 20), rng.randrange(190, 361, 10), rng.randrange(100, 141, 10), 20)
+            for i in range(KEYS_PER_LEVEL)
+        ]
+        low = rng.randrange(KEYS_PER_LEVEL)
+        platforms[low] = platforms[low][:1] + (rng.randrange(190, 231, 10),) + platforms[low][2:]
+
+        stations = [(x, y + 70) for x, y, width, height in platforms]
+        rng.shuffle(stations)
+
+        # Запретные зоны для стен: место над платформами, станции, старт и дверь
+        keep_clear = [(x, y + 45, width + 40, 110) for x, y, width, height in platforms]
+        keep_clear += [(x, y, 90, 90) for x, y in stations]
+        keep_clear += [(player_start[0], 110, 140, 140), (door[0], door[1], 140, 140)]
+
+        for _ in range(min(6, 2 + level_num)):
+            for _ in range(20):
+                if rng.random() < 0.5:
+                    wall = (rng.randrange(150, self.width - 150), rng.randrange(150, self.height - 150),
+                            30, rng.randrange(150, 301, 10))
+                else:
+                    wall = (rng.randrange(200, self.width - 200), rng.randrange(150, self.height - 100),
+                            rng.randrange(150, 401, 10), 30)
+                if not any(self.overlaps(wall, zone) for zone in keep_clear):
+                    walls.append(wall)
+                    break
+
+        enemies = []
+        for _ in range(MAZE_ENEMY_ATTEMPTS):
+            if len(enemies) == difficulty['enemies']:
+                break
+            x, y = rng.randrange(100, self.width - 100), rng.randrange(100, self.height - 100)
+            if math.hypot(x - player_start[0], y - player_start[1]) > 250 and \
+                    not any(self.overlaps((x, y, 60, 60), wall) for wall in walls):
+                enemies.append((x, y))
+        if len(enemies) < difficulty['enemies']:
+            raise RuntimeError(f"Не удалось расставить врагов уровня {level_num} "
+                               f"за {MAZE_ENEMY_ATTEMPTS} попыток")
+
+        header, arrays = build_level(walls, platforms, stations, enemies, player_start, door,
+                                     difficulty['enemy_speed'], self.width, self.height, f"procedural:{level_num}")
+        return LevelData(header, arrays)
+
+    @staticmethod
+    def overlaps(a, b):
+        return abs(a[0] - b[0]) * 2 < a[2] + b[2] and abs(a[1] - b[1]) * 2 < a[3] + b[3]
+
+
 class ParticleSystem:
-    def __init__(self):
+    def __init__(self, rng=None):
+        self.rng = rng or random
         self.particles = []
+        self.count_scale = 1.0
 
     def create_explosion(self, x, y, color=arcade.color.GOLD, count=20):
+        count = max(1, int(count * self.count_scale))
         for _ in range(count):
-            angle = random.uniform(0, 2 * math.pi)
-            speed = random.uniform(1, 5)
+            angle = self.rng.uniform(0, 2 * math.pi)
+            speed = self.rng.uniform(1, 5)
             particle = {
                 'x': x,
                 'y': y,
@@ -1459,33 +3909,382 @@ class ParticleSystem:
                 'dy': math.sin(angle) * speed,
                 'color': color,
                 'life': 1.0,
-                'size': random.uniform(2, 6)
+                'size': self.rng.uniform(2, 6)
             }
             self.particles.append(particle)
 
-    def update(self, delta_time):
-        for particle in self.particles[:]:
-            particle['x'] += particle['dx']
-            particle['y'] += particle['dy']
-            particle['life'] -= delta_time
-            particle['dy'] -= 0.1
+    def update(self, delta_time):
+        for particle in self.particles[:]:
+            particle['x'] += particle['dx']
+            particle['y'] += particle['dy']
+            particle['life'] -= delta_time
+            particle['dy'] -= 0.1
+
+            if particle['life'] <= 0:
+                self.particles.remove(particle)
+
+    def draw(self, bounds=None):
+        for particle in self.particles:
+            if bounds is not None:
+                left, bottom, right, top = bounds
+                if not (left <= particle['x'] <= right and bottom <= particle['y'] <= top):
+                    continue
+
+            alpha = int(255 * particle['life'])
+            color_with_alpha = (
+                particle['color'][0],
+                particle['color'][1],
+                particle['color'][2],
+                alpha
+            )
+            arcade.draw_circle_filled(
+                particle['x'], particle['y'],
+                particle['size'], color_with_alpha
+            )
+
+
+class QualityManager:
+    # Следит за 95-м процентилем времени кадра и понижает уровень качества,
+    # если кадры не укладываются в бюджет, и повышает, когда запас вернулся
+    def __init__(self, budget_ms=FRAME_BUDGET_MS, sample_frames=QUALITY_SAMPLE_FRAMES):
+        self.budget_ms = budget_ms
+        self.frame_times = deque(maxlen=sample_frames)
+        self.tier = 0
+        self.pinned = False
+        self.last_p95 = 0
+        self.last_change = time.perf_counter()
+
+    @property
+    def draw_bricks(self):
+        return self.tier < 1
+
+    @property
+    def particle_scale(self):
+        return 0.5 if self.tier >= 2 else 1.0
+
+    @property
+    def animate_stations(self):
+        return self.tier < 3
+
+    @property
+    def tier_name(self):
+        return QUALITY_TIERS[self.tier]
+
+    def record(self, frame_ms):
+        if self.pinned:
+            return
+
+        self.frame_times.append(frame_ms)
+        if len(self.frame_times) < self.frame_times.maxlen:
+            return
+
+        self.last_p95 = percentile(sorted(self.frame_times), 0.95)
+
+        now = time.perf_counter()
+        if now - self.last_change < QUALITY_COOLDOWN:
+            return
+
+        if self.last_p95 > self.budget_ms and self.tier < len(QUALITY_TIERS) - 1:
+            self.set_tier(self.tier + 1, now)
+        elif self.last_p95 < self.budget_ms * QUALITY_HEADROOM and self.tier > 0:
+            self.set_tier(self.tier - 1, now)
+
+    def set_tier(self, tier, now):
+        print(f"Качество графики: {self.tier_name} -> {QUALITY_TIERS[tier]} "
+              f"(p95 кадра {self.last_p95:.1f} мс, бюджет {self.budget_ms:.1f} мс)")
+        self.tier = tier
+        self.last_change = now
+        self.frame_times.clear()
+
+
+class GLDrawCounter:
+    # Считает настоящие вызовы glDraw*: arcade.gl вызывает их через модуль
+    # pyglet.gl, а текст pyglet рисует через pyglet.graphics
+    def __init__(self):
+        self.calls = 0
+        self.originals = []
+
+    def install(self):
+        for module in (pyglet.gl, pyglet.graphics, pyglet.graphics.vertexdomain):
+            for name in dir(module):
+                if name.startswith("glDraw"):
+                    function = getattr(module, name)
+                    self.originals.append((module, name, function))
+                    setattr(module, name, self.count_calls(function))
+
+    def remove(self):
+        for module, name, function in self.originals:
+            setattr(module, name, function)
+        self.originals = []
+
+    def count_calls(self, function):
+        def counted(*args):
+            self.calls += 1
+            return function(*args)
+        return counted
+
+
+class FrameProfiler:
+    # Замеряет время фаз update/on_draw и число вызовов glDraw* за кадр -
+    # так учитываются и ShapeElementList, SpriteList и arcade.Text, а не
+    # только arcade.draw_*. Пока профайлер выключен, GameView не вызывает
+    # его вовсе, а счётчики GL ставятся только на время включения
+    def __init__(self, sample_frames=PROFILER_SAMPLE_FRAMES):
+        self.enabled = False
+        self.sample_frames = sample_frames
+        self.samples = {}
+        self.draw_counter = GLDrawCounter()
+        self.draw_call_samples = deque(maxlen=sample_frames)
+        self.frames = 0
+        self.lines = []
+        self.suspended = False
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def enable(self):
+        self.samples = {}
+        self.draw_call_samples.clear()
+        self.frames = 0
+        self.lines = ["collecting..."]
+        self.install_counters()
+        print("Профайлер кадра включён")
+
+    def disable(self):
+        self.remove_counters()
+        print("Профайлер кадра выключен")
+
+    # Пока GameView скрыт (вопрос, меню), счётчики снимаются, а замеры сохраняются
+    def suspend(self):
+        if self.enabled:
+            self.remove_counters()
+            self.suspended = True
+
+    def resume(self):
+        if self.suspended:
+            self.suspended = False
+            self.install_counters()
+
+    def install_counters(self):
+        self.draw_counter.install()
+        self.draw_counter.calls = 0
+        self.enabled = True
+
+    def remove_counters(self):
+        self.draw_counter.remove()
+        self.enabled = False
+
+    def run(self, group, phases, *args):
+        for name, phase in phases:
+            start = time.perf_counter()
+            phase(*args)
+            elapsed = (time.perf_counter() - start) * 1000
+
+            key = f"{group}.{name}"
+            if key not in self.samples:
+                self.samples[key] = deque(maxlen=self.sample_frames)
+            self.samples[key].append(elapsed)
+
+    def end_frame(self):
+        self.draw_call_samples.append(self.draw_counter.calls)
+        self.draw_counter.calls = 0
+        self.frames += 1
+        if self.frames % PROFILER_REFRESH_FRAMES == 0:
+            self.lines = self.report()
+
+    def report(self):
+        lines = ["phase                 p50    p95    p99 ms"]
+        for key, values in self.samples.items():
+            values = sorted(values)
+            lines.append(
+                f"{key:<20}{percentile(values, 0.5):>6.2f} "
+                f"{percentile(values, 0.95):>6.2f} {percentile(values, 0.99):>6.2f}"
+            )
+        if self.draw_call_samples:
+            calls = sorted(self.draw_call_samples)
+            lines.append(f"draw calls: p50 {percentile(calls, 0.5)}, max {calls[-1]}")
+        return lines
+
+    # Вызовы самого оверлея в счёт кадра не идут
+    def draw(self, x, y):
+        calls = self.draw_counter.calls
+        height = len(self.lines) * 16 + 10
+        arcade.draw_lrbt_rectangle_filled(x - 5, x + 365, y - height, y, (0, 0, 0, 180))
+        for i, line in enumerate(self.lines):
+            arcade.draw_text(
+                line, x, y - 12 - i * 16,
+                arcade.color.WHITE, 10,
+                font_name="Courier New",
+                anchor_x="left", anchor_y="center"
+            )
+        self.draw_counter.calls = calls
+
+
+class StackSampler:
+    # Периодически снимает стек основного потока и считает одинаковые стеки.
+    # Результат пишется в формате collapsed stacks (flamegraph.pl, speedscope)
+    def __init__(self, thread_id, interval=STACK_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="stack-sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+
+            if stack:
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def write_collapsed(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in sorted(self.counts.items()):
+                file.write(f"{stack} {count}\n")
+
+
+class ProfileCapture:
+    # cProfile и StackSampler вокруг всей сессии или одного уровня.
+    # Одновременно может идти только одна запись
+    active = None
+
+    def __init__(self, name):
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident())
+        self.started = 0
+
+    def start(self):
+        if ProfileCapture.active:
+            print(f"Профилирование уже идёт ({ProfileCapture.active.name})")
+            return False
+
+        ProfileCapture.active = self
+        atexit.register(self.stop)
+        self.started = time.perf_counter()
+        self.sampler.start()
+        self.profile.enable()
+        print(f"Профилирование начато: {self.name}")
+        return True
+
+    def stop(self):
+        if ProfileCapture.active is not self:
+            return
+
+        self.profile.disable()
+        self.sampler.stop()
+        ProfileCapture.active = None
+        atexit.unregister(self.stop)
+
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        base = os.path.join(PROFILES_DIR, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}")
+        self.profile.dump_stats(base + ".pstats")
+        self.sampler.write_collapsed(base + ".collapsed")
+        print(f"Профилирование завершено за {time.perf_counter() - self.started:.1f} с: "
+              f"{base}.pstats, {base}.collapsed")
+
+
+def write_varint(buffer, value):
+    while value >= 0x80:
+        buffer.append(value & 0x7F | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def write_signed_varint(buffer, value):
+    # zigzag: 0, -1, 1, -2, ... -> 0, 1, 2, 3, ...; подходит для seed любой величины
+    write_varint(buffer, value << 1 if value >= 0 else ~value << 1 | 1)
+
+
+def write_string(buffer, text):
+    encoded = text.encode("utf-8")
+    write_varint(buffer, len(encoded))
+    buffer += encoded
+
+
+class ReplayRecorder:
+    # Запись ввода игрока: заголовок (seed в zigzag-varint, уровень, флаги, уровень английского, имя),
+    # затем события varint(разница тиков) + код + данные. В конце REPLAY_END
+    # с контрольной суммой состояния игры для проверки при воспроизведении
+    def __init__(self, path, game_view):
+        self.path = path
+        self.game_view = game_view
+        self.buffer = bytearray(REPLAY_MAGIC)
+        flags = REPLAY_FLAG_PROCEDURAL if game_view.options.procedural else 0
+        if game_view.options.chase:
+            flags |= REPLAY_FLAG_CHASE
+        if game_view.options.survival:
+            flags |= REPLAY_FLAG_SURVIVAL
+        write_signed_varint(self.buffer, game_view.options.seed)
+        self.buffer += bytes([game_view.current_level, flags])
+        write_string(self.buffer, game_view.english_level)
+        write_string(self.buffer, game_view.player_name)
+        if game_view.options.survival:
+            write_varint(self.buffer, game_view.options.survival)
+        self.last_tick = 0
+        self.closed = False
+        atexit.register(self.close)
+
+    @classmethod
+    def for_game(cls, directory, game_view):
+        os.makedirs(directory, exist_ok=True)
+        name = "".join(c if c.isalnum() else "_" for c in game_view.player_name)
+        path = os.path.join(directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-seed{game_view.options.seed}.emr")
+        return cls(path, game_view)
+
+    def record(self, opcode, payload=b""):
+        if self.closed:
+            return
+        tick = self.game_view.sim_tick
+        write_varint(self.buffer, tick - self.last_tick)
+        self.last_tick = tick
+        self.buffer.append(opcode)
+        self.buffer += payload
+
+    def record_answer(self, option_index, is_correct, hint_used, attempts, latency_ms):
+        payload = bytearray([option_index, int(is_correct) | int(hint_used) << 1])
+        write_varint(payload, attempts)
+        write_varint(payload, int(latency_ms))
+        self.record(REPLAY_ANSWER, payload)
+
+    def close(self):
+        if self.closed:
+            return
+        self.record(REPLAY_END, struct.pack("<I", self.game_view.state_digest()))
+        self.closed = True
+        atexit.unregister(self.close)
+
+        with open(self.path, "wb") as file:
+            file.write(self.buffer)
+        print(f"Запись игры сохранена: {self.path} ({len(self.buffer)} байт, {self.last_tick} тиков)")
 
-            if particle['life'] <= 0:
-                self.particles.remove(particle)
 
-    def draw(self):
-        for particle in self.particles:
-            alpha = int(255 * particle['life'])
-            color_with_alpha = (
-                particle['color'][0],
-                particle['color'][1],
-                particle['color'][2],
-                alpha
-            )
-            arcade.draw_circle_filled(
-                particle['x'], particle['y'],
-                particle['size'], color_with_alpha
-            )
+class HeadlessWindow:
+    # Заглушка окна для запуска GameView без графики: воспроизведение записей,
+    # бенчмарки и анализ уровней из каталога tools
+    def __init__(self):
+        self.current_view = None
+
+    def show_view(self, view):
+        self.current_view = view
 
 
 class SoundManager:
@@ -1612,6 +4411,79 @@ class SoundManager:
             self.play_background_music()
 
 
+class RedrawGovernor:
+    # Управляет частотой кадров экрана меню: после MENU_IDLE_TIMEOUT секунд
+    # без ввода окно переходит на MENU_IDLE_FPS, любой ввод сразу возвращает
+    # полную частоту. Загрузка CPU печатается при каждой смене режима
+    enabled = True
+    idle_fps = MENU_IDLE_FPS
+
+    def __init__(self, view, idle_timeout=MENU_IDLE_TIMEOUT):
+        self.view = view
+        self.idle_timeout = idle_timeout
+        self.idle = False
+        self.active = False
+        self.last_input = 0
+        self.sample_wall = 0
+        self.sample_cpu = 0
+
+    def start(self):
+        self.active = True
+        self.idle = False
+        self.last_input = time.perf_counter()
+        self.begin_sample()
+        arcade.schedule(self.check_idle, 0.5)
+
+    def stop(self):
+        if not self.active:
+            return
+        arcade.unschedule(self.check_idle)
+        self.report()
+        self.set_idle(False)
+        self.active = False
+
+    def wake(self):
+        self.last_input = time.perf_counter()
+        if self.idle:
+            self.report()
+            self.set_idle(False)
+            self.begin_sample()
+
+    def check_idle(self, delta_time):
+        if not self.idle and time.perf_counter() - self.last_input >= self.idle_timeout:
+            self.report()
+            self.set_idle(True)
+            self.begin_sample()
+
+    def set_idle(self, idle):
+        self.idle = idle
+        if not self.enabled:
+            return
+
+        window = self.view.window
+        if idle:
+            rate = 1 / self.idle_fps
+            window.set_update_rate(rate)
+            window.set_draw_rate(rate)
+        else:
+            window.set_update_rate(WINDOW_UPDATE_RATE)
+            window.set_draw_rate(WINDOW_DRAW_RATE)
+
+    def begin_sample(self):
+        self.sample_wall = time.perf_counter()
+        self.sample_cpu = time.process_time()
+
+    def report(self):
+        wall = time.perf_counter() - self.sample_wall
+        if wall < 1:
+            return
+        cpu = (time.process_time() - self.sample_cpu) / wall * 100
+        mode = "простой" if self.idle else "активный режим"
+        if self.idle and not self.enabled:
+            mode += " (без ограничения FPS)"
+        print(f"{type(self.view).__name__}: {mode} {wall:.1f} с, загрузка CPU {cpu:.1f}%")
+
+
 class MessageView(arcade.View):
     def __init__(self, game_view, message, button_text="OK"):
         super().__init__()
@@ -1619,14 +4491,16 @@ class MessageView(arcade.View):
         self.message = message
         self.button_text = button_text
         self.ok_button = None
+        self.ui = UILayer()
 
     def on_show_view(self):
-        self.ok_button = Button(
+        self.ui.clear()
+        self.ok_button = self.ui.add(Button(
             SCREEN_WIDTH // 2, 150, 200, 50,
             self.button_text,
             self.return_to_game,
             arcade.color.GREEN
-        )
+        ))
 
     def return_to_game(self):
         self.window.show_view(self.game_view)
@@ -1668,33 +4542,34 @@ class MessageView(arcade.View):
             width=panel_width - 40
         )
 
-        self.ok_button.draw()
+        self.ui.draw()
 
     def on_mouse_motion(self, x, y, dx, dy):
-        if self.ok_button.check_hover(x, y):
-            self.ok_button.state = "hover"
-        else:
-            self.ok_button.state = "normal"
+        self.ui.on_mouse_motion(x, y)
 
     def on_mouse_press(self, x, y, button, modifiers):
         if button == arcade.MOUSE_BUTTON_LEFT:
-            if self.ok_button.check_hover(x, y):
-                self.ok_button.on_click()
+            self.ui.on_mouse_press(x, y)
 
 
 class StartView(arcade.View):
-    def __init__(self, sound_manager=None):
+    def __init__(self, sound_manager=None, options=None):
         super().__init__()
+        self.options = options or GameOptions()
+        self.rng = self.options.rng.stream("menu.stars")
         self.player_name = ""
         self.buttons = []
         self.selected_level = "A1"
         self.start_button = None
         self.name_field_active = False
         self.sound_manager = sound_manager
+        self.ui = UILayer()
+        self.governor = RedrawGovernor(self)
 
     def on_show_view(self):
         arcade.set_background_color(BACKGROUND_COLOR)
         self.setup_ui()
+        self.governor.start()
 
         if self.sound_manager and not self.sound_manager._is_music_playing:
             print("Запуск фоновой музыки в меню...")
@@ -1702,7 +4577,11 @@ class StartView(arcade.View):
         elif self.sound_manager:
             print("Музыка уже играет, не запускаем повторно")
 
+    def on_hide_view(self):
+        self.governor.stop()
+
     def setup_ui(self):
+        self.ui.clear()
         self.buttons = []
         self.buttons.append(Button(
             SCREEN_WIDTH - 120, 60, 180, 40,
@@ -1742,6 +4621,11 @@ class StartView(arcade.View):
             arcade.color.GREEN
         )
         self.start_button.enabled = False
+        self.update_start_button()
+
+        for button in self.buttons:
+            self.ui.add(button)
+        self.ui.add(self.start_button)
 
     def show_high_scores_view(self):
         if self.sound_manager:
@@ -1756,14 +4640,14 @@ class StartView(arcade.View):
         self.update_start_button()
         for button in self.buttons:
             if button.text.startswith(f"{level} -"):
-                button.custom_color = arcade.color.GREEN
+                button.set_custom_color(arcade.color.GREEN)
             elif button.text.startswith(tuple(ENGLISH_LEVELS.keys())):
-                button.custom_color = None
+                button.set_custom_color(None)
 
     def update_start_button(self):
         if not self.start_button:
             return
-        self.start_button.enabled = bool(self.player_name.strip() and self.selected_level)
+        self.start_button.set_enabled(bool(self.player_name.strip() and self.selected_level))
 
     def start_game(self):
         if self.start_button.enabled:
@@ -1776,7 +4660,8 @@ class StartView(arcade.View):
                 level_intro_view = LevelIntroView(
                     self.player_name,
                     self.selected_level,
-                    self.sound_manager
+                    self.sound_manager,
+                    self.options
                 )
                 self.window.show_view(level_intro_view)
             except Exception as e:
@@ -1793,10 +4678,10 @@ class StartView(arcade.View):
         )
 
         for i in range(30):
-            x = random.randint(0, SCREEN_WIDTH)
-            y = random.randint(0, SCREEN_HEIGHT)
-            size = random.randint(1, 3)
-            brightness = random.randint(150, 255)
+            x = self.rng.randint(0, SCREEN_WIDTH)
+            y = self.rng.randint(0, SCREEN_HEIGHT)
+            size = self.rng.randint(1, 3)
+            brightness = self.rng.randint(150, 255)
             arcade.draw_circle_filled(x, y, size, (brightness, brightness, brightness))
 
         self.draw_main_interface()
@@ -1888,8 +4773,7 @@ class StartView(arcade.View):
             anchor_y="center"
         )
 
-        for button in self.buttons:
-            button.draw()
+        self.ui.draw()
 
         if self.start_button:
             if not self.start_button.enabled and self.player_name:
@@ -1904,8 +4788,6 @@ class StartView(arcade.View):
                     anchor_y="center"
                 )
 
-            self.start_button.draw()
-
         arcade.draw_text(
             "Press ENTER to start | Press ESC to exit | Use mouse to select",
             SCREEN_WIDTH // 2,
@@ -1918,19 +4800,11 @@ class StartView(arcade.View):
         )
 
     def on_mouse_motion(self, x, y, dx, dy):
-        for button in self.buttons:
-            if button.check_hover(x, y):
-                button.state = "hover"
-            else:
-                button.state = "normal"
-
-        if self.start_button:
-            if self.start_button.check_hover(x, y):
-                self.start_button.state = "hover"
-            else:
-                self.start_button.state = "normal"
+        self.governor.wake()
+        self.ui.on_mouse_motion(x, y)
 
     def on_mouse_press(self, x, y, button, modifiers):
+        self.governor.wake()
         if button == arcade.MOUSE_BUTTON_LEFT:
             if self.sound_manager:
                 self.sound_manager.play_button_click()
@@ -1951,14 +4825,10 @@ class StartView(arcade.View):
             else:
                 self.name_field_active = False
 
-            for btn in self.buttons:
-                if btn.check_hover(x, y):
-                    btn.on_click()
-
-            if self.start_button and self.start_button.check_hover(x, y):
-                self.start_button.on_click()
+            self.ui.on_mouse_press(x, y)
 
     def on_key_press(self, symbol, modifiers):
+        self.governor.wake()
         if symbol == arcade.key.ESCAPE:
             arcade.close_window()
         elif symbol == arcade.key.ENTER and self.start_button.enabled:
@@ -1984,12 +4854,15 @@ class StartView(arcade.View):
 
 
 class LevelIntroView(arcade.View):
-    def __init__(self, player_name, english_level, sound_manager):
+    def __init__(self, player_name, english_level, sound_manager, options=None):
         super().__init__()
+        self.options = options or GameOptions()
+        self.rng = self.options.rng.stream("intro.stars")
         self.player_name = player_name
         self.english_level = english_level
         self.start_button = None
         self.sound_manager = sound_manager
+        self.governor = RedrawGovernor(self)
 
     def on_show_view(self):
         arcade.set_background_color(BACKGROUND_COLOR)
@@ -1999,10 +4872,14 @@ class LevelIntroView(arcade.View):
             self.start_game,
             arcade.color.GREEN
         )
+        self.governor.start()
+
+    def on_hide_view(self):
+        self.governor.stop()
 
     def start_game(self):
         self.sound_manager.play_button_click()
-        game_view = GameView()
+        game_view = GameView(self.options)
         game_view.setup(self.player_name, self.english_level, self.sound_manager)
         self.window.show_view(game_view)
 
@@ -2015,10 +4892,10 @@ class LevelIntroView(arcade.View):
         )
 
         for i in range(30):
-            x = random.randint(0, SCREEN_WIDTH)
-            y = random.randint(0, SCREEN_HEIGHT)
-            size = random.randint(1, 3)
-            brightness = random.randint(150, 255)
+            x = self.rng.randint(0, SCREEN_WIDTH)
+            y = self.rng.randint(0, SCREEN_HEIGHT)
+            size = self.rng.randint(1, 3)
+            brightness = self.rng.randint(150, 255)
             arcade.draw_circle_filled(x, y, size, (brightness, brightness, brightness))
 
         arcade.draw_lrbt_rectangle_filled(
@@ -2097,22 +4974,25 @@ class LevelIntroView(arcade.View):
         self.start_button.draw()
 
     def on_mouse_motion(self, x, y, dx, dy):
+        self.governor.wake()
         if self.start_button.check_hover(x, y):
             self.start_button.state = "hover"
         else:
             self.start_button.state = "normal"
 
     def on_mouse_press(self, x, y, button, modifiers):
+        self.governor.wake()
         if button == arcade.MOUSE_BUTTON_LEFT:
             self.sound_manager.play_button_click()
             if self.start_button.check_hover(x, y):
                 self.start_button.on_click()
 
     def on_key_press(self, symbol, modifiers):
+        self.governor.wake()
         if symbol == arcade.key.ESCAPE:
             if self.sound_manager:
                 self.sound_manager.play_button_click()
-            start_view = StartView()
+            start_view = StartView(options=self.options)
             self.window.show_view(start_view)
         elif symbol == arcade.key.ENTER:
             if self.sound_manager:
@@ -2127,21 +5007,35 @@ class HighScoresView(arcade.View):
         self.back_button = None
         self.clear_button = None
         self.sound_manager = previous_view.sound_manager
+        self.options = previous_view.options
+        self.rng = self.options.rng.stream("highscores.stars")
+        self.database = None
+        self.scores = []
+        self.english_level_filters = [None] + list(ENGLISH_LEVELS.keys())
+        self.filter_index = 0
+        self.ui = UILayer()
+        self.governor = RedrawGovernor(self)
 
     def on_show_view(self):
         arcade.set_background_color(BACKGROUND_COLOR)
-        self.back_button = Button(
+        self.load_scores()
+        self.ui.clear()
+        self.back_button = self.ui.add(Button(
             SCREEN_WIDTH // 2, 80, 220, 50,
             "BACK TO MENU",
             self.go_back,
             arcade.color.RED
-        )
-        self.clear_button = Button(
+        ))
+        self.clear_button = self.ui.add(Button(
             SCREEN_WIDTH // 2, 140, 220, 50,
             "🗑️ CLEAR SCORES",
             self.clear_scores,
             arcade.color.ORANGE
-        )
+        ))
+        self.governor.start()
+
+    def on_hide_view(self):
+        self.governor.stop()
 
     def go_back(self):
         if self.sound_manager:
@@ -2149,14 +5043,30 @@ class HighScoresView(arcade.View):
 
         self.window.show_view(self.previous_view)
 
+    def load_scores(self):
+        try:
+            if self.database is None:
+                self.database = PlayerDatabase()
+            english_level = self.english_level_filters[self.filter_index]
+            self.scores = self.database.get_high_scores(10, english_level=english_level)
+        except Exception as e:
+            print(f"Error loading scores: {e}")
+            self.scores = []
+
     def clear_scores(self):
         if self.sound_manager:
             self.sound_manager.play_button_click()
         try:
-            db = PlayerDatabase()
-            db.clear_high_scores()
+            if self.database is None:
+                self.database = PlayerDatabase()
+            self.database.clear_high_scores()
         except Exception as e:
             print(f"Error clearing scores: {e}")
+        self.load_scores()
+
+    def change_filter(self, step):
+        self.filter_index = (self.filter_index + step) % len(self.english_level_filters)
+        self.load_scores()
 
     def on_draw(self):
         self.clear()
@@ -2167,10 +5077,10 @@ class HighScoresView(arcade.View):
         )
 
         for i in range(30):
-            x = random.randint(0, SCREEN_WIDTH)
-            y = random.randint(0, SCREEN_HEIGHT)
-            size = random.randint(1, 3)
-            brightness = random.randint(150, 255)
+            x = self.rng.randint(0, SCREEN_WIDTH)
+            y = self.rng.randint(0, SCREEN_HEIGHT)
+            size = self.rng.randint(1, 3)
+            brightness = self.rng.randint(150, 255)
             arcade.draw_circle_filled(x, y, size, (brightness, brightness, brightness))
 
         arcade.draw_lrbt_rectangle_filled(
@@ -2197,11 +5107,19 @@ class HighScoresView(arcade.View):
             bold=True
         )
 
-        try:
-            db = PlayerDatabase()
-            scores = db.get_high_scores(10)
-        except:
-            scores = []
+        english_level = self.english_level_filters[self.filter_index]
+        arcade.draw_text(
+            f"◀ {english_level or 'ALL LEVELS'} ▶",
+            SCREEN_WIDTH // 2,
+            SCREEN_HEIGHT - 150,
+            arcade.color.LIGHT_BLUE,
+            14,
+            align="center",
+            anchor_x="center",
+            anchor_y="center"
+        )
+
+        scores = self.scores
 
         if not scores:
             arcade.draw_text(
@@ -2216,7 +5134,7 @@ class HighScoresView(arcade.View):
             )
         else:
             headers = ["Rank", "Player", "Score", "Level", "English"]
-            header_y = SCREEN_HEIGHT - 170
+            header_y = SCREEN_HEIGHT - 180
             column_positions = [180, 320, 460, 580, 700]
 
             for i, header in enumerate(headers):
@@ -2258,60 +5176,57 @@ class HighScoresView(arcade.View):
                 arcade.draw_text(display_level, column_positions[4], y, row_color, 14, align="center",
                                  anchor_x="center")
 
-        self.back_button.draw()
-        self.clear_button.draw()
+        self.ui.draw()
 
     def on_mouse_motion(self, x, y, dx, dy):
-        if self.back_button.check_hover(x, y):
-            self.back_button.state = "hover"
-        else:
-            self.back_button.state = "normal"
-
-        if self.clear_button.check_hover(x, y):
-            self.clear_button.state = "hover"
-        else:
-            self.clear_button.state = "normal"
+        self.governor.wake()
+        self.ui.on_mouse_motion(x, y)
 
     def on_mouse_press(self, x, y, button, modifiers):
+        self.governor.wake()
         if button == arcade.MOUSE_BUTTON_LEFT:
             if self.sound_manager:
                 self.sound_manager.play_button_click()
-            if self.back_button.check_hover(x, y):
-                self.back_button.on_click()
-            elif self.clear_button.check_hover(x, y):
-                self.clear_button.on_click()
+            self.ui.on_mouse_press(x, y)
 
     def on_key_press(self, symbol, modifiers):
+        self.governor.wake()
         if symbol == arcade.key.ESCAPE:
             self.go_back()
+        elif symbol == arcade.key.LEFT:
+            self.change_filter(-1)
+        elif symbol == arcade.key.RIGHT:
+            self.change_filter(1)
 
 
 class VictoryView(arcade.View):
     def __init__(self, game_view):
         super().__init__()
         self.game_view = game_view
+        self.rng = game_view.options.rng.stream(f"victory{game_view.current_level}.confetti")
         self.confetti_particles = []
         self.smiling_player_y = 300
         self.player_wave_offset = 0
         self.message_alpha = 0
         self.timer = 0
         self.next_level_button = None
+        self.ui = UILayer()
 
     def on_show_view(self):
         for _ in range(200):
             self.confetti_particles.append({
-                'x': random.randint(0, SCREEN_WIDTH),
-                'y': random.randint(0, SCREEN_HEIGHT),
-                'dx': random.uniform(-3, 3),
-                'dy': random.uniform(-5, -1),
-                'color': random.choice([
+                'x': self.rng.randint(0, SCREEN_WIDTH),
+                'y': self.rng.randint(0, SCREEN_HEIGHT),
+                'dx': self.rng.uniform(-3, 3),
+                'dy': self.rng.uniform(-5, -1),
+                'color': self.rng.choice([
                     arcade.color.RED, arcade.color.GREEN, arcade.color.BLUE,
                     arcade.color.YELLOW, arcade.color.PURPLE, arcade.color.ORANGE,
                     arcade.color.PINK, arcade.color.CYAN, arcade.color.LIME
                 ]),
-                'size': random.uniform(4, 8),
-                'rotation': random.uniform(0, 360),
-                'rotation_speed': random.uniform(-5, 5)
+                'size': self.rng.uniform(4, 8),
+                'rotation': self.rng.uniform(0, 360),
+                'rotation_speed': self.rng.uniform(-5, 5)
             })
 
         arcade.schedule(self.create_buttons, 2.0)
@@ -2333,13 +5248,13 @@ class VictoryView(arcade.View):
                 self.show_final_screen,
                 arcade.color.GOLD
             )
+        self.ui.add(self.next_level_button)
 
     def start_next_level(self):
         if self.game_view.sound_manager:
             self.game_view.sound_manager.play_button_click()
 
-        self.game_view.current_level += 1
-        self.game_view.start_level()
+        self.game_view.next_level()
         self.window.show_view(self.game_view)
 
     def show_final_screen(self):
@@ -2415,8 +5330,7 @@ class VictoryView(arcade.View):
 
         self.draw_smiling_player(panel_x - 200, self.smiling_player_y)
 
-        if self.next_level_button:
-            self.next_level_button.draw()
+        self.ui.draw()
 
         if self.timer < 2 and not self.next_level_button:
             alpha = int(255 * (1 - (self.timer / 2)))
@@ -2487,19 +5401,14 @@ class VictoryView(arcade.View):
 
             if particle['y'] < -10:
                 particle['y'] = SCREEN_HEIGHT + 10
-                particle['dy'] = random.uniform(-5, -1)
+                particle['dy'] = self.rng.uniform(-5, -1)
 
     def on_mouse_motion(self, x, y, dx, dy):
-        if self.next_level_button:
-            if self.next_level_button.check_hover(x, y):
-                self.next_level_button.state = "hover"
-            else:
-                self.next_level_button.state = "normal"
+        self.ui.on_mouse_motion(x, y)
 
     def on_mouse_press(self, x, y, button, modifiers):
         if button == arcade.MOUSE_BUTTON_LEFT:
-            if self.next_level_button and self.next_level_button.check_hover(x, y):
-                self.next_level_button.on_click()
+            self.ui.on_mouse_press(x, y)
 
     def on_key_press(self, key, modifiers):
         if key == arcade.key.SPACE and self.timer > 2:
@@ -2512,18 +5421,36 @@ class VictoryView(arcade.View):
                 self.game_view.sound_manager.play_button_click()
 
             from main import StartView
-            start_view = StartView()
+            start_view = StartView(options=self.game_view.options)
             self.window.show_view(start_view)
 
 
 class GameView(arcade.View):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, options=None, window=None):
+        super().__init__(window)
+        self.options = options or GameOptions()
         self.walls = []
         self.question_stations = []
         self.final_door = None
         self.enemies = []
         self.platforms = []
+        watcher = AssetWatcher.shared
+        self.level_loader = watcher.level_loader if watcher else LevelLoader()
+        self.levels_version = watcher.levels_version if watcher else 0
+        self.questions_version = watcher.questions_version if watcher else 0
+        self.level = None
+        self.generated_levels = {}
+        self.static_layers = {}
+        self.chunks = None
+        self.chunk_executor = None
+        self.nav_grids = {}
+        self.path_services = {}
+        self.flow_field = None
+        self.path_service = None
+        self.swarm = None
+        self.ai_scheduler = AIScheduler()
+        self.camera = None
+        self.hud_camera = None
         self.particle_system = ParticleSystem()
         self.player_x = 0
         self.player_y = 0
@@ -2533,8 +5460,11 @@ class GameView(arcade.View):
         self.current_level = 1
         self.keys_collected = 0
         self.keys_required = KEYS_PER_LEVEL
-        self.level_start_time = 0
+        self.level_ticks = 0
+        self.level_quiz_time = 0
         self.level_time = 0
+        self.sim_tick = 0
+        self.time_accumulator = 0
         self.player_name = ""
         self.english_level = ""
         self.total_score = 0
@@ -2549,13 +5479,43 @@ class GameView(arcade.View):
         self.key_right = False
         self.game_paused = False
         self.game_active = True
-        self.pause_buttons = []
+        self.pause_ui = UILayer()
+        self.pause_buttons = [
+            self.pause_ui.add(Button(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 40, 250, 50,
+                                     "▶ RESUME", self.resume_game, arcade.color.GREEN)),
+            self.pause_ui.add(Button(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 20, 250, 50,
+                                     "🔄 RESTART LEVEL", self.restart_level, arcade.color.ORANGE)),
+        ]
         self.last_time = time.time()
         self.last_footstep_time = 0
         self.footstep_sound = None
         self.sound_manager = None
         self.is_moving = False
         self.sound_enabled = True
+        self.headless = False
+        self.recorder = None
+        self.active_quiz = None
+        self.quiz_started = 0
+        self.quality = QualityManager()
+        self.show_debug_overlay = False
+        self.profiler = FrameProfiler()
+        self.profile_capture = None
+        self.update_phases = (
+            ("enemies", self.update_enemies),
+            ("particles", self.update_particles),
+            ("physics", self.update_player_physics),
+            ("interactions", lambda delta_time: self.check_interactions()),
+            ("footsteps", lambda delta_time: self.check_footstep_sounds()),
+        )
+        self.draw_phases = (
+            ("background", self.draw_background),
+            ("walls", self.draw_walls),
+            ("stations", self.draw_stations),
+            ("enemies", self.draw_enemies),
+            ("particles", self.draw_particles),
+            ("player", self.draw_player),
+            ("hud", self.draw_hud),
+        )
         self.last_key_press_time = 0
         self.key_press_delay = 0.05
         self.movement_speed = PLAYER_SPEED
@@ -2571,6 +5531,7 @@ class GameView(arcade.View):
 
     def on_show_view(self):
         print("GameView показан")
+        input_before = self.input_state
         self.key_up = False
         self.key_down = False
         self.key_left = False
@@ -2581,18 +5542,26 @@ class GameView(arcade.View):
         self.move_dy = 0
         self.door_message_time = 0
         self.show_door_message = False
+        self.last_time = time.time()
+        self.time_accumulator = 0
+        self.record_input(input_before)
+        self.profiler.resume()
+        if self.chunks is None:
+            self.start_chunk_streaming()
 
     def on_hide_view(self):
         if self.footstep_sound:
             arcade.stop_sound(self.footstep_sound)
             self.footstep_sound = None
+        self.profiler.suspend()
+        self.stop_chunk_streaming()
 
     def setup(self, player_name, english_level, sound_manager=None):
         print(f"GameView setup: player_name={player_name}, english_level={english_level}")
         self.player_name = player_name
         self.english_level = english_level
-        self.database = PlayerDatabase()
-        self.quiz_system = EnglishQuizSystem()
+        self.database = PlayerDatabase(self.options.database_path)
+        self.quiz_system = EnglishQuizSystem(self.database, self.options.rng.stream(f"quiz.{english_level}"))
 
         if self.database:
             self.sound_enabled = self.database.get_player_sound_setting(player_name)
@@ -2600,19 +5569,25 @@ class GameView(arcade.View):
                 self.sound_manager.set_sound_enabled(self.sound_enabled)
 
         self.database.create_or_update_player(player_name, english_level)
-        self.quiz_system.initialize_game_questions(english_level)
+        self.quiz_system.initialize_game_questions(english_level, player_name)
+
+        if self.options.replay_dir and not self.headless:
+            self.recorder = ReplayRecorder.for_game(self.options.replay_dir, self)
+
         self.start_level()
 
     def start_level(self):
-        print(f"Starting level {self.current_level}")
+        print(f"Starting level {self.current_level} (seed {self.options.seed})")
         self.keys_collected = 0
         self.current_station_index = 0
         self.collected_stations = []
-        self.level_start_time = time.time()
+        self.level_ticks = 0
+        self.level_quiz_time = 0
+        self.level_time = 0
         self.asked_questions = []
         self.game_active = True
         self.game_paused = False
-        self.pause_buttons = []
+        self.pause_ui.reset_hover()
         self.key_up = False
         self.key_down = False
         self.key_left = False
@@ -2627,204 +5602,213 @@ class GameView(arcade.View):
         self.level_score = 0
         self.door_message_time = 0
         self.show_door_message = False
+        self.apply_asset_changes()
+
+        started = time.perf_counter()
         self.create_level()
+        telemetry.observe("level_load_ms", (time.perf_counter() - started) * 1000, f"level{self.current_level}")
+
+    # Подхватывает изменения, найденные AssetWatcher: новые карты уже
+    # скомпилированы и лежат в level_loader, здесь отбрасываются навигационные
+    # сетки старых версий и заново выбираются вопросы. Звук и соединения
+    # с базой не трогаются
+    def apply_asset_changes(self):
+        watcher = AssetWatcher.shared
+        if watcher is None:
+            return
+
+        if watcher.levels_version != self.levels_version:
+            self.levels_version = watcher.levels_version
+            live = set(self.level_loader.loaded_levels()) | set(self.generated_levels.values())
+            self.nav_grids = {level: grid for level, grid in self.nav_grids.items() if level in live}
+            self.path_services = {level: service for level, service in self.path_services.items() if level in live}
+            print("Уровни перезагружены")
+
+        if watcher.questions_version != self.questions_version and self.quiz_system:
+            self.questions_version = watcher.questions_version
+            self.quiz_system.level_questions_cache.pop(self.english_level, None)
+            self.quiz_system.initialize_game_questions(self.english_level, self.player_name)
 
     def create_level(self):
         print(f"Creating level {self.current_level}")
-        self.player_x = 100
-        self.player_y = 150
         self.walls = []
         self.question_stations = []
         self.enemies = []
         self.platforms = []
         self.final_door = None
         self.create_maze_level(self.current_level)
-        self.particle_system = ParticleSystem()
+        self.player_x, self.player_y = self.level.player_start
+        self.particle_system = ParticleSystem(self.options.rng.stream(f"level{self.current_level}.particles"))
+
+    def start_chunk_streaming(self):
+        if self.chunks:
+            self.chunks.close()
+            self.chunks = None
+        if self.level is None or self.level.fits_screen:
+            return
+        if self.chunk_executor is None:
+            self.chunk_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chunks")
+        self.chunks = ChunkStreamer(self.level, self.chunk_executor)
+
+    # Поток подготовки кусков не должен жить, пока игра не на экране
+    # (вопрос, меню); при возврате куски готовятся заново
+    def stop_chunk_streaming(self):
+        if self.chunks:
+            self.chunks.close()
+            self.chunks = None
+        if self.chunk_executor:
+            self.chunk_executor.shutdown(wait=False, cancel_futures=True)
+            self.chunk_executor = None
 
     def create_maze_level(self, level_num):
         difficulty = LEVEL_DIFFICULTY.get(level_num, LEVEL_DIFFICULTY[1])
-
-        base_walls = [
-            (SCREEN_WIDTH // 2, SCREEN_HEIGHT - 30, SCREEN_WIDTH, 60),
-            (30, SCREEN_HEIGHT // 2, 60, SCREEN_HEIGHT),
-            (SCREEN_WIDTH - 30, SCREEN_HEIGHT // 2, 60, SCREEN_HEIGHT),
-        ]
-
-        if level_num == 1:
-            internal_walls = [
-                (380, 550, 30, 200),
-                (700, 350, 30, 150),
-                (180, 450, 200, 30),
-            ]
-        elif level_num == 2:
-            internal_walls = [
-                (500, 600, 30, 300),
-                (250, 500, 200, 30),
-                (700, 300, 30, 200),
-                (600, 200, 150, 30),
-            ]
-
-        elif level_num == 3:
-            internal_walls = [
-                (350, 550, 30, 200),
-                (650, 500, 30, 250),
-                (250, 150, 150, 30),
-                (750, 220, 150, 30),
-            ]
-
-        elif level_num == 4:
-            internal_walls = [
-                (200, 600, 30, 300),
-                (800, 600, 30, 300),
-                (300, 500, 30, 200),
-                (650, 450, 30, 200),
-                (250, 170, 150, 30),
-                (750, 200, 150, 30),
-            ]
-
-        elif level_num == 5:
-            internal_walls = [
-                (250, 600, 200, 30),
-                (750, 600, 200, 30),
-                (500, 500, 400, 30),
-                (250, 300, 30, 200),
-                (900, 300, 30, 200),
-                (400, 150, 300, 30),
-            ]
-
-        self.walls = base_walls + internal_walls
-
-        self.platforms = []
-        if level_num == 1:
-            platform_configs = [
-                (200, 250, 120, 20),
-                (400, 350, 120, 20),
-                (600, 300, 120, 20),
-                (800, 250, 120, 20),
-                (300, 200, 140, 20),
-            ]
-        elif level_num == 2:
-            platform_configs = [
-                (200, 300, 110, 20),
-                (400, 350, 110, 20),
-                (600, 320, 110, 20),
-                (800, 290, 110, 20),
-                (350, 220, 130, 20),
-            ]
-        else:
-            platform_configs = [
-                (180, 320, 100, 20),
-                (420, 340, 100, 20),
-                (580, 310, 100, 20),
-                (820, 280, 100, 20),
-                (320, 230, 120, 20),
-            ]
-
-        for x, y, width, height in platform_configs:
-            self.platforms.append(Platform(x, y, width, height))
-
-        self.question_stations = []
-        if level_num == 1:
-            station_positions = [
-                (200, 320),
-                (400, 420),
-                (600, 370),
-                (800, 320),
-                (300, 270),
-            ]
-        elif level_num == 2:
-            station_positions = [
-                (200, 370),
-                (400, 420),
-                (600, 390),
-                (800, 360),
-                (350, 290),
-            ]
-        else:
-            station_positions = [
-                (180, 390),
-                (420, 410),
-                (580, 380),
-                (820, 350),
-                (320, 300),
-            ]
-
-        self.question_stations = station_positions
-
-        self.final_door = Door(SCREEN_WIDTH - 100, 100, True, 0)
-
+        level = self.level = self.load_level(level_num)
+        self.static_layers = {}
+        self.start_chunk_streaming()
+
+        # Большой уровень не копирует геометрию целиком: стены и платформы
+        # читаются из массивов уровня по запросу (nearby_walls, nearby_platforms,
+        # ChunkStreamer). Враги создаются все: они ходят по всему уровню и
+        # обновляются каждый тик (дальние реже), иначе записи не совпадут
+        if level.fits_screen:
+            self.walls = [tuple(wall) for wall in level.walls.tolist()]
+            self.platforms = [Platform(x, y, width, height) for x, y, width, height in level.platforms.tolist()]
+        self.question_stations = list(level.stations)
+        self.final_door = Door(*level.door, True, 0)
+
+        self.flow_field = None
+        self.path_service = None
+        if self.options.chase or self.options.survival:
+            if level not in self.nav_grids:
+                self.nav_grids[level] = NavGrid(level)
+                self.path_services[level] = PathService(self.nav_grids[level])
+        if self.options.chase:
+            self.flow_field = FlowField(self.nav_grids[level])
+            self.path_service = self.path_services[level]
+            self.path_service.reset()
+
+        enemy_speed = level.enemy_speed or difficulty['enemy_speed']
+        self.swarm = None
+        if self.options.survival:
+            self.swarm = EnemySwarm(self.nav_grids[level], self.options.survival, enemy_speed,
+                                    self.options.rng.numpy_stream(f"level{level_num}.swarm"),
+                                    level.player_start, level.width, level.height)
+
+        enemy_rng = self.options.rng.stream(f"level{level_num}.enemies")
         self.enemies = []
-        num_enemies = difficulty['enemies']
-        enemy_speed = difficulty['enemy_speed']
+        for i, (x, y) in enumerate(level.enemies if not self.swarm else []):
+            enemy = Enemy(x, y, i, enemy_speed, level_num, enemy_rng, level.width, level.height)
+            if self.flow_field:
+                enemy.snap_to_grid(self.flow_field.grid)
+            self.enemies.append(enemy)
+        self.ai_scheduler.reset(len(self.enemies))
 
-        enemy_positions = []
-        if level_num == 1:
-            enemy_positions = [
-                (500, 500),
-                (300, 200),
-            ]
-        elif level_num == 2:
-            enemy_positions = [
-                (300, 600),
-                (600, 150),
-                (900, 450),
-            ]
-        elif level_num == 3:
-            enemy_positions = [
-                (200, 150),
-                (500, 650),
-                (800, 150),
-                (950, 550),
-            ]
-        else:
-            enemy_positions = [
-                (150, 100),
-                (400, 650),
-                (600, 150),
-                (850, 600),
-                (950, 300),
-            ]
+    # Процедурный уровень строится один раз за игру: перезапуск после
+    # встречи с врагом возвращает тот же лабиринт
+    def load_level(self, level_num):
+        if not self.options.procedural:
+            return self.load_level_file(level_num)
 
-        for i in range(min(num_enemies, len(enemy_positions))):
-            x, y = enemy_positions[i]
-            enemy = Enemy(x, y, i, enemy_speed, level_num)
-            self.enemies.append(enemy)
+        if level_num not in self.generated_levels:
+            generator = MazeGenerator(self.options.rng.stream(f"level{level_num}.maze"))
+            try:
+                self.generated_levels[level_num] = generator.generate(level_num)
+            except RuntimeError as e:
+                print(f"{e}, загружаем {self.level_loader.path_for(level_num)}")
+                self.generated_levels[level_num] = self.load_level_file(level_num)
+        return self.generated_levels[level_num]
+
+    # Карту могут сохранять прямо во время игры (--watch-assets): если файл
+    # недописан или испорчен, играем прежней скомпилированной версией
+    def load_level_file(self, level_num):
+        try:
+            return self.level_loader.load(level_num)
+        except Exception as e:
+            level = self.level_loader.last_good(level_num)
+            if level is None:
+                raise
+            print(f"Не удалось загрузить {self.level_loader.path_for(level_num)} ({e}), "
+                  f"остаётся прежняя версия уровня")
+            return level
 
     def on_draw(self):
+        frame_start = time.perf_counter()
         current_time = time.time()
         delta_time = current_time - self.last_time
 
-        if delta_time > 0.05:
-            delta_time = 0.05
+        # Интервалы больше секунды - это возврат из другого экрана, а не кадр
+        if delta_time < 1.0:
+            telemetry.observe("frame_ms", delta_time * 1000, f"level{self.current_level}")
 
         self.last_time = current_time
 
         if not self.game_paused and self.game_active:
-            self.update(delta_time)
+            self.advance(delta_time)
 
+        if self.profiler.enabled:
+            self.profiler.run("draw", self.draw_phases)
+            self.profiler.end_frame()
+        else:
+            for name, phase in self.draw_phases:
+                phase()
+
+        self.quality.record((time.perf_counter() - frame_start) * 1000)
+        self.particle_system.count_scale = self.quality.particle_scale
+
+    # Камера держит игрока в центре экрана, но не выходит за края уровня.
+    # Уровень не больше окна стоит на месте, как раньше
+    def update_camera(self):
+        if self.camera is None:
+            self.camera = arcade.Camera2D()
+            self.hud_camera = arcade.Camera2D()
+        self.camera.position = self.camera_position()
+
+    # Центр камеры зависит только от игрока и размеров уровня, поэтому
+    # видимую область можно считать и в тике симуляции, и без окна
+    def camera_position(self):
+        half_width = SCREEN_WIDTH // 2
+        half_height = SCREEN_HEIGHT // 2
+        x = round(max(half_width, min(self.level.width - half_width, self.player_x)))
+        y = round(max(half_height, min(self.level.height - half_height, self.player_y)))
+        return x, y
+
+    # Видимая часть мира (left, bottom, right, top) с запасом по краям
+    def view_rect(self, margin=0):
+        x, y = self.camera_position()
+        left = int(x) - SCREEN_WIDTH // 2
+        bottom = int(y) - SCREEN_HEIGHT // 2
+        return left - margin, bottom - margin, left + SCREEN_WIDTH + margin, bottom + SCREEN_HEIGHT + margin
+
+    def draw_background(self):
         self.clear()
+        self.update_camera()
+        self.camera.use()
+        left, bottom, right, top = self.view_rect()
 
         arcade.draw_lrbt_rectangle_filled(
-            0, SCREEN_WIDTH,
-            0, SCREEN_HEIGHT,
+            left, right,
+            bottom, top,
             (30, 30, 50)
         )
 
         grid_size = 50
-        for x in range(0, SCREEN_WIDTH, grid_size):
-            arcade.draw_line(x, 0, x, SCREEN_HEIGHT, (40, 40, 60, 50))
-        for y in range(0, SCREEN_HEIGHT, grid_size):
-            arcade.draw_line(0, y, SCREEN_WIDTH, y, (40, 40, 60, 50))
+        for x in range(left - left % grid_size, right, grid_size):
+            arcade.draw_line(x, bottom, x, top, (40, 40, 60, 50))
+        for y in range(bottom - bottom % grid_size, top, grid_size):
+            arcade.draw_line(left, y, right, y, (40, 40, 60, 50))
 
         floor_height = 40
+        if bottom >= floor_height:
+            return
+
         arcade.draw_lrbt_rectangle_filled(
-            0, SCREEN_WIDTH,
+            left, right,
             0, floor_height,
             (45, 60, 45)
         )
 
         tile_size = 40
-        for x in range(0, SCREEN_WIDTH, tile_size):
+        for x in range(left - left % tile_size, right, tile_size):
             for y in range(0, floor_height, tile_size):
                 if (x // tile_size + y // tile_size) % 2 == 0:
                     arcade.draw_lrbt_rectangle_filled(
@@ -2834,34 +5818,47 @@ class GameView(arcade.View):
                     )
 
         arcade.draw_lrbt_rectangle_filled(
-            0, SCREEN_WIDTH,
+            left, right,
             floor_height - 5, floor_height,
             (35, 80, 35)
         )
 
-        for wall_x, wall_y, wall_width, wall_height in self.walls:
-            left = wall_x - wall_width // 2
-            right = wall_x + wall_width // 2
-            bottom = wall_y - wall_height // 2
-            top = wall_y + wall_height // 2
-
-            arcade.draw_lrbt_rectangle_filled(left, right, bottom, top, arcade.color.DARK_BROWN)
-            arcade.draw_lrbt_rectangle_outline(left, right, bottom, top, arcade.color.BROWN, 2)
+    def draw_walls(self):
+        draw_bricks = self.quality.draw_bricks
+        if self.chunks is None:
+            if draw_bricks not in self.static_layers:
+                self.static_layers[draw_bricks] = self.level.create_static_layer(draw_bricks)
+            self.static_layers[draw_bricks].draw()
+            return
 
-            brick_size = 20
-            for brick_x in range(int(left), int(right), brick_size):
-                for brick_y in range(int(bottom), int(top), brick_size):
-                    if (brick_x // brick_size + brick_y // brick_size) % 2 == 0:
-                        arcade.draw_lrbt_rectangle_filled(
-                            brick_x, brick_x + brick_size,
-                            brick_y, brick_y + brick_size,
-                            (101, 67, 33)
-                        )
+        # Стена на границе попадает в несколько кусков и рисуется повторно
+        # тем же цветом. Сначала стены всех кусков, потом платформы - как в целом слое
+        self.chunks.update(self.view_rect(CULL_MARGIN))
+        layers = [chunk.layers_for(self.level, draw_bricks) for chunk in self.chunks.visible(self.view_rect())]
+        for walls_layer, platforms_layer in layers:
+            if walls_layer:
+                walls_layer.draw()
+        for walls_layer, platforms_layer in layers:
+            if platforms_layer:
+                platforms_layer.draw()
+
+    def visible_stations(self):
+        if self.chunks is None:
+            return enumerate(self.question_stations)
+
+        indices = sorted(
+            index
+            for chunk in self.chunks.visible(self.view_rect(CULL_MARGIN))
+            for index in chunk.stations
+        )
+        return [(index, self.question_stations[index]) for index in indices]
 
-        for platform in self.platforms:
-            platform.draw()
+    def draw_stations(self):
+        left, bottom, right, top = self.view_rect(CULL_MARGIN)
+        for i, (x, y) in self.visible_stations():
+            if not (left <= x <= right and bottom <= y <= top):
+                continue
 
-        for i, (x, y) in enumerate(self.question_stations):
             if i in self.collected_stations:
                 arcade.draw_circle_filled(x, y, 25, arcade.color.GREEN)
                 arcade.draw_text(
@@ -2885,7 +5882,7 @@ class GameView(arcade.View):
                     anchor_y="center"
                 )
             else:
-                pulse = math.sin(time.time() * 3) * 0.2 + 1
+                pulse = math.sin(time.time() * 3) * 0.2 + 1 if self.quality.animate_stations else 1
                 arcade.draw_circle_filled(x, y, 22 * pulse, arcade.color.BLUE)
                 arcade.draw_circle_outline(x, y, 22 * pulse, arcade.color.LIGHT_BLUE, 3)
                 arcade.draw_text(
@@ -2921,8 +5918,9 @@ class GameView(arcade.View):
                         anchor_y="center"
                     )
 
-        if self.final_door:
-            self.final_door.draw()
+        door = self.final_door
+        if door and left <= door.center_x <= right and bottom <= door.center_y <= top:
+            door.draw()
 
             if self.show_door_message and self.door_message_time > 0:
                 lines = self.door_message_text.split('\n')
@@ -2938,13 +5936,20 @@ class GameView(arcade.View):
                         anchor_y="center"
                     )
 
+    def draw_enemies(self):
+        left, bottom, right, top = self.view_rect(CULL_MARGIN)
         for enemy in self.enemies:
-            enemy.draw()
+            if left <= enemy.center_x <= right and bottom <= enemy.center_y <= top:
+                enemy.draw()
 
-        self.particle_system.draw()
+        if self.swarm:
+            self.swarm.draw((left, bottom, right, top))
 
-        self.draw_player()
+    def draw_particles(self):
+        self.particle_system.draw(self.view_rect(CULL_MARGIN))
 
+    def draw_hud(self):
+        self.hud_camera.use()
         arcade.draw_lrbt_rectangle_filled(
             0, SCREEN_WIDTH,
             SCREEN_HEIGHT - 70, SCREEN_HEIGHT,
@@ -2980,9 +5985,30 @@ class GameView(arcade.View):
             align="center", anchor_x="center", anchor_y="center"
         )
 
+        if self.show_debug_overlay:
+            self.draw_debug_overlay()
+
+        if self.profiler.enabled:
+            self.profiler.draw(SCREEN_WIDTH - 370, SCREEN_HEIGHT - 95)
+
         if self.game_paused:
             self.draw_pause_menu()
 
+    def draw_debug_overlay(self):
+        arcade.draw_lrbt_rectangle_filled(5, 325, SCREEN_HEIGHT - 140, SCREEN_HEIGHT - 95, (0, 0, 0, 160))
+        arcade.draw_text(
+            f"Quality: {self.quality.tier} {self.quality.tier_name}",
+            12, SCREEN_HEIGHT - 108,
+            arcade.color.LIGHT_GREEN, 12,
+            anchor_x="left", anchor_y="center"
+        )
+        arcade.draw_text(
+            f"Frame p95: {self.quality.last_p95:.1f} ms / {self.quality.budget_ms:.1f} ms",
+            12, SCREEN_HEIGHT - 127,
+            arcade.color.LIGHT_GREEN, 12,
+            anchor_x="left", anchor_y="center"
+        )
+
     def draw_player(self):
         arcade.draw_ellipse_filled(
             self.player_x, self.player_y - 10,
@@ -3047,57 +6073,87 @@ class GameView(arcade.View):
             bold=True
         )
 
-        self.pause_buttons = [
-            Button(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 40, 250, 50,
-                   "▶ RESUME", self.resume_game, arcade.color.GREEN),
-            Button(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 20, 250, 50,
-                   "🔄 RESTART LEVEL", self.restart_level, arcade.color.ORANGE),
-        ]
-
-        for button in self.pause_buttons:
-            button.draw()
+        self.pause_ui.draw()
 
     def resume_game(self):
         if self.sound_manager:
             self.sound_manager.play_button_click()
-        self.game_paused = False
-        self.pause_buttons = []
+        if self.game_paused:
+            self.toggle_pause()
+        self.pause_ui.reset_hover()
 
     def restart_level(self):
         if self.sound_manager:
             self.sound_manager.play_button_click()
+        self.record(REPLAY_RESTART)
 
         self.total_score -= self.level_score
         self.level_score = 0
 
         self.start_level()
         self.game_paused = False
-        self.pause_buttons = []
+
+    def advance(self, delta_time):
+        self.time_accumulator += min(delta_time, MAX_FRAME_TIME)
+        while self.time_accumulator >= SIMULATION_DT and self.game_active and not self.game_paused:
+            self.time_accumulator -= SIMULATION_DT
+            self.tick()
+
+    def tick(self):
+        self.update(SIMULATION_DT)
+        self.sim_tick += 1
 
     def update(self, delta_time):
         if self.game_paused:
             return
 
-        current_time = time.time()
-        self.level_time = current_time - self.level_start_time
+        self.level_ticks += 1
+        self.level_time = self.level_ticks * SIMULATION_DT + self.level_quiz_time
 
         if self.show_door_message:
             self.door_message_time -= delta_time
             if self.door_message_time <= 0:
                 self.show_door_message = False
 
-        for enemy in self.enemies:
-            enemy.update(self.player_x, self.player_y, delta_time)
-
         if self.final_door:
             self.final_door.update(delta_time)
 
-        self.particle_system.update(delta_time)
-        self.update_player_physics(delta_time)
+        if self.profiler.enabled:
+            self.profiler.run("update", self.update_phases, delta_time)
+        else:
+            for name, phase in self.update_phases:
+                phase(delta_time)
 
-        self.check_interactions()
+    def toggle_profile_capture(self):
+        if self.profile_capture:
+            self.stop_profile_capture()
+            return
+
+        capture = ProfileCapture(f"level{self.current_level}")
+        if capture.start():
+            self.profile_capture = capture
+
+    def stop_profile_capture(self):
+        if self.profile_capture:
+            self.profile_capture.stop()
+            self.profile_capture = None
+
+    def update_enemies(self, delta_time):
+        if self.flow_field:
+            self.flow_field.update(self.player_x, self.player_y)
+            self.path_service.update()
 
-        self.check_footstep_sounds()
+        self.ai_scheduler.update(self.enemies, self.view_rect(), delta_time, self.update_enemy,
+                                 budget=not (self.recorder or self.headless))
+
+        if self.swarm:
+            self.swarm.update(self.player_x, self.player_y, delta_time)
+
+    def update_enemy(self, enemy, delta_time):
+        enemy.update(self.player_x, self.player_y, delta_time, self.flow_field, self.path_service)
+
+    def update_particles(self, delta_time):
+        self.particle_system.update(delta_time)
 
     def check_footstep_sounds(self):
         if not self.sound_manager or not self.sound_enabled:
@@ -3111,6 +6167,27 @@ class GameView(arcade.View):
                 self.last_footstep_time = current_time
                 self.sound_manager.play_sound('footstep', volume=0.3)
 
+    # На больших уровнях физика проверяет только стены из ячеек сетки вокруг
+    # игрока и ближние платформы. Запросы синхронные и не зависят от
+    # загруженных кусков, поэтому записи воспроизводятся так же
+    def nearby_walls(self):
+        if self.level.fits_screen:
+            return self.walls
+
+        margin = self.level.cell_size
+        return self.level.walls_in(self.player_x - margin, self.player_y - margin,
+                                   self.player_x + margin, self.player_y + margin)
+
+    def nearby_platforms(self):
+        if self.level.fits_screen:
+            return self.platforms
+
+        platforms = self.level.arrays["platforms"]
+        margin = self.level.cell_size
+        mask = ((np.abs(platforms[:, 0] - self.player_x) < platforms[:, 2] // 2 + margin) &
+                (np.abs(platforms[:, 1] - self.player_y) < platforms[:, 3] // 2 + margin))
+        return [Platform(*platform) for platform in self.level.rows_of(platforms, np.nonzero(mask)[0])]
+
     def update_player_physics(self, delta_time):
         self.jump_velocity = self.physics_engine.apply_gravity(
             self.jump_velocity, self.on_ground, delta_time
@@ -3127,28 +6204,30 @@ class GameView(arcade.View):
         if vertical_movement != 0:
             dy = 1 if vertical_movement > 0 else -1
 
+        walls = self.nearby_walls()
+        platforms = self.nearby_platforms()
         new_x, new_y, self.on_ground = self.physics_engine.apply_movement(
             self.player_x, self.player_y,
             dx, dy,
-            self.walls, self.platforms,
+            walls, platforms,
             delta_time
         )
 
         if self.jump_velocity != 0:
             jump_test_y = self.player_y + self.jump_velocity * delta_time * 40
 
-            if not self.physics_engine.check_collision_with_walls(self.player_x, jump_test_y, self.walls):
+            if not self.physics_engine.check_collision_with_walls(self.player_x, jump_test_y, walls):
                 new_y = jump_test_y
             else:
                 self.jump_velocity = 0
 
         self.player_x, self.player_y = new_x, new_y
 
-        self.player_x = max(35, min(SCREEN_WIDTH - 35, self.player_x))
-        self.player_y = max(70, min(SCREEN_HEIGHT - 70, self.player_y))
+        self.player_x = max(35, min(self.level.width - 35, self.player_x))
+        self.player_y = max(70, min(self.level.height - 70, self.player_y))
 
         if not self.on_ground:
-            for platform in self.platforms:
+            for platform in platforms:
                 if (self.player_x + 25 > platform.center_x - platform.width // 2 and
                         self.player_x - 25 < platform.center_x + platform.width // 2 and
                         self.player_y - 25 <= platform.center_y + platform.height // 2 and
@@ -3206,6 +6285,10 @@ class GameView(arcade.View):
                 self.restart_level_from_enemy()
                 return
 
+        if self.swarm and self.swarm.touches(self.player_x, self.player_y):
+            self.restart_level_from_enemy()
+            return
+
         if self.final_door:
             distance = math.sqrt(
                 (self.player_x - self.final_door.center_x) ** 2 +
@@ -3248,12 +6331,8 @@ class GameView(arcade.View):
         self.game_active = False
         question = self.quiz_system.get_question_for_key(station_index)
 
-        if question:
-            self.quiz_system.current_question = question
-            quiz_view = QuizView(self, question, station_index)
-            self.window.show_view(quiz_view)
-        else:
-            backup_question = EnglishQuestion(
+        if not question:
+            question = EnglishQuestion(
                 id="backup",
                 level=self.english_level,
                 question_type="vocabulary",
@@ -3263,9 +6342,97 @@ class GameView(arcade.View):
                 explanation="Game = игра",
                 hint="Entertainment activity"
             )
-            self.quiz_system.current_question = backup_question
-            quiz_view = QuizView(self, backup_question, station_index)
-            self.window.show_view(quiz_view)
+
+        self.quiz_system.current_question = question
+        self.active_quiz = (question, station_index)
+        self.quiz_started = time.perf_counter()
+
+        if self.headless:
+            return
+
+        quiz_view = QuizView(self, question, station_index)
+        self.window.show_view(quiz_view)
+
+    def register_answer(self, question, station_index, option_index, is_correct, attempts, hint_used, latency_ms):
+        if self.recorder:
+            self.recorder.record_answer(option_index, is_correct, hint_used, attempts, latency_ms)
+
+        self.database.record_answer(self.player_name, question.id, is_correct, attempts, hint_used, latency_ms)
+
+        if not is_correct:
+            self.database.update_player_progress(self.player_name, self.current_level, 0, 0, wrong=1)
+            return 0
+
+        if attempts == 1:
+            score_earned = 7 if hint_used else 10
+        else:
+            score_earned = 5
+
+        self.keys_collected += 1
+        self.correct_answers += 1
+        self.level_score += score_earned
+        self.total_score += score_earned
+        self.collected_stations.append(station_index)
+
+        self.database.update_player_progress(self.player_name, self.current_level, 1, score_earned, correct=1)
+
+        self.game_active = True
+        return score_earned
+
+    def finish_quiz(self, elapsed_ms=None):
+        # Время на вопрос входит во время уровня, при воспроизведении берётся из записи
+        if elapsed_ms is None:
+            elapsed_ms = int((time.perf_counter() - self.quiz_started) * 1000)
+        payload = bytearray()
+        write_varint(payload, elapsed_ms)
+        self.record(REPLAY_QUIZ_END, payload)
+
+        self.level_quiz_time += elapsed_ms / 1000
+        self.active_quiz = None
+
+        if self.final_door and self.final_door.locked and self.keys_collected >= self.keys_required:
+            self.final_door.open()
+            if self.sound_manager:
+                self.sound_manager.play_sound('door_open', volume=0.5)
+
+    def next_level(self):
+        self.record(REPLAY_NEXT_LEVEL)
+        self.current_level += 1
+        self.start_level()
+
+    def record(self, opcode, payload=b""):
+        if self.recorder:
+            self.recorder.record(opcode, payload)
+
+    def stop_recording(self):
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+
+    @property
+    def input_state(self):
+        return int(self.key_left) | int(self.key_right) << 1 | int(self.key_down) << 2
+
+    def record_input(self, input_before):
+        if self.input_state != input_before:
+            self.record(REPLAY_STATE, bytes([self.input_state]))
+
+    def set_input_state(self, state):
+        self.key_left = bool(state & 1)
+        self.key_right = bool(state & 2)
+        self.key_down = bool(state & 4)
+
+    def toggle_pause(self):
+        self.game_paused = not self.game_paused
+        self.record(REPLAY_PAUSE)
+
+    def state_digest(self):
+        state = [self.current_level, self.sim_tick, self.total_score, self.keys_collected,
+                 f"{self.player_x:.3f}", f"{self.player_y:.3f}", sorted(self.collected_stations)]
+        state += [f"{enemy.center_x:.3f},{enemy.center_y:.3f}" for enemy in self.enemies]
+        if self.swarm:
+            state.append(zlib.crc32(np.round(self.swarm.positions, 3).tobytes()))
+        return zlib.crc32(repr(state).encode())
 
     def complete_level(self):
         time_bonus = max(0, 100 - int(self.level_time))
@@ -3289,6 +6456,15 @@ class GameView(arcade.View):
             self.current_level,
             self.english_level
         )
+        self.database.flush()
+        self.stop_profile_capture()
+        self.game_active = False
+
+        if self.current_level >= NUM_LEVELS:
+            self.stop_recording()
+
+        if self.headless:
+            return
 
         if self.sound_manager and self.sound_enabled:
             self.sound_manager.play_sound('victory', volume=0.6)
@@ -3298,8 +6474,10 @@ class GameView(arcade.View):
 
     def on_key_press(self, key, modifiers):
         current_time = time.time()
+        input_before = self.input_state
 
         if key == arcade.key.UP or key == arcade.key.W or key == arcade.key.SPACE:
+            self.record(REPLAY_JUMP)
             self.jump()
         elif key == arcade.key.DOWN or key == arcade.key.S:
             self.key_down = True
@@ -3308,18 +6486,33 @@ class GameView(arcade.View):
         elif key == arcade.key.RIGHT or key == arcade.key.D:
             self.key_right = True
         elif key == arcade.key.P:
-            self.game_paused = not self.game_paused
+            self.toggle_pause()
             if self.game_paused and self.sound_manager:
                 self.sound_manager.play_button_click()
+        elif key == arcade.key.F2:
+            self.show_debug_overlay = not self.show_debug_overlay
+        elif key == arcade.key.F3:
+            self.profiler.toggle()
+        elif key == arcade.key.F9:
+            self.toggle_profile_capture()
         elif key == arcade.key.ESCAPE:
             if self.sound_manager:
                 self.sound_manager.play_button_click()
 
+            if self.database:
+                self.database.flush()
+
+            self.stop_profile_capture()
+            self.stop_recording()
+
             from main import StartView
-            start_view = StartView()
+            start_view = StartView(options=self.options)
             self.window.show_view(start_view)
 
+        self.record_input(input_before)
+
     def on_key_release(self, key, modifiers):
+        input_before = self.input_state
         if key == arcade.key.DOWN or key == arcade.key.S:
             self.key_down = False
         elif key == arcade.key.LEFT or key == arcade.key.A:
@@ -3327,22 +6520,17 @@ class GameView(arcade.View):
         elif key == arcade.key.RIGHT or key == arcade.key.D:
             self.key_right = False
 
+        self.record_input(input_before)
+
     def on_mouse_motion(self, x, y, dx, dy):
         if self.game_paused:
-            for button in self.pause_buttons:
-                if button.check_hover(x, y):
-                    button.state = "hover"
-                else:
-                    button.state = "normal"
+            self.pause_ui.on_mouse_motion(x, y)
 
     def on_mouse_press(self, x, y, button, modifiers):
         if button == arcade.MOUSE_BUTTON_LEFT and self.game_paused:
             if self.sound_manager:
                 self.sound_manager.play_button_click()
-            for btn in self.pause_buttons:
-                if btn.check_hover(x, y):
-                    btn.on_click()
-                    return
+            self.pause_ui.on_mouse_press(x, y)
 
 
 class QuizView(arcade.View):
@@ -3362,11 +6550,16 @@ class QuizView(arcade.View):
         self.sound_manager = sound_manager
         self.answered = False
         self.locked = False
+        self.shown_time = 0
+        self.answer_latency_ms = 0
+        self.ui = UILayer()
 
     def on_show_view(self):
+        self.shown_time = time.perf_counter()
         center_x = SCREEN_WIDTH // 2
         start_y = SCREEN_HEIGHT // 2 + 40
 
+        self.ui.clear()
         self.answer_buttons = []
         for i, option in enumerate(self.question.options):
             y = start_y - i * 60
@@ -3375,14 +6568,14 @@ class QuizView(arcade.View):
                 option,
                 lambda opt=option: self.select_answer(opt)
             )
-            self.answer_buttons.append(btn)
+            self.answer_buttons.append(self.ui.add(btn))
 
-        self.hint_button = Button(
+        self.hint_button = self.ui.add(Button(
             SCREEN_WIDTH // 2, 100, 180, 35,
             "💡 Show Hint",
             self.show_hint,
             arcade.color.ORANGE
-        )
+        ))
 
     def select_answer(self, answer):
         if self.locked or self.answered:
@@ -3394,6 +6587,8 @@ class QuizView(arcade.View):
         self.selected_answer = answer
         self.attempts += 1
         self.locked = True
+        self.answer_latency_ms = (time.perf_counter() - self.shown_time) * 1000
+        telemetry.observe("quiz_latency_ms", self.answer_latency_ms, self.question.level)
 
         arcade.schedule(lambda dt: self.check_answer(), 0.1)
 
@@ -3414,6 +6609,16 @@ class QuizView(arcade.View):
 
         is_correct, explanation = self.game_view.quiz_system.check_answer(self.selected_answer)
 
+        score_earned = self.game_view.register_answer(
+            self.question,
+            self.station_index,
+            self.question.options.index(self.selected_answer),
+            is_correct,
+            self.attempts,
+            self.show_hint_text,
+            self.answer_latency_ms
+        )
+
         if self.sound_manager:
             if is_correct:
                 self.sound_manager.play_sound('correct', volume=0.5)
@@ -3421,54 +6626,24 @@ class QuizView(arcade.View):
                 self.sound_manager.play_sound('wrong', volume=0.5)
 
         if is_correct:
-            if self.attempts == 1:
-                if self.show_hint_text:
-                    score_earned = 7
-                    self.result_text = f"✅ Правильно с подсказкой! +7 очков! {explanation}"
-                else:
-                    score_earned = 10
-                    self.result_text = f"✅ Идеально! +10 очков! {explanation}"
+            if score_earned == 7:
+                self.result_text = f"✅ Правильно с подсказкой! +7 очков! {explanation}"
+            elif score_earned == 10:
+                self.result_text = f"✅ Идеально! +10 очков! {explanation}"
             else:
-                score_earned = 5
                 self.result_text = f"✅ Правильно! +5 очков! {explanation}"
 
             self.result_color = arcade.color.GREEN
+            self.answered = True
 
-            if not self.answered:
-                self.answered = True
-                self.game_view.keys_collected += 1
-                self.game_view.correct_answers += 1
-
-                self.game_view.level_score += score_earned
-                self.game_view.total_score += score_earned
-
-                self.game_view.collected_stations.append(self.station_index)
-
-                if self.sound_manager:
-                    self.sound_manager.play_sound('collect', volume=0.4)
-
-                self.game_view.database.update_player_progress(
-                    self.game_view.player_name,
-                    self.game_view.current_level,
-                    1,
-                    score_earned,
-                    correct=1
-                )
+            if self.sound_manager:
+                self.sound_manager.play_sound('collect', volume=0.4)
 
-            self.game_view.game_active = True
             arcade.schedule(self.return_to_game, 2.0)
         else:
             self.result_text = f"❌ Неправильно! {explanation}"
             self.result_color = arcade.color.RED
 
-            self.game_view.database.update_player_progress(
-                self.game_view.player_name,
-                self.game_view.current_level,
-                0,
-                0,
-                wrong=1
-            )
-
             self.locked = False
             self.selected_answer = None
 
@@ -3476,12 +6651,7 @@ class QuizView(arcade.View):
 
     def return_to_game(self, delta_time):
         arcade.unschedule(self.return_to_game)
-        if (self.game_view.final_door and
-                self.game_view.final_door.locked and
-                self.game_view.keys_collected >= self.game_view.keys_required):
-            self.game_view.final_door.open()
-            if self.sound_manager:
-                self.sound_manager.play_sound('door_open', volume=0.5)
+        self.game_view.finish_quiz()
         self.window.show_view(self.game_view)
 
     def on_draw(self):
@@ -3536,8 +6706,12 @@ class QuizView(arcade.View):
         )
 
         for button in self.answer_buttons:
-            button.enabled = not (self.locked or self.answered)
-            button.draw()
+            button.set_enabled(not (self.locked or self.answered))
+
+        if self.hint_button:
+            self.hint_button.set_visible(not self.show_result and not self.answered)
+
+        self.ui.draw()
 
         if self.show_result:
             arcade.draw_text(
@@ -3548,9 +6722,6 @@ class QuizView(arcade.View):
                 width=panel_width - 40
             )
 
-        if not self.show_result and self.hint_button and not self.answered:
-            self.hint_button.draw()
-
         if not self.selected_answer and not self.answered:
             arcade.draw_text(
                 "Choose the correct answer",
@@ -3560,16 +6731,7 @@ class QuizView(arcade.View):
             )
 
     def on_mouse_motion(self, x, y, dx, dy):
-        for button in self.answer_buttons:
-            if button.check_hover(x, y) and button.enabled:
-                button.state = "hover"
-            else:
-                button.state = "normal"
-
-        if self.hint_button and self.hint_button.check_hover(x, y):
-            self.hint_button.state = "hover"
-        elif self.hint_button:
-            self.hint_button.state = "normal"
+        self.ui.on_mouse_motion(x, y)
 
     def on_mouse_press(self, x, y, button, modifiers):
         if button == arcade.MOUSE_BUTTON_LEFT:
@@ -3579,20 +6741,18 @@ class QuizView(arcade.View):
             if self.locked or self.answered:
                 return
 
-            for btn in self.answer_buttons:
-                if btn.check_hover(x, y) and btn.enabled:
-                    btn.on_click()
-                    return
-
-            if not self.show_result and self.hint_button and self.hint_button.check_hover(x, y):
-                self.hint_button.on_click()
+            self.ui.on_mouse_press(x, y)
 
 
 class GameOverView(arcade.View):
     def __init__(self, game_view):
         super().__init__()
         self.game_view = game_view
+        self.options = game_view.options
+        self.rng = self.options.rng.stream("gameover.stars")
         self.buttons = []
+        self.ui = UILayer()
+        self.governor = RedrawGovernor(self)
 
     def on_show_view(self):
         self.buttons = [
@@ -3603,11 +6763,18 @@ class GameOverView(arcade.View):
                    "HIGH SCORES", self.show_high_scores,
                    arcade.color.PURPLE),
         ]
+        self.ui.clear()
+        for button in self.buttons:
+            self.ui.add(button)
+        self.governor.start()
+
+    def on_hide_view(self):
+        self.governor.stop()
 
     def return_to_menu(self):
         if self.game_view.sound_manager:
             self.game_view.sound_manager.play_button_click()
-        start_view = StartView()
+        start_view = StartView(options=self.options)
         self.window.show_view(start_view)
 
     def show_high_scores(self):
@@ -3625,9 +6792,9 @@ class GameOverView(arcade.View):
         )
 
         for i in range(80):
-            x = random.randint(0, SCREEN_WIDTH)
-            y = random.randint(0, SCREEN_HEIGHT)
-            color = random.choice([
+            x = self.rng.randint(0, SCREEN_WIDTH)
+            y = self.rng.randint(0, SCREEN_HEIGHT)
+            color = self.rng.choice([
                 arcade.color.RED, arcade.color.GREEN, arcade.color.BLUE,
                 arcade.color.YELLOW, arcade.color.PURPLE, arcade.color.ORANGE
             ])
@@ -3677,23 +6844,19 @@ class GameOverView(arcade.View):
                 align="center", anchor_x="center", anchor_y="center"
             )
 
-        for button in self.buttons:
-            button.draw()
+        self.ui.draw()
 
     def on_mouse_motion(self, x, y, dx, dy):
-        for button in self.buttons:
-            if button.check_hover(x, y):
-                button.state = "hover"
-            else:
-                button.state = "normal"
+        self.governor.wake()
+        self.ui.on_mouse_motion(x, y)
 
     def on_mouse_press(self, x, y, button, modifiers):
+        self.governor.wake()
         if button == arcade.MOUSE_BUTTON_LEFT:
-            for btn in self.buttons:
-                if btn.check_hover(x, y):
-                    btn.on_click()
+            self.ui.on_mouse_press(x, y)
 
     def on_key_press(self, symbol, modifiers):
+        self.governor.wake()
         if symbol == arcade.key.ESCAPE:
             self.return_to_menu()
 
@@ -3704,21 +6867,91 @@ def create_and_setup_sound_manager():
     return sound_manager
 
 
+def positive_int(value):
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"ожидается положительное число: {value}")
+    return number
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=SCREEN_TITLE)
+    parser.add_argument(
+        "--leaderboard", metavar="HOST:PORT", default=os.environ.get("LEADERBOARD_SERVER"),
+        help="общий сервер таблицы рекордов (также переменная LEADERBOARD_SERVER)"
+    )
+    parser.add_argument(
+        "--no-idle-throttle", action="store_true",
+        help="не снижать частоту кадров меню при простое (загрузка CPU всё равно печатается)"
+    )
+    parser.add_argument("--idle-fps", type=int, default=MENU_IDLE_FPS, help="частота кадров меню при простое")
+    parser.add_argument("--record-replays", metavar="DIR", help="записывать ввод каждой игры в каталог DIR")
+    parser.add_argument("--watch-assets", action="store_true",
+                        help="перезагружать изменённые карты уровней и вопросы при следующем старте уровня")
+    parser.add_argument("--procedural", action="store_true",
+                        help="случайные лабиринты вместо карт из каталога levels (зависят от --seed)")
+    parser.add_argument(
+        "--survival", metavar="ENEMIES", type=positive_int, nargs="?", const=SURVIVAL_ENEMIES, default=0,
+        help=f"режим выживания: рой врагов вместо врагов уровня (по умолчанию {SURVIVAL_ENEMIES})"
+    )
+    parser.add_argument("--chase", action="store_true",
+                        help="враги патрулируют в обход стен и преследуют игрока, когда он рядом")
+    parser.add_argument("--seed", type=int, help="seed генераторов случайных чисел (по умолчанию случайный)")
+    parser.add_argument("--no-telemetry", action="store_true", help=f"не записывать телеметрию в {TELEMETRY_DIR}")
+    parser.add_argument(
+        "--profile", action="store_true",
+        default=os.environ.get("EMA_PROFILE", "").lower() not in ("", "0", "false", "no"),
+        help=f"профилировать всю сессию в {PROFILES_DIR} (также переменная EMA_PROFILE)"
+    )
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
+
     print("=" * 60)
-    print("ENGLISH MAZE ADVENTURE - FINAL FIXED VERSION 3.0")
+    print(f"ENGLISH MAZE ADVENTURE - FINAL FIXED VERSION {GAME_VERSION}")
     print("=" * 60)
 
     os.makedirs("data", exist_ok=True)
 
+    if args.leaderboard:
+        LeaderboardClient.configure(args.leaderboard)
+
+    RedrawGovernor.enabled = not args.no_idle_throttle
+
+    telemetry.enabled = not args.no_telemetry
+    telemetry.start()
+    RedrawGovernor.idle_fps = max(1, args.idle_fps)
+
     sound_manager = create_and_setup_sound_manager()
 
-    window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
+    options = GameOptions(seed=args.seed, replay_dir=args.record_replays, procedural=args.procedural,
+                          chase=args.chase, survival=args.survival)
+    print(f"Seed сессии: {options.seed}")
+    if args.watch_assets:
+        AssetWatcher.configure(options.database_path)
+
+    window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE,
+                           update_rate=WINDOW_UPDATE_RATE, draw_rate=WINDOW_DRAW_RATE)
 
-    start_view = StartView(sound_manager)
+    start_view = StartView(sound_manager, options)
     window.show_view(start_view)
 
-    arcade.run()
+    session_capture = ProfileCapture("session") if args.profile else None
+    if session_capture:
+        session_capture.start()
+
+    try:
+        arcade.run()
+    finally:
+        if session_capture:
+            session_capture.stop()
+
+    if LeaderboardClient.shared:
+        LeaderboardClient.shared.close()
+    if AssetWatcher.shared:
+        AssetWatcher.shared.close()
 
 
 if __name__ == "__main__":
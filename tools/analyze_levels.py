@@ -0,0 +1,195 @@
+# Проверка уровней: достижимость станций и двери и оценка времени
+# прохождения перебором настоящей физики игры
+
+import argparse
+import contextlib
+import io
+import itertools
+import math
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import maze_game  # загружает English-maze-adventure.py как модуль english_maze_adventure
+from english_maze_adventure import (
+    JUMP_POWER, NUM_LEVELS, SIMULATION_DT, TOUCH_DISTANCE, GameOptions, GameView, HeadlessWindow
+)
+
+# Поиск в ширину по состояниям игрока в настоящей физике. Состояния
+# сравниваются с точностью до шага сетки, а время на вопрос - грубая
+# оценка для итогового времени прохождения
+ANALYZER_POSITION_STEP = 3
+ANALYZER_VELOCITY_STEP = 0.8
+ANALYZER_QUIZ_SECONDS = 10
+STATION_RADIUS = 22
+
+
+class LevelAnalyzer:
+    # Проверяет уровень перебором настоящей физики GameView: вершины -
+    # квантованные состояния (x, y, скорость, на земле), ребро - один тик
+    # с вводом влево/вправо/стоять и прыжком с земли. Поиск в ширину даёт
+    # достижимость и число тиков до каждой станции и двери; из точки касания
+    # каждой станции поиск повторяется, и перебор порядков станций даёт
+    # кратчайший маршрут. ReachabilityAnalyzer быстрее, но это модель
+    # прыжка, а здесь - тот же код, что в игре
+    def __init__(self, level_num, procedural=False, seed=0):
+        self.level_num = level_num
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.game_view = GameView(GameOptions(seed=seed, procedural=procedural), window=HeadlessWindow())
+            self.game_view.headless = True
+            self.game_view.current_level = level_num
+            self.game_view.create_level()
+        self.level = self.game_view.level
+        self.targets = list(self.level.stations) + [self.level.door]
+        self.states_explored = 0
+
+    def step(self, state, dx, jump):
+        game_view = self.game_view
+        game_view.player_x, game_view.player_y, game_view.jump_velocity, game_view.on_ground = state
+        # Как GameView.jump, но без звука и частиц
+        if jump:
+            game_view.jump_velocity = JUMP_POWER
+            game_view.on_ground = False
+        game_view.key_left = dx < 0
+        game_view.key_right = dx > 0
+        game_view.update_player_physics(SIMULATION_DT)
+        return game_view.player_x, game_view.player_y, game_view.jump_velocity, game_view.on_ground
+
+    @staticmethod
+    def state_key(state):
+        x, y, velocity, on_ground = state
+        return (round(x / ANALYZER_POSITION_STEP), round(y / ANALYZER_POSITION_STEP),
+                round(velocity / ANALYZER_VELOCITY_STEP), on_ground)
+
+    def touched(self, state):
+        x, y = state[0], state[1]
+        return [index for index, (target_x, target_y) in enumerate(self.targets)
+                if math.hypot(x - target_x, y - target_y) < TOUCH_DISTANCE]
+
+    # Тики и состояние первого касания каждой цели; поиск прекращается,
+    # когда найдены все цели из wanted
+    def explore(self, start, wanted=None):
+        wanted = set(range(len(self.targets)) if wanted is None else wanted)
+        found = {}
+        seen = {self.state_key(start)}
+        frontier = [start]
+        tick = 0
+        while frontier and not wanted <= found.keys():
+            following = []
+            for state in frontier:
+                for index in self.touched(state):
+                    found.setdefault(index, (tick, state))
+                for dx in (-1, 0, 1):
+                    for jump in ((False, True) if state[3] else (False,)):
+                        new_state = self.step(state, dx, jump)
+                        key = self.state_key(new_state)
+                        if key not in seen:
+                            seen.add(key)
+                            following.append(new_state)
+            self.states_explored += len(frontier)
+            frontier = following
+            tick += 1
+        return found
+
+    # Станции, которые задевают стену или лежат за краем уровня
+    def misplaced_stations(self):
+        misplaced = []
+        for index, (x, y) in enumerate(self.level.stations):
+            if not (0 <= x <= self.level.width and 0 <= y <= self.level.height):
+                misplaced.append(index)
+                continue
+            for wall_x, wall_y, wall_width, wall_height in self.level.walls_in(
+                    x - STATION_RADIUS, y - STATION_RADIUS, x + STATION_RADIUS, y + STATION_RADIUS):
+                nearest_x = max(wall_x - wall_width / 2, min(x, wall_x + wall_width / 2))
+                nearest_y = max(wall_y - wall_height / 2, min(y, wall_y + wall_height / 2))
+                if math.hypot(x - nearest_x, y - nearest_y) < STATION_RADIUS:
+                    misplaced.append(index)
+                    break
+        return misplaced
+
+    def analyze(self):
+        started = time.perf_counter()
+        door = len(self.targets) - 1
+        start = (self.game_view.player_x, self.game_view.player_y, 0, False)
+        from_start = self.explore(start)
+        stations = [index for index in range(door) if index in from_start]
+
+        # Тики между станциями и от станций до двери
+        ticks = {(None, index): from_start[index][0] for index in from_start}
+        for index in stations:
+            for target, (tick, state) in self.explore(from_start[index][1], set(stations) | {door}).items():
+                ticks[(index, target)] = tick
+
+        route = None
+        route_ticks = None
+        if len(stations) == door and door in from_start:
+            for order in itertools.permutations(stations):
+                path = (None,) + order + (door,)
+                if all((a, b) in ticks for a, b in zip(path, path[1:])):
+                    total = sum(ticks[(a, b)] for a, b in zip(path, path[1:]))
+                    if route_ticks is None or total < route_ticks:
+                        route, route_ticks = list(order), total
+
+        report = {
+            "level": self.level_num,
+            "source": self.level.header.get("source"),
+            "stations": len(self.level.stations),
+            "reachable_stations": stations,
+            "unreachable_stations": [index for index in range(door) if index not in from_start],
+            "misplaced_stations": self.misplaced_stations(),
+            "door_reachable": door in from_start,
+            "route": route,
+            "route_seconds": None if route_ticks is None else round(route_ticks * SIMULATION_DT, 2),
+            "expected_seconds": None if route_ticks is None else
+            round(route_ticks * SIMULATION_DT + len(stations) * ANALYZER_QUIZ_SECONDS, 1),
+            "states": self.states_explored,
+            "analysis_seconds": round(time.perf_counter() - started, 2),
+        }
+        report["ok"] = route is not None and not report["misplaced_stations"]
+        return report
+
+
+def analyze_level(level_num, procedural=False, seed=0):
+    return LevelAnalyzer(level_num, procedural, seed).analyze()
+
+
+def station_names(indices):
+    return ", ".join(f"Q{index + 1}" for index in indices) or "-"
+
+
+# Все уровни параллельно в пуле процессов; код выхода 1, если хоть один не проходится
+def run_level_analysis(level_nums=None, procedural=False, seed=0, workers=None):
+    level_nums = level_nums or list(range(1, NUM_LEVELS + 1))
+    print(f"Анализ уровней {', '.join(map(str, level_nums))}"
+          f"{' (процедурные, seed ' + str(seed) + ')' if procedural else ''}")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        reports = list(executor.map(analyze_level, level_nums,
+                                    itertools.repeat(procedural), itertools.repeat(seed)))
+
+    for report in reports:
+        print(f"Уровень {report['level']} ({report['source']}): {'OK' if report['ok'] else 'ОШИБКА'}")
+        print(f"  станции достижимы: {station_names(report['reachable_stations'])}; "
+              f"недостижимы: {station_names(report['unreachable_stations'])}; "
+              f"в стене или за краем: {station_names(report['misplaced_stations'])}")
+        print(f"  дверь достижима: {'да' if report['door_reachable'] else 'нет'}")
+        if report["route"] is not None:
+            print(f"  маршрут: старт -> {' -> '.join(f'Q{index + 1}' for index in report['route'])} -> дверь, "
+                  f"{report['route_seconds']} с в движении, ~{report['expected_seconds']} с "
+                  f"с вопросами по {ANALYZER_QUIZ_SECONDS} с")
+        print(f"  состояний: {report['states']}, {report['analysis_seconds']} с")
+    return all(report["ok"] for report in reports)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Анализ уровней English Maze Adventure")
+    parser.add_argument("levels", metavar="LEVEL", type=int, nargs="*", help="номера уровней (по умолчанию все)")
+    parser.add_argument("--procedural", action="store_true", help="проверить процедурные лабиринты для --seed")
+    parser.add_argument("--seed", type=int, default=0, help="seed процедурных лабиринтов")
+    args = parser.parse_args()
+
+    sys.exit(0 if run_level_analysis(args.levels, args.procedural, args.seed) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+# Бенчмарки без окна: сценарии физики, врагов, частиц и базы данных
+# или отрисовка каждого уровня (--render). Результаты пишутся в JSON
+# для сравнения между версиями (--baseline)
+
+import argparse
+import contextlib
+import functools
+import itertools
+import json
+import math
+import os
+import socket
+import sqlite3
+import sys
+import tempfile
+import time
+
+import arcade
+
+import maze_game  # загружает English-maze-adventure.py как модуль english_maze_adventure
+from english_maze_adventure import (
+    ENEMY_SPEED, GAME_VERSION, KEYS_PER_LEVEL, NUM_LEVELS, SCREEN_HEIGHT, SCREEN_TITLE, SCREEN_WIDTH,
+    SIMULATION_DT, EnemySwarm, EnglishQuizSystem, GameOptions, GameView, HeadlessWindow, MazeGenerator,
+    NavGrid, ParticleSystem, PlayerDatabase, SessionRNG, percentile, positive_int, telemetry
+)
+
+# Каталог результатов и параметры замеров
+BENCHMARKS_DIR = "data/benchmarks"
+BENCHMARK_MIN_TIME = 0.5
+BENCHMARK_MIN_ROUNDS = 5
+BENCHMARK_QUESTION_BANK = 20000
+BENCHMARK_PARTICLES = 10000
+BENCHMARK_SWARM = 500
+BENCHMARK_REGRESSION_THRESHOLD = 0.10
+RENDER_BENCHMARK_FRAMES = 120
+RENDER_BENCHMARK_WARMUP = 10
+
+
+class BenchmarkSuite:
+    # Сценарии производительности без окна. Каждый сценарий готовит данные
+    # и возвращает функцию, выполняющую пакет операций; пакеты повторяются,
+    # пока не наберётся min_time секунд, а в JSON пишется время одной операции
+    kind = "benchmark"
+
+    def __init__(self, directory=BENCHMARKS_DIR, seed=0, min_time=BENCHMARK_MIN_TIME):
+        self.directory = directory
+        self.seed = seed
+        self.min_time = min_time
+        self.rng = SessionRNG(seed)
+        self.temp_dir = None
+        self.question_db = None
+        self.results = {}
+        self.metadata = {"min_time": min_time}
+        self.scenarios = [
+            (f"physics.apply_movement.level{level_num}", functools.partial(self.bench_apply_movement, level_num))
+            for level_num in range(1, NUM_LEVELS + 1)
+        ] + [
+            (f"game.check_interactions.level{level_num}", functools.partial(self.bench_check_interactions, level_num))
+            for level_num in range(1, NUM_LEVELS + 1)
+        ] + [
+            ("enemies.swarm_update", self.bench_swarm_update),
+            ("particles.update", self.bench_particles_update),
+            ("particles.update_expiring", self.bench_particles_expiring),
+            ("db.update_player_progress", self.bench_update_player_progress),
+            ("db.get_questions_by_level", functools.partial(self.bench_get_questions, False)),
+            ("db.get_questions_by_level.seen", functools.partial(self.bench_get_questions, True)),
+            ("quiz.initialize_game_questions", self.bench_initialize_game_questions),
+            ("levels.generate", self.bench_generate_level),
+        ]
+
+    def run(self, names=None):
+        selected = [(name, scenario) for name, scenario in self.scenarios
+                    if not names or any(name.startswith(prefix) for prefix in names)]
+        if not selected:
+            print(f"Нет сценариев по фильтру {' '.join(names)}")
+            return None
+
+        telemetry.enabled = False
+        print(f"Бенчмарк {self.kind}: {len(selected)} сценариев, seed {self.seed}")
+
+        with tempfile.TemporaryDirectory() as self.temp_dir:
+            for name, scenario in selected:
+                # Сценарии вызывают код игры, который много печатает
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    result = self.run_scenario(scenario)
+                self.results[name] = result
+                print(self.describe(name, result))
+            self.question_db = None
+
+        return self.save()
+
+    def run_scenario(self, scenario):
+        batch, reset = scenario()
+        return self.measure(batch, reset)
+
+    def describe(self, name, result):
+        return (f"  {name:<40} {result['median_us']:>12.2f} мкс/оп  "
+                f"p95 {result['p95_us']:>10.2f}  {result['ops_per_sec']:>12.0f} оп/с")
+
+    def measure(self, batch, reset=None):
+        samples = []
+        total_ops = 0
+        total_time = 0
+        while total_time < self.min_time or len(samples) < BENCHMARK_MIN_ROUNDS:
+            if reset:
+                reset()
+            started = time.perf_counter()
+            ops = batch()
+            elapsed = time.perf_counter() - started
+            samples.append(elapsed / ops)
+            total_ops += ops
+            total_time += elapsed
+
+        samples.sort()
+        return {
+            "rounds": len(samples),
+            "ops": total_ops,
+            "min_us": samples[0] * 1e6,
+            "median_us": percentile(samples, 0.5) * 1e6,
+            "p95_us": percentile(samples, 0.95) * 1e6,
+            "ops_per_sec": total_ops / total_time,
+        }
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, time.strftime(f"{self.kind}-%Y%m%d-%H%M%S.json"))
+        report = {
+            "version": GAME_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "host": socket.gethostname(),
+            "python": sys.version.split()[0],
+            "platform": sys.platform,
+            "seed": self.seed,
+            **self.metadata,
+            "results": self.results,
+        }
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+        print(f"Результаты сохранены в {path}")
+        return path
+
+    def compare(self, baseline_path, threshold=BENCHMARK_REGRESSION_THRESHOLD):
+        with open(baseline_path, encoding="utf-8") as file:
+            baseline = json.load(file)
+
+        print(f"Сравнение с {baseline_path} (версия {baseline.get('version')}, {baseline.get('created')}):")
+        regressions = []
+        for name, result in self.results.items():
+            previous = baseline.get("results", {}).get(name)
+            if not previous:
+                print(f"  {name:<40} нет в базовом файле")
+                continue
+
+            change = result["median_us"] / previous["median_us"] - 1
+            mark = ""
+            if change > threshold:
+                regressions.append(name)
+                mark = "  <- регрессия"
+            print(f"  {name:<40} {change * 100:+7.1f}%{mark}")
+
+        print(f"Регрессий больше {threshold * 100:.0f}%: {len(regressions)}")
+        return regressions
+
+    def create_game_view(self, level_num):
+        game_view = GameView(GameOptions(seed=self.seed), window=HeadlessWindow())
+        game_view.headless = True
+        game_view.current_level = level_num
+        game_view.create_level()
+        return game_view
+
+    def create_question_db(self):
+        # Большой банк вопросов: базовые вопросы B1, размноженные до
+        # BENCHMARK_QUESTION_BANK строк, половина из них уже встречалась игроку
+        if self.question_db:
+            return self.question_db
+
+        database = PlayerDatabase(os.path.join(self.temp_dir, "questions.db"))
+        conn = sqlite3.connect(database.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT question_type, question_text, option1, option2, option3, option4,
+                   correct_option, explanation, hint
+            FROM english_questions WHERE question_level = 'B1'
+        ''')
+        templates = cursor.fetchall()
+        cursor.executemany('''
+            INSERT INTO english_questions
+            (question_level, question_type, question_text, option1, option2, option3, option4,
+             correct_option, explanation, hint, difficulty)
+            VALUES ('B1', ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+        ''', (
+            (row[0], f"{row[1]} #{i}") + row[2:]
+            for i, row in zip(range(BENCHMARK_QUESTION_BANK - len(templates)), itertools.cycle(templates))
+        ))
+        conn.commit()
+        cursor.execute("SELECT id FROM english_questions WHERE question_level = 'B1'")
+        question_ids = [row[0] for row in cursor.fetchall()]
+        conn.close()
+
+        database.create_or_update_player("bench", "B1")
+        database.mark_questions_seen("bench", question_ids[::2])
+        database.flush_seen_questions()
+        self.question_db = database
+        return database
+
+    def bench_apply_movement(self, level_num):
+        game_view = self.create_game_view(level_num)
+        physics = game_view.physics_engine
+        walls, platforms = game_view.walls, game_view.platforms
+        rng = self.rng.stream(f"bench.physics.level{level_num}")
+        moves = [
+            (rng.uniform(35, SCREEN_WIDTH - 35), rng.uniform(45, SCREEN_HEIGHT - 70),
+             rng.choice((-1, 0, 1)), rng.choice((-1, 0, 1)))
+            for _ in range(1000)
+        ]
+
+        def batch():
+            for x, y, dx, dy in moves:
+                physics.apply_movement(x, y, dx, dy, walls, platforms, SIMULATION_DT)
+            return len(moves)
+
+        return batch, None
+
+    def bench_check_interactions(self, level_num):
+        game_view = self.create_game_view(level_num)
+        rng = self.rng.stream(f"bench.interactions.level{level_num}")
+
+        # Только точки, где не срабатывают станции и враги: иначе замер
+        # уйдёт в вопрос или перезапуск уровня
+        positions = []
+        while len(positions) < 1000:
+            x, y = rng.uniform(35, SCREEN_WIDTH - 35), rng.uniform(45, SCREEN_HEIGHT - 70)
+            if all(math.hypot(x - sx, y - sy) >= 40 for sx, sy in game_view.question_stations) and \
+                    all(math.hypot(x - enemy.center_x, y - enemy.center_y) >= 35 for enemy in game_view.enemies):
+                positions.append((x, y))
+
+        def batch():
+            for game_view.player_x, game_view.player_y in positions:
+                game_view.check_interactions()
+            return len(positions)
+
+        return batch, None
+
+    def bench_swarm_update(self):
+        game_view = self.create_game_view(1)
+        swarm = EnemySwarm(NavGrid(game_view.level), BENCHMARK_SWARM, ENEMY_SPEED,
+                           self.rng.numpy_stream("bench.swarm"), game_view.level.player_start)
+        self.metadata["swarm_enemies"] = BENCHMARK_SWARM
+
+        # Тик роя вместе с проверкой касания; игрок ходит по кругу, чтобы
+        # часть роя всё время преследовала его
+        def batch():
+            for step in range(60):
+                x = SCREEN_WIDTH / 2 + math.cos(step / 10) * 300
+                y = SCREEN_HEIGHT / 2 + math.sin(step / 10) * 200
+                swarm.update(x, y, SIMULATION_DT)
+                swarm.touches(x, y)
+            return 60
+
+        return batch, None
+
+    def bench_particles_update(self):
+        particle_system = ParticleSystem(self.rng.stream("bench.particles"))
+
+        def reset():
+            particle_system.particles = []
+            particle_system.create_explosion(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, count=BENCHMARK_PARTICLES)
+
+        def batch():
+            # 10 шагов по 1/60 с: ни одна частица ещё не погасла
+            for _ in range(10):
+                particle_system.update(SIMULATION_DT)
+            return 10
+
+        return batch, reset
+
+    def bench_particles_expiring(self):
+        particle_system = ParticleSystem(self.rng.stream("bench.particles"))
+        rng = self.rng.stream("bench.particles.life")
+
+        def reset():
+            particle_system.particles = []
+            particle_system.create_explosion(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, count=BENCHMARK_PARTICLES)
+            for particle in particle_system.particles:
+                particle['life'] = rng.uniform(0, 1)
+
+        def batch():
+            steps = 0
+            while particle_system.particles:
+                particle_system.update(SIMULATION_DT)
+                steps += 1
+            return steps
+
+        return batch, reset
+
+    def bench_update_player_progress(self):
+        database = PlayerDatabase(os.path.join(self.temp_dir, "progress.db"))
+        database.create_or_update_player("bench", "A1")
+
+        def batch():
+            for i in range(20):
+                database.update_player_progress("bench", i % NUM_LEVELS + 1, i % KEYS_PER_LEVEL, 10, 1, 0)
+            return 20
+
+        return batch, None
+
+    def bench_get_questions(self, with_seen):
+        database = self.create_question_db()
+        rng = self.rng.stream("bench.questions")
+        username = "bench" if with_seen else None
+
+        def batch():
+            database.get_questions_by_level("B1", limit=50, username=username, rng=rng)
+            return 1
+
+        return batch, None
+
+    def bench_generate_level(self):
+        generator = MazeGenerator(self.rng.stream("bench.maze"))
+        levels = itertools.cycle(range(1, NUM_LEVELS + 1))
+
+        def batch():
+            generator.generate(next(levels))
+            return 1
+
+        return batch, None
+
+    def bench_initialize_game_questions(self):
+        quiz_system = EnglishQuizSystem(self.create_question_db(), self.rng.stream("bench.quiz"))
+
+        def batch():
+            quiz_system.initialize_game_questions("B1", "bench")
+            return 1
+
+        return batch, None
+
+
+class RenderBenchmark(BenchmarkSuite):
+    # Рисует каждый уровень frames кадров в окне без экрана (ARCADE_HEADLESS=1
+    # через EGL или Xvfb, на CI - программный llvmpipe). Симуляция делает
+    # один тик на кадр вне замера, качество графики закреплено на FULL
+    kind = "render"
+
+    def __init__(self, frames=RENDER_BENCHMARK_FRAMES, directory=BENCHMARKS_DIR, seed=0):
+        super().__init__(directory, seed)
+        self.frames = frames
+        self.window = None
+        self.metadata = {"frames": frames}
+        self.scenarios = [
+            (f"render.level{level_num}", functools.partial(self.bench_render_level, level_num))
+            for level_num in range(1, NUM_LEVELS + 1)
+        ]
+
+    def run(self, names=None):
+        try:
+            self.window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE, vsync=False)
+        except Exception as e:
+            print(f"Не удалось создать контекст OpenGL: {e}")
+            print("Запустите с ARCADE_HEADLESS=1 или под Xvfb")
+            return None
+
+        info = self.window.ctx.info
+        self.metadata["renderer"] = f"{info.VENDOR} {info.RENDERER}"
+        print(f"OpenGL: {self.metadata['renderer']}")
+        try:
+            return super().run(names)
+        finally:
+            self.window.close()
+
+    def run_scenario(self, scenario):
+        return scenario()
+
+    def describe(self, name, result):
+        return (f"  {name:<16} {result['ops_per_sec']:>7.1f} к/с  кадр {result['median_us'] / 1000:>7.2f} мс  "
+                f"p95 {result['p95_us'] / 1000:>7.2f} мс  glDraw {result['draw_calls']:>4}")
+
+    def bench_render_level(self, level_num):
+        game_view = GameView(GameOptions(seed=self.seed), window=self.window)
+        game_view.headless = True
+        game_view.quality.pinned = True
+        game_view.current_level = level_num
+        game_view.create_level()
+        self.window.show_view(game_view)
+
+        profiler = game_view.profiler
+        counter = profiler.draw_counter
+        frame_times = []
+        draw_calls = []
+
+        profiler.enable()
+        try:
+            for frame in range(RENDER_BENCHMARK_WARMUP + self.frames):
+                if frame == RENDER_BENCHMARK_WARMUP:
+                    profiler.samples = {}
+                game_view.tick()
+
+                counter.calls = 0
+                started = time.perf_counter()
+                profiler.run("draw", game_view.draw_phases)
+                self.window.flip()
+                self.window.ctx.finish()
+                elapsed = time.perf_counter() - started
+
+                if frame >= RENDER_BENCHMARK_WARMUP:
+                    frame_times.append(elapsed)
+                    draw_calls.append(counter.calls)
+        finally:
+            profiler.disable()
+
+        phases = {key: percentile(sorted(values), 0.5) for key, values in profiler.samples.items()}
+        frame_times.sort()
+        return {
+            "rounds": self.frames,
+            "ops": self.frames,
+            "min_us": frame_times[0] * 1e6,
+            "median_us": percentile(frame_times, 0.5) * 1e6,
+            "p95_us": percentile(frame_times, 0.95) * 1e6,
+            "ops_per_sec": self.frames / sum(frame_times),
+            "draw_calls": percentile(sorted(draw_calls), 0.5),
+            "phases_ms": phases,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки English Maze Adventure")
+    parser.add_argument("names", metavar="NAME", nargs="*",
+                        help=f"префиксы имён сценариев (по умолчанию все); JSON пишется в {BENCHMARKS_DIR}")
+    parser.add_argument("--time", type=float, default=BENCHMARK_MIN_TIME,
+                        help="минимальное время замера одного сценария, с")
+    parser.add_argument(
+        "--render", metavar="FRAMES", type=positive_int, nargs="?", const=RENDER_BENCHMARK_FRAMES,
+        help="замерить отрисовку каждого уровня без экрана (ARCADE_HEADLESS=1 или Xvfb)"
+    )
+    parser.add_argument("--baseline", metavar="PATH",
+                        help="сравнить результаты с JSON прошлого запуска; код выхода 1 при регрессии")
+    parser.add_argument("--seed", type=int, default=0, help="seed генераторов случайных чисел")
+    args = parser.parse_args()
+
+    if args.render is not None:
+        suite = RenderBenchmark(args.render, seed=args.seed)
+    else:
+        suite = BenchmarkSuite(seed=args.seed, min_time=args.time)
+    if suite.run(args.names) is None:
+        sys.exit(2)
+    if args.baseline and suite.compare(args.baseline):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Нагрузочный тест сервера таблицы рекордов (tools/leaderboard_server.py):
+# множество клиентов одновременно отправляют результаты и запрашивают
+# лучшие, в конце печатаются пропускная способность и задержки
+
+import argparse
+import asyncio
+import random
+import time
+
+import maze_game  # загружает English-maze-adventure.py как модуль english_maze_adventure
+from english_maze_adventure import (
+    ENGLISH_LEVELS, LEADERBOARD_DEFAULT_PORT, NUM_LEVELS, leaderboard_request, parse_address, percentile,
+    positive_int
+)
+
+
+def run_leaderboard_load_test(address, clients=300, submissions=20, batch_size=1):
+    host, port = parse_address(address)
+
+    async def submitter(client_id, latencies, errors):
+        for start in range(0, submissions, batch_size):
+            batch = [
+                (f"load_{client_id}", random.randint(0, 2000), random.randint(1, NUM_LEVELS),
+                 random.choice(list(ENGLISH_LEVELS.keys())))
+                for _ in range(min(batch_size, submissions - start))
+            ]
+            request_start = time.perf_counter()
+            try:
+                await leaderboard_request(host, port, {"op": "submit", "scores": batch}, timeout=30)
+                if start % (batch_size * 5) == 0:
+                    await leaderboard_request(host, port, {"op": "top", "limit": 10}, timeout=30)
+                latencies.append(time.perf_counter() - request_start)
+            except (OSError, asyncio.TimeoutError, ValueError):
+                errors.append(client_id)
+
+    async def run():
+        latencies = []
+        errors = []
+        started = time.perf_counter()
+        await asyncio.gather(*(submitter(i, latencies, errors) for i in range(clients)))
+        return latencies, errors, time.perf_counter() - started
+
+    print(f"Нагрузочный тест: {clients} клиентов x {submissions} результатов (пакет {batch_size}) -> {host}:{port}")
+    latencies, errors, elapsed = asyncio.run(run())
+    latencies.sort()
+
+    total = clients * submissions - len(errors) * batch_size
+    print(f"Отправлено результатов: {total} за {elapsed:.2f} с ({total / elapsed:.0f} в секунду)")
+    print(f"Ошибок: {len(errors)}")
+    if latencies:
+        for name, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+            print(f"{name}: {percentile(latencies, q) * 1000:.1f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервера таблицы рекордов")
+    parser.add_argument("address", metavar="HOST:PORT", nargs="?", default=f"127.0.0.1:{LEADERBOARD_DEFAULT_PORT}",
+                        help="адрес сервера")
+    parser.add_argument("--clients", type=positive_int, default=300, help="число клиентов")
+    parser.add_argument("--submissions", type=positive_int, default=20, help="результатов на клиента")
+    parser.add_argument("--batch-size", type=positive_int, default=1, help="размер пакета")
+    args = parser.parse_args()
+
+    run_leaderboard_load_test(args.address, args.clients, args.submissions, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
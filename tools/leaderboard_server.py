@@ -0,0 +1,168 @@
+# Сервер таблицы рекордов: python tools/leaderboard_server.py [HOST:PORT].
+# Игры подключаются к нему с --leaderboard HOST:PORT
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import maze_game  # загружает English-maze-adventure.py как модуль english_maze_adventure
+from english_maze_adventure import (
+    ENGLISH_LEVELS, LEADERBOARD_DEFAULT_PORT, NUM_LEVELS, Leaderboard, parse_address
+)
+
+
+class LeaderboardServer:
+    # Общая таблица рекордов для компьютерного класса. Протокол - JSON
+    # по одной строке на запрос:
+    #   {"op": "submit", "scores": [[имя, очки, уровень, английский], ...]}
+    #   {"op": "top", "limit": 10, "level": null, "english_level": null}
+
+    def __init__(self, host="0.0.0.0", port=LEADERBOARD_DEFAULT_PORT, db_path="data/leaderboard_server.db"):
+        self.host = host
+        self.port = port
+        self.db_path = db_path
+        # Все обращения к SQLite идут через один поток, чтобы не блокировать цикл событий
+        self.db_executor = ThreadPoolExecutor(max_workers=1)
+        self.submit_queue = None
+        self.writer_task = None
+        self.submissions = 0
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(db_path)
+        Leaderboard.create_schema(conn.cursor())
+        conn.commit()
+        conn.close()
+
+        self.leaderboard = Leaderboard.for_database(db_path)
+
+    async def handle_client(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        response = {"ok": False, "error": "request must be an object"}
+                    elif request.get("op") == "submit":
+                        entries = request.get("scores", [])
+                        if not isinstance(entries, list) or not all(map(self.valid_score, entries)):
+                            response = {"ok": False, "error": "bad score entry"}
+                        else:
+                            scores = [tuple(entry) for entry in entries]
+                            if scores:
+                                done = loop.create_future()
+                                await self.submit_queue.put((scores, done))
+                                await done
+                            response = {"ok": True, "accepted": len(scores)}
+                    elif request.get("op") == "top":
+                        limit = request.get("limit", 10)
+                        level = request.get("level")
+                        english_level = request.get("english_level")
+                        if not self.valid_top_query(limit, level, english_level):
+                            response = {"ok": False, "error": "bad top query"}
+                        else:
+                            # Больше cache_size строк не отдаём: LIMIT -1 в SQLite - вся таблица
+                            scores = await loop.run_in_executor(
+                                self.db_executor,
+                                self.leaderboard.top,
+                                max(1, min(limit, self.leaderboard.cache_size)),
+                                level,
+                                english_level
+                            )
+                            response = {"ok": True, "scores": [list(row) for row in scores]}
+                    else:
+                        response = {"ok": False, "error": "unknown op"}
+                except (ValueError, TypeError, KeyError) as e:
+                    response = {"ok": False, "error": str(e)}
+
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    # Результат - [имя, очки, уровень, английский уровень или null]
+    @staticmethod
+    def valid_score(entry):
+        return (isinstance(entry, list) and len(entry) == 4 and isinstance(entry[0], str)
+                and all(isinstance(value, int) and not isinstance(value, bool) for value in entry[1:3])
+                and (entry[3] is None or isinstance(entry[3], str)))
+
+    # Фильтры ограничены известными значениями: каждый новый ключ
+    # добавляет запись в top_cache, который не вытесняется
+    @staticmethod
+    def valid_top_query(limit, level, english_level):
+        return (isinstance(limit, int) and not isinstance(limit, bool)
+                and (level is None or (isinstance(level, int) and not isinstance(level, bool)
+                                       and 1 <= level <= NUM_LEVELS))
+                and (english_level is None or english_level in ENGLISH_LEVELS))
+
+    async def write_submissions(self):
+        # Групповая запись: всё, что пришло от разных клиентов за время
+        # предыдущей транзакции, попадает в одну транзакцию SQLite. Если она
+        # не прошла, пачки пишутся по одной, чтобы ошибка одного клиента
+        # не отклонила результаты остальных
+        loop = asyncio.get_running_loop()
+        while True:
+            batches = [await self.submit_queue.get()]
+            while not self.submit_queue.empty():
+                batches.append(self.submit_queue.get_nowait())
+
+            scores = [entry for batch_scores, _ in batches for entry in batch_scores]
+            try:
+                await loop.run_in_executor(self.db_executor, self.leaderboard.submit_many, scores)
+            except Exception as e:
+                if len(batches) == 1:
+                    batches[0][1].set_exception(ValueError(f"ошибка базы: {e}"))
+                    continue
+            else:
+                self.submissions += len(scores)
+                for _, done in batches:
+                    done.set_result(True)
+                continue
+
+            for batch_scores, done in batches:
+                try:
+                    await loop.run_in_executor(self.db_executor, self.leaderboard.submit_many, batch_scores)
+                except Exception as e:
+                    done.set_exception(ValueError(f"ошибка базы: {e}"))
+                else:
+                    self.submissions += len(batch_scores)
+                    done.set_result(True)
+
+    async def serve(self):
+        self.submit_queue = asyncio.Queue()
+        self.writer_task = asyncio.create_task(self.write_submissions())
+        server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        print(f"Сервер таблицы рекордов слушает {self.host}:{self.port} (база {self.db_path})")
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            print(f"Сервер остановлен. Принято результатов: {self.submissions}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сервер таблицы рекордов English Maze Adventure")
+    parser.add_argument("address", metavar="HOST:PORT", nargs="?", default=f"0.0.0.0:{LEADERBOARD_DEFAULT_PORT}",
+                        help="адрес, на котором принимать подключения")
+    parser.add_argument("--db", default="data/leaderboard_server.db", help="файл базы рекордов сервера")
+    args = parser.parse_args()
+
+    host, port = parse_address(args.address, default_host="0.0.0.0")
+    LeaderboardServer(host, port, args.db).run()
+
+
+if __name__ == "__main__":
+    main()
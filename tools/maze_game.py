@@ -0,0 +1,15 @@
+# Игра - один файл English-maze-adventure.py, и из-за дефисов в имени его
+# нельзя импортировать обычным import. Инструменты из этого каталога
+# импортируют этот модуль первым: он загружает игру под именем
+# english_maze_adventure, после чего работает from english_maze_adventure import ...
+import importlib.util
+import os
+import sys
+
+GAME_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "English-maze-adventure.py")
+
+if "english_maze_adventure" not in sys.modules:
+    spec = importlib.util.spec_from_file_location("english_maze_adventure", GAME_PATH)
+    game = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = game
+    spec.loader.exec_module(game)
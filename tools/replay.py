@@ -0,0 +1,180 @@
+# Воспроизведение записей игры (--record-replays) без окна и звука.
+# Код выхода 1, если состояние игры разошлось с записью, - записи
+# можно использовать как регрессионные тесты
+
+import argparse
+import os
+import struct
+import sys
+import tempfile
+import time
+
+import maze_game  # загружает English-maze-adventure.py как модуль english_maze_adventure
+from english_maze_adventure import (
+    REPLAY_ANSWER, REPLAY_END, REPLAY_FLAG_CHASE, REPLAY_FLAG_PROCEDURAL, REPLAY_FLAG_SURVIVAL, REPLAY_JUMP,
+    REPLAY_MAGIC, REPLAY_NEXT_LEVEL, REPLAY_PAUSE, REPLAY_QUIZ_END, REPLAY_RESTART, REPLAY_STATE,
+    SIMULATION_DT, GameOptions, GameView, HeadlessWindow
+)
+
+
+def read_varint(data, offset):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def read_signed_varint(data, offset):
+    value, offset = read_varint(data, offset)
+    return value >> 1 ^ -(value & 1), offset
+
+
+def read_string(data, offset):
+    length, offset = read_varint(data, offset)
+    if offset + length > len(data):
+        raise IndexError("строка выходит за конец данных")
+    return data[offset:offset + length].decode("utf-8"), offset + length
+
+
+class ReplayPlayer:
+    # Воспроизводит запись без окна и звука с максимальной скоростью
+    # во временной базе данных
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            data = file.read()
+
+        if data[:len(REPLAY_MAGIC)] != REPLAY_MAGIC:
+            raise ValueError(f"{path}: это не запись игры")
+
+        # Обрезанный файл выдаёт себя IndexError/struct.error при разборе
+        try:
+            self.parse(data)
+        except (IndexError, struct.error, UnicodeDecodeError) as exc:
+            raise ValueError(f"{path}: запись обрезана или повреждена ({exc})") from None
+
+    def parse(self, data):
+        self.seed, offset = read_signed_varint(data, len(REPLAY_MAGIC))
+        self.level, flags = data[offset], data[offset + 1]
+        offset += 2
+        self.procedural = bool(flags & REPLAY_FLAG_PROCEDURAL)
+        self.chase = bool(flags & REPLAY_FLAG_CHASE)
+        self.english_level, offset = read_string(data, offset)
+        self.player_name, offset = read_string(data, offset)
+        self.survival = 0
+        if flags & REPLAY_FLAG_SURVIVAL:
+            self.survival, offset = read_varint(data, offset)
+
+        self.events = []
+        tick = 0
+        while offset < len(data):
+            delta, offset = read_varint(data, offset)
+            tick += delta
+            opcode = data[offset]
+            offset += 1
+
+            payload = None
+            if opcode == REPLAY_STATE:
+                payload = data[offset]
+                offset += 1
+            elif opcode == REPLAY_ANSWER:
+                option_index, flags = data[offset], data[offset + 1]
+                attempts, offset = read_varint(data, offset + 2)
+                latency_ms, offset = read_varint(data, offset)
+                payload = (option_index, bool(flags & 1), attempts, bool(flags & 2), latency_ms)
+            elif opcode == REPLAY_QUIZ_END:
+                payload, offset = read_varint(data, offset)
+            elif opcode == REPLAY_END:
+                payload = struct.unpack_from("<I", data, offset)[0]
+                offset += 4
+            elif opcode not in (REPLAY_JUMP, REPLAY_PAUSE, REPLAY_RESTART, REPLAY_NEXT_LEVEL):
+                raise ValueError(f"{self.path}: неизвестный код события {opcode} на смещении {offset - 1}")
+
+            self.events.append((tick, opcode, payload))
+
+    def run(self):
+        print(f"Воспроизведение {self.path}: {self.player_name}, {self.english_level}, "
+              f"уровень {self.level}, seed {self.seed}, событий {len(self.events)}")
+
+        with tempfile.TemporaryDirectory() as directory:
+            options = GameOptions(seed=self.seed, database_path=os.path.join(directory, "replay.db"),
+                                  procedural=self.procedural, chase=self.chase, survival=self.survival)
+            game_view = GameView(options, window=HeadlessWindow())
+            game_view.headless = True
+            game_view.current_level = self.level
+            game_view.setup(self.player_name, self.english_level)
+
+            started = time.perf_counter()
+            matched = None
+            for tick, opcode, payload in self.events:
+                while game_view.sim_tick < tick:
+                    if game_view.game_paused or not game_view.game_active:
+                        print(f"Рассинхронизация на тике {game_view.sim_tick}: "
+                              f"игра ждёт ввода, а следующее событие на тике {tick}")
+                        game_view.database.flush()
+                        return False
+                    game_view.tick()
+
+                if opcode == REPLAY_END:
+                    matched = payload == game_view.state_digest()
+                else:
+                    self.apply(game_view, opcode, payload)
+
+            elapsed = time.perf_counter() - started
+            game_view.database.flush()
+
+        print(f"Тиков: {game_view.sim_tick} за {elapsed:.2f} с "
+              f"({game_view.sim_tick / max(elapsed, 1e-9):.0f} тиков в секунду, "
+              f"{game_view.sim_tick * SIMULATION_DT / max(elapsed, 1e-9):.0f}x реального времени)")
+        print(f"Уровень {game_view.current_level}, очки {game_view.total_score}, ключи {game_view.keys_collected}")
+        if matched is None:
+            print("Запись без контрольной суммы: проверить состояние нельзя")
+            return False
+        print("Состояние совпадает с записью" if matched else "Состояние НЕ совпадает с записью")
+        return matched
+
+    @staticmethod
+    def apply(game_view, opcode, payload):
+        if opcode == REPLAY_STATE:
+            game_view.set_input_state(payload)
+        elif opcode == REPLAY_JUMP:
+            game_view.jump()
+        elif opcode == REPLAY_PAUSE:
+            game_view.toggle_pause()
+        elif opcode == REPLAY_RESTART:
+            game_view.restart_level()
+        elif opcode == REPLAY_ANSWER:
+            question, station_index = game_view.active_quiz
+            game_view.register_answer(question, station_index, *payload)
+        elif opcode == REPLAY_QUIZ_END:
+            game_view.finish_quiz(payload)
+        elif opcode == REPLAY_NEXT_LEVEL:
+            game_view.next_level()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Воспроизведение записей English Maze Adventure")
+    parser.add_argument("paths", metavar="PATH", nargs="+", help="файлы записей .emr")
+    args = parser.parse_args()
+
+    failed = []
+    for path in args.paths:
+        try:
+            matched = ReplayPlayer(path).run()
+        except ValueError as e:
+            print(e)
+            matched = False
+        if not matched:
+            failed.append(path)
+    if failed:
+        print(f"Не совпали записи: {', '.join(failed)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()